@@ -0,0 +1,92 @@
+# benchmarks/bench_buffers.py
+"""
+比较逐页处理时每个阶段新分配整页数组（不使用缓冲区池）与在页面之间复用缓冲区池两种方式的
+每页耗时、次缺页中断次数（新分配的内存首次写入时产生，反映分配器的抖动）、新分配的数组数量和峰值常驻内存。
+每种方式在独立进程中运行，两者的编码结果应完全一致。
+
+    python -m benchmarks.bench_buffers --pages 8 --dpi 300 --enhance --sharpen
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from deskew_tool.buffers import NULL_POOL, BufferPool
+from deskew_tool.deskew_pdf import COLOR_MODES, _PageSettings, _process_page
+
+from .bench_pipeline import _peak_rss_bytes
+from .synthetic import make_synthetic_pdf
+
+
+def _minor_faults():
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+
+
+def _run(pdf_path, settings, use_pool):
+    """
+    在独立进程中逐页处理。
+    :return: (每页耗时（毫秒）, 每页次缺页中断次数, 新分配的数组数量, 峰值常驻内存（字节）, 各页编码数据)
+    """
+    pool = BufferPool() if use_pool else NULL_POOL
+    outputs = []
+    with fitz.open(pdf_path) as document:
+        pages = document.page_count - 1
+        # 第一页用于预热（导入、OpenCV 初始化），不计入
+        _process_page(document, 0, settings, pool=pool)
+        faults = _minor_faults()
+        start = time.perf_counter()
+        for page_num in range(1, pages + 1):
+            result = _process_page(document, page_num, settings, pool=pool)
+            outputs.append(result.image.read() if result.image is not None else None)
+        elapsed = time.perf_counter() - start
+        faults = _minor_faults() - faults
+    return elapsed / pages * 1000, faults / pages, pool.allocations, _peak_rss_bytes(), outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-page buffer reuse")
+    parser.add_argument("--pages", type=int, default=8, help="Number of pages (default: 8)")
+    parser.add_argument("--dpi", type=int, default=300, help="Scan DPI of the synthetic pages (default: 300)")
+    parser.add_argument("--angles", type=float, nargs="+", help="Skew angles, cycled over the pages")
+    parser.add_argument("--color-mode", choices=COLOR_MODES, default="color")
+    parser.add_argument("--enhance", action="store_true", help="Enable image enhancement")
+    parser.add_argument("--sharpen", action="store_true", help="Enable sharpening during enhancement")
+    parser.add_argument("--remove-watermark", action="store_true", help="Enable watermark removal")
+    args = parser.parse_args()
+
+    settings = _PageSettings(
+        dpi=args.dpi, background_color=(255, 255, 255), detect_dpi=100, color_mode=args.color_mode,
+        selected_features={
+            "enhance_image": args.enhance, "sharpening": args.sharpen, "remove_watermark": args.remove_watermark,
+        },
+    )
+    with tempfile.TemporaryDirectory(prefix="pdf_deskew_bench_") as tmpdir:
+        pdf_path = os.path.join(tmpdir, "input.pdf")
+        make_synthetic_pdf(pdf_path, args.pages, dpi=args.dpi, angles=args.angles)
+        print(f"{args.pages} synthetic A4 pages at {args.dpi} DPI, color mode {args.color_mode}")
+        print(f"{'variant':<12} {'ms/page':>8} {'faults/page':>12} {'arrays':>7} {'peak RSS MB':>12}")
+        reference = None
+        context = multiprocessing.get_context("spawn")
+        for name, use_pool in (("no pool", False), ("pool", True)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                ms, faults, arrays, peak, outputs = executor.submit(_run, pdf_path, settings, use_pool).result()
+            if reference is None:
+                reference = outputs
+            elif outputs != reference:
+                raise AssertionError(f"{name}: encoded pages differ from the first variant")
+            peak_mb = f"{peak / 2 ** 20:.1f}" if peak is not None else "n/a"
+            arrays_text = str(arrays) if use_pool else "-"
+            print(f"{name:<12} {ms:>8.1f} {faults:>12.0f} {arrays_text:>7} {peak_mb:>12}")
+
+
+if __name__ == "__main__":
+    main()
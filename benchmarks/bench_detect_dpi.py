@@ -0,0 +1,45 @@
+# benchmarks/bench_detect_dpi.py
+"""
+比较全分辨率与降采样倾斜检测的耗时和角度误差。
+
+    python -m benchmarks.bench_detect_dpi --dpi 300 --detect-dpi 150 100 75
+"""
+
+import argparse
+import time
+
+from deskew_tool.deskew_pdf import detect_skew
+
+from .synthetic import make_page_image
+
+# determine_skew 的角度分辨率为 1°，使用整数角度以单独衡量降采样带来的误差
+ANGLES = (-6.0, -4.0, -3.0, -1.0, 0.0, 2.0, 3.0, 5.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark skew detection at reduced resolution")
+    parser.add_argument("--dpi", type=int, default=300, help="Render DPI of the synthetic pages (default: 300)")
+    parser.add_argument("--detect-dpi", type=int, nargs="+", default=[150, 100, 75],
+                        help="Detection DPIs to compare against full resolution")
+    args = parser.parse_args()
+
+    pages = [(angle, make_page_image(angle, dpi=args.dpi, seed=index)) for index, angle in enumerate(ANGLES)]
+    height, width = pages[0][1].shape[:2]
+    print(f"{len(pages)} synthetic pages, {width}x{height} px at {args.dpi} DPI")
+    print(f"{'detect dpi':>10} {'ms/page':>10} {'speedup':>8} {'mean err':>9} {'max err':>8}")
+
+    baseline = None
+    for detect_dpi in [args.dpi] + sorted(args.detect_dpi, reverse=True):
+        errors = []
+        start = time.perf_counter()
+        for angle, image in pages:
+            detected = detect_skew(image, args.dpi, detect_dpi)
+            errors.append(abs((detected if detected is not None else 0.0) - angle))
+        elapsed = (time.perf_counter() - start) / len(pages)
+        baseline = baseline or elapsed
+        print(f"{detect_dpi:>10} {elapsed * 1000:>10.1f} {baseline / elapsed:>7.1f}x "
+              f"{sum(errors) / len(errors):>9.2f} {max(errors):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
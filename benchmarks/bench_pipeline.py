@@ -0,0 +1,223 @@
+# benchmarks/bench_pipeline.py
+"""
+在合成扫描 PDF 上测量各处理阶段的耗时以及 deskew_pdf 的端到端吞吐量和峰值内存，
+并可保存为基准 JSON，供之后的运行比较。
+
+    python -m benchmarks.bench_pipeline --pages 8 --dpi 150 --watermark --save-baseline baseline.json
+    python -m benchmarks.bench_pipeline --pages 8 --dpi 150 --watermark --compare baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from deskew_tool.deskew_pdf import (
+    COLOR_MODES, SKEW_DETECTORS, _render_page, convert_grayscale, deskew_pdf, detect_skew, enhance_image,
+    remove_watermark, rotate_image,
+)
+from deskew_tool.encoding import OUTPUT_ENCODINGS, encode_page
+from deskew_tool.watermark import WATERMARK_MASKS
+
+from .synthetic import PAGE_SIZES, make_synthetic_pdf
+
+STAGES = ("render", "remove_watermark", "enhance_image", "convert_grayscale", "detect", "rotate_image", "encode")
+
+
+def time_stages(pdf_path, dpi, detect_dpi, skew_detector, output_encoding="auto"):
+    """
+    逐页单独调用各处理阶段并计时。
+    :return: {阶段名称: 每页耗时（毫秒）列表}
+    """
+    timings = {stage: [] for stage in STAGES}
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[stage].append((time.perf_counter() - start) * 1000)
+        return result
+
+    with fitz.open(pdf_path) as document:
+        for page in document:
+            img = timed("render", _render_page, page, dpi)
+            timed("remove_watermark", remove_watermark, img)
+            timed("enhance_image", enhance_image, img)
+            timed("convert_grayscale", convert_grayscale, img)
+            angle = timed("detect", detect_skew, img, dpi, detect_dpi, skew_detector)
+            rotated = timed("rotate_image", rotate_image, img, angle or 0.0)
+            timed("encode", encode_page, rotated, output_encoding)
+    return timings
+
+
+def _peak_rss_bytes():
+    """当前进程及其已结束子进程的峰值常驻内存；resource 模块不可用时返回 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale
+
+
+def _run_end_to_end(input_pdf, output_pdf, options):
+    """在独立进程中运行 deskew_pdf，使峰值内存不受基准程序自身影响。"""
+    start = time.perf_counter()
+    deskew_pdf(input_pdf, output_pdf, **options)
+    return time.perf_counter() - start, _peak_rss_bytes()
+
+
+def time_end_to_end(input_pdf, output_pdf, options):
+    """
+    :return: (耗时（秒）, 峰值常驻内存（字节），无法测量时为 None)
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_run_end_to_end, input_pdf, output_pdf, options).result()
+
+
+def summarize(values):
+    return {"mean_ms": statistics.fmean(values), "max_ms": max(values)}
+
+
+def compare(results, baseline, tolerance):
+    """
+    打印与基准结果的对比。
+    :return: 超出容差的指标名称列表
+    """
+    regressions = []
+    rows = [(f"stage {stage}", "mean_ms", baseline["stages"].get(stage, {}).get("mean_ms"),
+             results["stages"][stage]["mean_ms"], False) for stage in STAGES if stage in results["stages"]]
+    rows.append(("pages/sec", "pages_per_sec", baseline["end_to_end"].get("pages_per_sec"),
+                 results["end_to_end"]["pages_per_sec"], True))
+    rows.append(("peak RSS MB", "peak_rss_mb", baseline["end_to_end"].get("peak_rss_mb"),
+                 results["end_to_end"]["peak_rss_mb"], False))
+    rows.append(("output MB", "output_mb", baseline["end_to_end"].get("output_mb"),
+                 results["end_to_end"]["output_mb"], False))
+
+    print(f"\n{'metric':<26} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, _, old, new, higher_is_better in rows:
+        if old is None or new is None:
+            print(f"{name:<26} {'-':>10} {'-' if new is None else f'{new:.1f}':>10}")
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        flag = "  <- regression" if worse else ""
+        print(f"{name:<26} {old:>10.1f} {new:>10.1f} {change:>+7.1f}%{flag}")
+        if worse:
+            regressions.append(name)
+    if results["config"] != baseline.get("config"):
+        print("\nWarning: baseline was recorded with a different configuration")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the deskew pipeline on a synthetic scanned PDF")
+    parser.add_argument("--pages", type=int, default=8, help="Number of pages (default: 8)")
+    parser.add_argument("--page-size", choices=sorted(PAGE_SIZES), default="a4", help="Page size (default: a4)")
+    parser.add_argument("--dpi", type=int, default=150, help="Scan DPI of the synthetic pages (default: 150)")
+    parser.add_argument("--render-dpi", type=int, help="DPI passed to deskew_pdf (default: same as --dpi)")
+    parser.add_argument("--detect-dpi", type=int, default=100, help="Detection DPI, 0 uses the render DPI (default: 100)")
+    parser.add_argument("--angles", type=float, nargs="+", help="Skew angles, cycled over the pages")
+    parser.add_argument("--noise", type=float, default=0.0, help="Gaussian noise standard deviation (default: 0)")
+    parser.add_argument("--watermark", action="store_true", help="Overlay a diagonal watermark on every page")
+    parser.add_argument("--skew-detector", choices=SKEW_DETECTORS, default="deskew")
+    parser.add_argument("--enhance", action="store_true", help="Enable image enhancement in the end-to-end run")
+    parser.add_argument("--remove-watermark", action="store_true", help="Enable watermark removal in the end-to-end run")
+    parser.add_argument("--watermark-mask", choices=WATERMARK_MASKS, default="page",
+                        help="Watermark mask of the end-to-end run (default: page)")
+    parser.add_argument("--watermark-threshold", type=int, default=127,
+                        help="Watermark mask threshold of the end-to-end run; the synthetic watermark is about 200 "
+                             "(default: 127)")
+    parser.add_argument("--grayscale", action="store_true", help="Enable grayscale conversion in the end-to-end run")
+    parser.add_argument("--color-mode", choices=COLOR_MODES, default="color",
+                        help="Color mode of the end-to-end run (default: color)")
+    parser.add_argument("--output-encoding", choices=OUTPUT_ENCODINGS, default="auto",
+                        help="Output encoding of rasterized pages (default: auto)")
+    parser.add_argument("--memory-budget", type=int, metavar="MB",
+                        help="Per-page memory budget of the end-to-end run, larger pages are tiled (default: unlimited)")
+    parser.add_argument("--skip-stages", action="store_true",
+                        help="Skip the per-stage timings, which process whole pages regardless of --memory-budget")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes for the end-to-end run (default: 1)")
+    parser.add_argument("--save-baseline", metavar="JSON", help="Write the results to this file")
+    parser.add_argument("--compare", metavar="JSON", help="Compare the results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=10.0,
+                        help="Percentage change counted as a regression when comparing (default: 10)")
+    args = parser.parse_args()
+
+    render_dpi = args.render_dpi or args.dpi
+    detect_dpi = args.detect_dpi or None
+    config = {
+        "pages": args.pages, "page_size": args.page_size, "dpi": args.dpi, "render_dpi": render_dpi,
+        "detect_dpi": detect_dpi, "angles": args.angles, "noise": args.noise, "watermark": args.watermark,
+        "skew_detector": args.skew_detector, "enhance": args.enhance, "remove_watermark": args.remove_watermark,
+        "watermark_mask": args.watermark_mask, "watermark_threshold": args.watermark_threshold,
+        "grayscale": args.grayscale, "jobs": args.jobs,
+        "output_encoding": args.output_encoding, "color_mode": args.color_mode,
+        "memory_budget": args.memory_budget,
+    }
+
+    with tempfile.TemporaryDirectory(prefix="pdf_deskew_bench_") as tmpdir:
+        input_pdf = os.path.join(tmpdir, "input.pdf")
+        output_pdf = os.path.join(tmpdir, "output.pdf")
+        make_synthetic_pdf(input_pdf, args.pages, args.page_size, args.dpi, args.angles, args.noise, args.watermark)
+        print(f"{args.pages} synthetic {args.page_size} pages at {args.dpi} DPI, rendered at {render_dpi} DPI")
+
+        timings = {} if args.skip_stages else \
+            time_stages(input_pdf, render_dpi, detect_dpi, args.skew_detector, args.output_encoding)
+        options = {
+            "dpi": render_dpi, "detect_dpi": detect_dpi, "skew_detector": args.skew_detector, "workers": args.jobs,
+            "output_encoding": args.output_encoding,
+            "color_mode": args.color_mode,
+            "memory_budget": args.memory_budget,
+            "selected_features": {
+                "enhance_image": args.enhance,
+                "remove_watermark": args.remove_watermark,
+                "watermark_mask": args.watermark_mask,
+                "watermark_threshold": args.watermark_threshold,
+                "convert_grayscale": args.grayscale,
+            },
+        }
+        elapsed, peak_rss = time_end_to_end(input_pdf, output_pdf, options)
+        output_bytes = os.path.getsize(output_pdf)
+
+    results = {
+        "config": config,
+        "stages": {stage: summarize(values) for stage, values in timings.items()},
+        "end_to_end": {
+            "seconds": elapsed,
+            "pages_per_sec": args.pages / elapsed,
+            "peak_rss_mb": peak_rss / 2 ** 20 if peak_rss is not None else None,
+            "output_mb": output_bytes / 2 ** 20,
+        },
+    }
+
+    print(f"\n{'stage':<20} {'mean ms':>10} {'max ms':>10}")
+    for stage, summary in results["stages"].items():
+        print(f"{stage:<20} {summary['mean_ms']:>10.1f} {summary['max_ms']:>10.1f}")
+    end_to_end = results["end_to_end"]
+    rss = f"{end_to_end['peak_rss_mb']:.1f} MB" if end_to_end["peak_rss_mb"] is not None else "n/a"
+    print(f"\nend to end: {end_to_end['seconds']:.2f} s, {end_to_end['pages_per_sec']:.2f} pages/sec, peak RSS {rss}, "
+          f"output {end_to_end['output_mb']:.2f} MB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_point_ops.py
+"""
+比较灰度量化不同实现方式在整页图像上的遍历次数、新分配的整页数组数量、峰值临时内存和耗时：
+convert_grayscale 原先的 floor_divide、乘法、astype 三步写法，与查找表、按位与（原地）的单次遍历写法。
+
+    python -m benchmarks.bench_point_ops --dpi 300 --repeat 10
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from deskew_tool.point_ops import quantize
+
+from .synthetic import make_page_image
+
+QUANT_LEVELS = 64
+
+
+def quantize_variants():
+    step = 256 // QUANT_LEVELS
+    lut = (np.arange(256) // step * step).astype(np.uint8)
+    return {
+        "numpy, 3 steps": [
+            lambda img: np.floor_divide(img, step),
+            lambda img: img * step,
+            lambda img: img.astype(np.uint8),
+        ],
+        "LUT": [lambda img: cv2.LUT(img, lut)],
+        "LUT in place": [lambda img: cv2.LUT(img, lut, dst=img)],
+        "quantize in place": [lambda img: quantize(img, QUANT_LEVELS, dst=img)],
+    }
+
+
+def run(steps, image):
+    """依次执行各步骤，返回 (结果, 新分配的整页数组数量)。"""
+    allocations = 0
+    for step in steps:
+        result = step(image)
+        if not np.shares_memory(result, image):
+            allocations += 1
+        image = result
+    return image, allocations
+
+
+def measure(steps, image, repeat):
+    """:return: (遍历次数, 分配次数, 峰值临时内存（字节）, 每页耗时（毫秒）, 结果)"""
+    work = image.copy()
+    tracemalloc.start()
+    result, allocations = run(steps, work)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    elapsed = 0.0
+    for _ in range(repeat):
+        work = image.copy()
+        start = time.perf_counter()
+        run(steps, work)
+        elapsed += time.perf_counter() - start
+    return len(steps), allocations, peak, elapsed / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark grayscale quantization variants")
+    parser.add_argument("--dpi", type=int, default=300, help="DPI of the synthetic page (default: 300)")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed repetitions per variant (default: 10)")
+    args = parser.parse_args()
+
+    page = make_page_image(2.0, dpi=args.dpi)
+    print(f"OpenCV threads: {cv2.getNumThreads()}")
+    for name, image in (("gray", cv2.cvtColor(page, cv2.COLOR_RGB2GRAY)), ("rgb", page)):
+        height, width = image.shape[:2]
+        print(f"\n{name} page {width}x{height}, {image.nbytes / 2 ** 20:.1f} MB")
+        print(f"{'variant':<18} {'passes':>6} {'allocs':>6} {'peak MB':>8} {'ms/page':>8}")
+        reference = None
+        for variant_name, steps in quantize_variants().items():
+            passes, allocations, peak, ms, result = measure(steps, image, args.repeat)
+            if reference is None:
+                reference = result
+            elif not np.array_equal(result, reference):
+                raise AssertionError(f"{variant_name} differs from the first variant")
+            print(f"{variant_name:<18} {passes:>6} {allocations:>6} {peak / 2 ** 20:>8.1f} {ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
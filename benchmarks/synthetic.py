@@ -0,0 +1,111 @@
+# benchmarks/synthetic.py
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+# A4 页面尺寸（英寸）
+A4_INCHES = (8.27, 11.69)
+
+# 可选的页面尺寸（英寸）
+PAGE_SIZES = {
+    "a4": A4_INCHES,
+    "letter": (8.5, 11.0),
+    "a5": (5.83, 8.27),
+    # 大幅面图纸，用于测试分块处理
+    "a2": (16.54, 23.39),
+    "a0": (33.11, 46.81),
+}
+
+# 未指定角度时循环使用的倾斜角度（整数角度，determine_skew 可精确检测）
+DEFAULT_ANGLES = (3.0, -2.0, 0.0, 5.0, -4.0, 1.0)
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+
+def make_page_image(angle=0.0, dpi=300, page_inches=A4_INCHES, seed=0, noise=0.0, watermark=False):
+    """
+    生成一张确定性的倾斜文本扫描页（白底黑字，RGB）。
+    :param angle: 页面倾斜角度，即 determine_skew 应当检测到的角度
+    :param dpi: 分辨率
+    :param page_inches: 页面尺寸（英寸）
+    :param seed: 随机种子，决定文本内容和噪声
+    :param noise: 高斯噪声的标准差（0-255 灰度级），0 表示无噪声
+    :param watermark: 是否叠加一个浅灰色的斜向水印
+    :return: uint8 RGB 图像
+    """
+    rng = np.random.default_rng(seed)
+    width = int(round(page_inches[0] * dpi))
+    height = int(round(page_inches[1] * dpi))
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    # 约 11pt 的文字与 1.5 倍行距
+    font_scale = dpi / 150
+    thickness = max(1, int(round(dpi / 100)))
+    line_height = int(dpi * 11 / 72 * 1.5)
+    margin = dpi
+
+    for y in range(margin, height - margin, line_height):
+        words = rng.choice(WORDS, size=12)
+        line = " ".join(words)
+        cv2.putText(image, line, (margin, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+
+    if watermark:
+        _draw_watermark(image, dpi)
+
+    # 页面按 -angle 旋转，使检测结果为 +angle（与 rotate_image 的约定一致）
+    center = (width / 2, height / 2)
+    matrix = cv2.getRotationMatrix2D(center, -angle, 1.0)
+    image = cv2.warpAffine(image, matrix, (width, height), borderValue=(255, 255, 255))
+
+    if noise > 0:
+        image = np.clip(image + rng.normal(0, noise, image.shape[:2])[..., None], 0, 255).astype(np.uint8)
+    return image
+
+
+def _draw_watermark(image, dpi):
+    """在页面中央叠加一行与页面成 45° 的浅灰色文字。"""
+    height, width = image.shape[:2]
+    layer = np.zeros((height, width), dtype=np.uint8)
+    cv2.putText(layer, "CONFIDENTIAL", (width // 8, height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                dpi / 40, 255, max(1, dpi // 15), cv2.LINE_AA)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), 45, 1.0)
+    layer = cv2.warpAffine(layer, matrix, (width, height))
+    # 水印颜色为浅灰色（约 200），只覆盖白色背景，不会让文字变浅
+    alpha = layer.astype(np.float32)[..., None] / 255 * (55 / 255)
+    image[:] = np.minimum(image, (255 * (1 - alpha)).astype(np.uint8))
+
+
+def make_synthetic_pdf(path, pages=4, page_size="a4", dpi=150, angles=None, noise=0.0, watermark=False, quality=90):
+    """
+    生成确定性的合成扫描 PDF：每页是一张铺满页面的 JPEG 扫描图。
+    :param path: 输出 PDF 路径
+    :param pages: 页数
+    :param page_size: PAGE_SIZES 中的页面尺寸名称，或 (宽, 高) 英寸元组
+    :param dpi: 扫描分辨率
+    :param angles: 各页倾斜角度，页数多于角度数时循环使用；为 None 时使用 DEFAULT_ANGLES
+    :param noise: 高斯噪声的标准差（0-255 灰度级）
+    :param watermark: 是否叠加斜向水印
+    :param quality: JPEG 质量
+    :return: 各页实际使用的倾斜角度
+    """
+    page_inches = PAGE_SIZES[page_size] if isinstance(page_size, str) else tuple(page_size)
+    angles = list(angles or DEFAULT_ANGLES)
+    page_angles = [angles[index % len(angles)] for index in range(pages)]
+    document = fitz.open()
+    try:
+        for index, angle in enumerate(page_angles):
+            image = make_page_image(angle, dpi, page_inches, seed=index, noise=noise, watermark=watermark)
+            page = document.new_page(width=page_inches[0] * 72, height=page_inches[1] * 72)
+            # 页面像素为 RGB 顺序，OpenCV 编码时按 BGR 解释
+            encoded = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+                                   [cv2.IMWRITE_JPEG_QUALITY, quality])[1]
+            page.insert_image(page.rect, stream=encoded.tobytes())
+        document.save(path)
+    finally:
+        document.close()
+    return page_angles
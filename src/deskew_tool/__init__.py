@@ -1,11 +1,17 @@
 """PDF Deskew Tool - A tool for deskewing scanned PDF documents."""
 
 import argparse
+import os
 import sys
 import logging
 from pathlib import Path
 
-from .deskew_pdf import deskew_pdf
+from .angle_cache import AngleCache
+from .batch import SCHEDULES, BatchJob, collect_inputs, default_output_path, load_manifest, run_batch, write_summary
+from .deskew_pdf import deskew_pdf, iter_deskewed_pages
+from .profiling import ProfileRecorder
+
+__all__ = ["deskew_pdf", "iter_deskewed_pages", "main"]
 
 __version__ = "0.1.0"
 __author__ = "driezy"
@@ -25,20 +31,123 @@ def main():
         prog="pdf-deskew-cli"
     )
     parser.add_argument(
-        "input",
-        help="Input PDF file path"
+        "inputs",
+        nargs="*",
+        metavar="input",
+        help="Input PDF files, directories or glob patterns; several inputs are processed as a batch"
     )
     parser.add_argument(
         "-o", "--output",
-        help="Output PDF file path (default: input_deskewed.pdf)",
+        help="Output PDF file path for a single input (default: input_deskewed.pdf)",
         default=None
     )
+    parser.add_argument(
+        "--output-dir",
+        help="Directory for output files in batch mode (default: next to each input)"
+    )
+    parser.add_argument(
+        "--manifest",
+        help="JSON or CSV job list with an input column and optional output and per-job settings "
+             "(dpi, detect_dpi, output_mode, skew_detector, angle_tolerance, native_images, "
+             "enhance, remove_watermark, watermark_mask, grayscale, bg_color)"
+    )
+    parser.add_argument(
+        "--file-jobs",
+        type=int,
+        default=1,
+        help="Number of files processed at the same time in batch mode, 0 uses all CPU cores (default: 1)"
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULES,
+        default="largest-first",
+        help="Order in which batch files are started (default: largest-first)"
+    )
+    parser.add_argument(
+        "--summary",
+        help="Write a per-file batch summary (status, pages, time, angles) to this .json or .csv file"
+    )
     parser.add_argument(
         "-d", "--dpi",
         type=int,
         default=300,
         help="DPI for rendering (default: 300)"
     )
+    parser.add_argument(
+        "--detect-dpi",
+        type=int,
+        default=100,
+        help="DPI for skew detection, 0 uses the rendering DPI (default: 100; the Python API defaults to the "
+             "rendering DPI)"
+    )
+    parser.add_argument(
+        "--skew-detector",
+        type=str,
+        default="deskew",
+        choices=["deskew", "projection"],
+        help="deskew: Hough transform from the deskew library, 1 degree resolution; "
+             "projection: built-in projection-profile search, 0.1 degree resolution and faster "
+             "(default: deskew)"
+    )
+    parser.add_argument(
+        "--output-mode",
+        type=str,
+        default="raster",
+        choices=["raster", "transform"],
+        help="raster: re-render corrected pages as images; transform: rotate the original page "
+             "content without rasterizing, image processing options are ignored (default: raster)"
+    )
+    parser.add_argument(
+        "--angle-tolerance",
+        type=float,
+        default=0.0,
+        help="Pages whose skew does not exceed this many degrees are copied unchanged "
+             "when no image processing is enabled (default: 0.0)"
+    )
+    parser.add_argument(
+        "--color-mode",
+        choices=["color", "gray", "bilevel"],
+        default="color",
+        help="Pixel format of rasterized pages: color; gray to render, process and embed a single channel; "
+             "or bilevel to binarize right after rendering and write 1-bit images, ignoring image processing "
+             "(default: color)"
+    )
+    parser.add_argument(
+        "--output-encoding",
+        choices=["auto", "jpeg", "flate", "fax"],
+        default="auto",
+        help="Compression of rasterized pages: jpeg (lossy), flate (lossless), fax (CCITT G4 black-and-white), "
+             "or auto, which uses fax for pure black-and-white pages and jpeg otherwise (default: auto)"
+    )
+    parser.add_argument(
+        "--jpeg-quality",
+        type=int,
+        default=75,
+        help="JPEG quality from 1 to 100 (default: 75)"
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        metavar="MB",
+        help="Per-page memory budget in MB; pages that would exceed it are processed in tiles "
+             "and written as several tile images (default: unlimited)"
+    )
+    parser.add_argument(
+        "--pages",
+        metavar="RANGES",
+        help='Only process these pages, e.g. "1-10,57,200-" (1-based; "200-" runs to the last page)'
+    )
+    parser.add_argument(
+        "--drop-unselected",
+        action="store_true",
+        help="Leave pages not selected by --pages out of the output instead of copying them unchanged"
+    )
+    parser.add_argument(
+        "--no-native-images",
+        action="store_true",
+        help="Always render pages at --dpi instead of decoding single-image scanned pages "
+             "at their native resolution"
+    )
     parser.add_argument(
         "--bg-color",
         type=str,
@@ -56,6 +165,53 @@ def main():
         action="store_true",
         help="Enable watermark removal"
     )
+    parser.add_argument(
+        "--watermark-mask",
+        choices=["page", "document"],
+        default="page",
+        help="Where watermark removal looks for the watermark: 'page' masks dark pixels on every page separately; "
+             "'document' estimates the watermark shared by all pages once and only removes it there (default: page)"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for page processing, 0 uses all CPU cores (default: 1)"
+    )
+    parser.add_argument(
+        "--spill-to-disk",
+        action="store_true",
+        help="Keep encoded pages waiting to be written in a temporary directory instead of memory"
+    )
+    parser.add_argument(
+        "--angle-cache",
+        metavar="PATH",
+        help="SQLite file caching detected skew angles by page content, "
+             "so repeated runs skip skew detection"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=100000,
+        help="Maximum number of pages kept in the angle cache (default: 100000)"
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="DIR",
+        help="Checkpoint every finished page into this directory so an interrupted run can be resumed; "
+             "removed after the output is written"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from --journal, skipping pages that are already done"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="JSON",
+        help="Record per-page, per-stage wall time, CPU time and peak memory, write them to this file "
+             "and print a p50/p95/max summary per stage"
+    )
     parser.add_argument(
         "-v", "--version",
         action="version",
@@ -64,20 +220,18 @@ def main():
 
     args = parser.parse_args()
 
-    # Validate input file
-    input_path = Path(args.input)
-    if not input_path.exists():
-        logger.error(f"Input file does not exist: {args.input}")
-        sys.exit(1)
-    if not input_path.suffix.lower() == ".pdf":
-        logger.error(f"Input file must be a PDF: {args.input}")
-        sys.exit(1)
-
-    # Determine output path
-    if args.output:
-        output_path = args.output
-    else:
-        output_path = str(input_path.parent / f"{input_path.stem}_deskewed.pdf")
+    if not args.inputs and not args.manifest:
+        parser.error("no input given")
+    batch_mode = bool(args.manifest) or len(args.inputs) != 1 or os.path.isdir(args.inputs[0]) \
+        or any(char in args.inputs[0] for char in "*?[")
+    if batch_mode and args.output:
+        parser.error("-o/--output applies to a single input, use --output-dir in batch mode")
+    if args.jobs < 0 or args.file_jobs < 0:
+        parser.error("number of jobs must not be negative")
+    if args.resume and not args.journal:
+        parser.error("--resume requires --journal")
+    if args.memory_budget is not None and args.memory_budget <= 0:
+        parser.error("--memory-budget must be positive")
 
     # Parse background color
     bg_color_map = {
@@ -86,10 +240,14 @@ def main():
     }
     bg_color = bg_color_map.get(args.bg_color.lower(), (255, 255, 255))
 
+    # Resolve worker count
+    workers = args.jobs or os.cpu_count() or 1
+
     # Prepare features
     selected_features = {
         "enhance_image": args.enhance,
         "remove_watermark": args.remove_watermark,
+        "watermark_mask": args.watermark_mask,
         "contrast_enhancement": args.enhance,
         "convert_grayscale": False,
         "contrast_level": 2,
@@ -106,20 +264,76 @@ def main():
         "grayscale_smoothing_kernel": 3,
     }
 
+    options = {
+        "dpi": args.dpi,
+        "detect_dpi": args.detect_dpi or None,
+        "output_mode": args.output_mode,
+        "skew_detector": args.skew_detector,
+        "angle_tolerance": args.angle_tolerance,
+        "native_images": not args.no_native_images,
+        "color_mode": args.color_mode,
+        "output_encoding": args.output_encoding,
+        "jpeg_quality": args.jpeg_quality,
+        "memory_budget": args.memory_budget,
+        "pages": args.pages,
+        "unselected_pages": "drop" if args.drop_unselected else "copy",
+        "background_color": bg_color,
+        "selected_features": selected_features,
+        "workers": workers,
+        "spill_to_disk": args.spill_to_disk,
+        "journal_dir": args.journal,
+        "resume": args.resume,
+    }
+
+    if batch_mode:
+        sys.exit(_run_batch(args, options))
+
+    # Validate input file
+    input_path = Path(args.inputs[0])
+    if not input_path.exists():
+        logger.error(f"Input file does not exist: {input_path}")
+        sys.exit(1)
+    if not input_path.suffix.lower() == ".pdf":
+        logger.error(f"Input file must be a PDF: {input_path}")
+        sys.exit(1)
+
+    # Determine output path
+    if args.output:
+        output_path = args.output
+    else:
+        output_path = default_output_path(str(input_path), args.output_dir)
+
+    angle_cache = AngleCache(args.angle_cache, max_entries=args.cache_size) if args.angle_cache else None
+    recorder = ProfileRecorder() if args.profile else None
+
     try:
         logger.info(f"Starting deskewing: {input_path}")
         logger.info(f"Output will be saved to: {output_path}")
         logger.info(f"DPI: {args.dpi}")
+        logger.info(f"Detection DPI: {args.detect_dpi or args.dpi}")
         logger.info(f"Background color: {args.bg_color}")
+        logger.info(f"Skew detector: {args.skew_detector}")
+        logger.info(f"Output mode: {args.output_mode}")
+        logger.info(f"Worker processes: {workers}")
 
-        deskew_pdf(
-            input_path,
-            output_path,
-            dpi=args.dpi,
-            background_color=bg_color,
-            selected_features=selected_features
-        )
+        try:
+            deskew_pdf(
+                input_path,
+                output_path,
+                angle_cache=angle_cache,
+                recorder=recorder,
+                **options
+            )
+        finally:
+            if recorder is not None:
+                recorder.close()
 
+        if recorder is not None:
+            recorder.save(args.profile)
+            print(recorder.format_summary())
+            print(f"Profile written to {args.profile}")
+        if angle_cache is not None:
+            print(f"Angle cache: {angle_cache.hits} hits, {angle_cache.misses} misses")
         logger.info("Deskewing completed successfully!")
         print(f"✓ PDF deskewed successfully: {output_path}")
         sys.exit(0)
@@ -129,6 +343,64 @@ def main():
         print(f"✗ Error: {e}")
         sys.exit(1)
 
+    finally:
+        if angle_cache is not None:
+            angle_cache.close()
+
+
+def _run_batch(args, options):
+    """
+    Process every input file in one long-lived process (or a bounded process pool)
+    and print a per-file summary. Returns the process exit status.
+    """
+    try:
+        if args.manifest:
+            jobs = load_manifest(args.manifest, args.output_dir)
+        else:
+            jobs = []
+        jobs += [BatchJob(path, default_output_path(path, args.output_dir)) for path in collect_inputs(args.inputs)]
+    except (OSError, ValueError) as e:
+        logger.error(f"Unable to read batch inputs: {e}")
+        return 1
+    if not jobs:
+        logger.error("No PDF files found")
+        return 1
+
+    missing = [job.input_path for job in jobs if not os.path.isfile(job.input_path)]
+    for path in missing:
+        logger.error(f"Input file does not exist: {path}")
+    if missing:
+        return 1
+    if args.profile:
+        logger.warning("--profile is only supported for a single input and is ignored in batch mode")
+
+    file_workers = min(args.file_jobs or os.cpu_count() or 1, len(jobs))
+    logger.info(f"Processing {len(jobs)} files with {file_workers} concurrent jobs, {args.schedule} order")
+
+    def report(result):
+        if result.status == "ok":
+            print(f"✓ {result.input_path}: {result.pages} pages in {result.seconds:.1f}s")
+        else:
+            print(f"✗ {result.input_path}: {result.error}")
+
+    results = run_batch(jobs, options, file_workers, args.schedule, args.angle_cache, args.cache_size, report)
+
+    failed = [result for result in results if result.status != "ok"]
+    pages = sum(result.pages for result in results)
+    seconds = sum(result.seconds for result in results)
+    print(f"\n{'status':<8} {'pages':>6} {'seconds':>8}  file")
+    for result in results:
+        print(f"{result.status:<8} {result.pages:>6} {result.seconds:>8.1f}  {result.input_path}")
+    print(f"{len(results) - len(failed)} of {len(results)} files succeeded, {pages} pages, {seconds:.1f}s of processing")
+    if args.angle_cache:
+        hits = sum(result.cache_hits for result in results)
+        misses = sum(result.cache_misses for result in results)
+        print(f"Angle cache: {hits} hits, {misses} misses")
+    if args.summary:
+        write_summary(results, args.summary)
+        print(f"Summary written to {args.summary}")
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,125 @@
+# src/deskew_tool/angle_cache.py
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+
+
+def page_fingerprint(pdf_document, page_num) -> str:
+    """
+    计算页面内容的哈希值：页面尺寸与旋转、内容流，以及页面引用的图像和表单对象的原始数据流。
+    只读取未解码的原始数据，不渲染页面。内容相同的页面即使位于不同文件中，哈希值也相同。
+    :param pdf_document: 已打开的 fitz 文档
+    :param page_num: 页码（从 0 开始）
+    :return: 十六进制哈希字符串
+    """
+    page = pdf_document.load_page(page_num)
+    digest = hashlib.sha256()
+    digest.update(repr((tuple(page.rect), page.rotation)).encode())
+    digest.update(page.read_contents())
+    xrefs = [item[0] for item in page.get_images(full=True)]
+    xrefs += [item[0] for item in page.get_xobjects()]
+    for xref in xrefs:
+        digest.update(pdf_document.xref_stream_raw(xref) or b"")
+    return digest.hexdigest()
+
+
+def cache_key(fingerprint: str, params: dict) -> str:
+    """将页面哈希与检测参数组合为缓存键，检测参数不同的结果互不复用。"""
+    encoded = json.dumps(params, sort_keys=True).encode()
+    return hashlib.sha256(fingerprint.encode() + b"\0" + encoded).hexdigest()
+
+
+class AngleCache:
+    """
+    基于 SQLite 的倾斜角度磁盘缓存，按页面内容哈希与检测参数保存检测结果（包括未检测到倾斜的结果）。
+    条目数超过 max_entries 时按最近使用时间淘汰最旧的条目。
+    每个实例只应在单个线程中使用，多个进程可各自打开同一个缓存文件；hits 和 misses 记录本实例的命中和未命中次数。
+    """
+
+    def __init__(self, path, max_entries=100000, commit_interval=64):
+        """
+        :param path: 缓存数据库文件路径，不存在时自动创建
+        :param max_entries: 最多保存的条目数
+        :param commit_interval: 每写入多少条提交一次
+        """
+        self.path = str(path)
+        self.max_entries = max(1, int(max_entries))
+        self.commit_interval = max(1, int(commit_interval))
+        self.hits = 0
+        self.misses = 0
+        self._uncommitted = 0
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # 批处理时多个进程可能同时写入同一个缓存文件，等待对方释放锁
+        self._connection = sqlite3.connect(self.path, timeout=30)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS angles ("
+            "key TEXT PRIMARY KEY, angle REAL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS angles_last_used ON angles (last_used)")
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def get(self, key):
+        """
+        查询缓存。
+        :return: (是否命中, 角度)；命中时角度可能为 None，表示该页面未检测到倾斜
+        """
+        row = self._connection.execute("SELECT angle FROM angles WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self._connection.execute("UPDATE angles SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._changed()
+        return True, row[0]
+
+    def put(self, key, angle):
+        """保存检测结果。"""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO angles (key, angle, last_used) VALUES (?, ?, ?)",
+            (key, None if angle is None else float(angle), time.time())
+        )
+        self._changed()
+
+    def _changed(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_interval:
+            self.flush()
+
+    def flush(self):
+        """提交尚未保存的修改，并淘汰超出容量的条目。"""
+        if self._connection is None:
+            return
+        self._connection.execute(
+            "DELETE FROM angles WHERE key IN "
+            "(SELECT key FROM angles ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM angles").fetchone()[0]
+
+    def close(self):
+        """保存修改并关闭数据库。"""
+        if self._connection is None:
+            return
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logging.warning(f"Unable to save angle cache {self.path}: {e}")
+        self._connection.close()
+        self._connection = None
@@ -0,0 +1,296 @@
+# src/deskew_tool/batch.py
+
+import os
+import csv
+import glob
+import json
+import hashlib
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from .angle_cache import AngleCache
+from .deskew_pdf import deskew_pdf
+from .watermark import WATERMARK_MASKS
+
+# 调度顺序：largest-first 先处理大文件以缩短尾部等待；shortest-first 先处理小文件以尽早产出结果；input 保持输入顺序
+SCHEDULES = ("largest-first", "shortest-first", "input")
+
+# 清单中可为单个任务设置的 deskew_pdf 参数及其类型
+MANIFEST_OPTIONS = {
+    "dpi": int,
+    "detect_dpi": int,
+    "output_mode": str,
+    "skew_detector": str,
+    "angle_tolerance": float,
+    "native_images": bool,
+    "color_mode": str,
+    "output_encoding": str,
+    "jpeg_quality": int,
+    "memory_budget": int,
+    "pages": str,
+    "unselected_pages": str,
+}
+
+# 清单中可为单个任务开关的图像处理功能
+MANIFEST_FEATURES = {
+    "enhance": "enhance_image",
+    "remove_watermark": "remove_watermark",
+    "grayscale": "convert_grayscale",
+}
+
+BACKGROUND_COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+}
+
+
+@dataclass
+class BatchJob:
+    """单个文件的处理任务，options 中的参数覆盖批处理的公共参数。"""
+    input_path: str
+    output_path: str
+    options: dict = field(default_factory=dict)
+
+
+@dataclass
+class JobResult:
+    """单个文件的处理结果。"""
+    input_path: str
+    output_path: str
+    status: str
+    pages: int = 0
+    seconds: float = 0.0
+    angles: list = field(default_factory=list)
+    error: Optional[str] = None
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+def default_output_path(input_path, output_dir=None, suffix="_deskewed"):
+    """输出文件名为 "<输入文件名><suffix>.pdf"，未指定 output_dir 时与输入文件位于同一目录。"""
+    directory = output_dir or os.path.dirname(input_path)
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(directory, f"{stem}{suffix}.pdf")
+
+
+def collect_inputs(inputs, suffix="_deskewed"):
+    """
+    展开命令行给出的输入：文件原样保留，目录取其中的 PDF 文件（不递归），含通配符的参数按 glob 展开（支持 **）。
+    从目录或通配符得到的文件中，文件名以 suffix 结尾的视为此前的输出而跳过。
+    :return: 去重后的 PDF 路径列表，保持给出的顺序
+    """
+    paths = []
+    for item in inputs:
+        if any(char in item for char in "*?["):
+            matches = sorted(glob.glob(item, recursive=True))
+        elif os.path.isdir(item):
+            matches = sorted(os.path.join(item, name) for name in os.listdir(item))
+        else:
+            paths.append(item)
+            continue
+        for path in matches:
+            stem, extension = os.path.splitext(os.path.basename(path))
+            if os.path.isfile(path) and extension.lower() == ".pdf" and not stem.endswith(suffix):
+                paths.append(path)
+
+    unique = []
+    seen = set()
+    for path in paths:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "on"):
+        return True
+    if text in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"Invalid boolean value: {value}")
+
+
+def _job_options(entry, source):
+    """把清单中的一条记录转换为 deskew_pdf 参数，空值表示沿用公共参数。"""
+    options = {}
+    features = {}
+    for key, value in entry.items():
+        if key in ("input", "output") or value is None or value == "":
+            continue
+        if key in MANIFEST_OPTIONS:
+            convert = _parse_bool if MANIFEST_OPTIONS[key] is bool else MANIFEST_OPTIONS[key]
+            options[key] = convert(value)
+        elif key in MANIFEST_FEATURES:
+            features[MANIFEST_FEATURES[key]] = _parse_bool(value)
+        elif key == "watermark_mask":
+            if str(value).lower() not in WATERMARK_MASKS:
+                raise ValueError(f"{source}: unsupported watermark mask: {value}")
+            features["watermark_mask"] = str(value).lower()
+        elif key == "bg_color":
+            if str(value).lower() not in BACKGROUND_COLORS:
+                raise ValueError(f"{source}: unsupported background color: {value}")
+            options["background_color"] = BACKGROUND_COLORS[str(value).lower()]
+        else:
+            raise ValueError(f"{source}: unknown manifest field: {key}")
+    if features:
+        options["features"] = features
+    return options
+
+
+def load_manifest(path, output_dir=None, suffix="_deskewed"):
+    """
+    读取任务清单。JSON 清单为对象列表，CSV 清单首行为列名；每条记录必须包含 input，
+    可选 output 以及 MANIFEST_OPTIONS、MANIFEST_FEATURES 中的字段和 watermark_mask、bg_color。
+    相对路径相对于清单文件所在目录。
+    :return: BatchJob 列表
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            entries = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f"{path}: manifest must be a list of jobs")
+
+    jobs = []
+    for index, entry in enumerate(entries, start=1):
+        source = f"{path}, job {index}"
+        if not entry.get("input"):
+            raise ValueError(f"{source}: missing input")
+        input_path = os.path.join(base, entry["input"])
+        if entry.get("output"):
+            output_path = os.path.join(base, entry["output"])
+        else:
+            output_path = default_output_path(input_path, output_dir, suffix)
+        jobs.append(BatchJob(input_path, output_path, _job_options(entry, source)))
+    return jobs
+
+
+def schedule_jobs(jobs, order="largest-first"):
+    """按文件大小排列任务。文件大小作为工作量的近似，读取时不需要打开 PDF。"""
+    if order == "input":
+        return list(jobs)
+    if order not in SCHEDULES:
+        raise ValueError(f"Unsupported schedule: {order}")
+
+    def size(job):
+        try:
+            return os.path.getsize(job.input_path)
+        except OSError:
+            return 0
+    return sorted(jobs, key=size, reverse=order == "largest-first")
+
+
+def run_job(job, base_options, angle_cache_path=None, cache_size=100000):
+    """
+    处理单个文件，捕获所有异常并记录在结果中，一个文件失败不会中断批处理。
+    :param base_options: 所有任务共用的 deskew_pdf 参数
+    :param angle_cache_path: 角度缓存文件路径，每个任务单独打开，可在多个进程间共享
+    :param cache_size: 角度缓存最多保存的条目数
+    :return: JobResult
+    """
+    options = dict(base_options)
+    job_options = dict(job.options)
+    features = job_options.pop("features", None)
+    options.update(job_options)
+    if features:
+        options["selected_features"] = {**options.get("selected_features", {}), **features}
+    if options.get("journal_dir"):
+        # 每个输入文件在公共日志目录下使用各自的子目录
+        key = hashlib.sha1(os.path.abspath(job.input_path).encode("utf-8")).hexdigest()[:16]
+        stem = os.path.splitext(os.path.basename(job.input_path))[0]
+        options["journal_dir"] = os.path.join(options["journal_dir"], f"{stem}-{key}")
+
+    start = time.perf_counter()
+    cache = None
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(job.output_path)), exist_ok=True)
+        if angle_cache_path:
+            cache = AngleCache(angle_cache_path, max_entries=cache_size)
+        report = deskew_pdf(job.input_path, job.output_path, angle_cache=cache, **options)
+        result = JobResult(job.input_path, job.output_path, "ok", report.pages,
+                           time.perf_counter() - start, report.angles)
+    except Exception as e:
+        logging.error(f"Failed to process {job.input_path}: {e}")
+        result = JobResult(job.input_path, job.output_path, "failed",
+                           seconds=time.perf_counter() - start, error=str(e))
+    finally:
+        if cache is not None:
+            cache.close()
+    if cache is not None:
+        result.cache_hits, result.cache_misses = cache.hits, cache.misses
+    return result
+
+
+def run_batch(jobs, base_options, file_workers=1, order="largest-first", angle_cache_path=None, cache_size=100000,
+              result_callback=None):
+    """
+    在同一个长期运行的进程（或有界进程池）中处理多个文件。
+    :param jobs: BatchJob 列表
+    :param base_options: 所有任务共用的 deskew_pdf 参数
+    :param file_workers: 同时处理的文件数；大于 1 时每个文件在进程池中单进程处理。
+                         工作进程异常退出时，它正在处理的任务和进程池中所有未完成的任务都记录为失败
+    :param order: 调度顺序，见 SCHEDULES
+    :param angle_cache_path: 可选的角度缓存文件路径
+    :param cache_size: 角度缓存最多保存的条目数
+    :param result_callback: 可选，每完成一个文件时以 JobResult 调用
+    :return: 与 jobs 顺序一致的 JobResult 列表
+    """
+    scheduled = schedule_jobs(jobs, order)
+    results = {}
+
+    if file_workers <= 1 or len(scheduled) <= 1:
+        for job in scheduled:
+            result = run_job(job, base_options, angle_cache_path, cache_size)
+            results[id(job)] = result
+            if result_callback:
+                result_callback(result)
+    else:
+        # 文件级并行已占满 CPU，页面级并行会过度订阅
+        base_options = dict(base_options, workers=1)
+        executor = ProcessPoolExecutor(max_workers=file_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            # 进程池按提交顺序取任务，因此提交顺序即调度顺序
+            futures = {executor.submit(run_job, job, base_options, angle_cache_path, cache_size): job
+                       for job in scheduled}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 工作进程异常退出（如内存不足或 MuPDF 崩溃）时进程池失效，该任务及所有未完成的任务
+                    # 都以 BrokenProcessPool 结束；记录为失败，其余结果照常汇总
+                    logging.error(f"Failed to process {job.input_path}: {e}")
+                    result = JobResult(job.input_path, job.output_path, "failed", error=str(e) or type(e).__name__)
+                results[id(job)] = result
+                if result_callback:
+                    result_callback(result)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return [results[id(job)] for job in jobs]
+
+
+def write_summary(results, path):
+    """按扩展名将批处理结果写为 CSV 或 JSON 文件。"""
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["input", "output", "status", "pages", "seconds", "angles", "error"])
+            for result in results:
+                angles = ";".join("" if angle is None else f"{angle:.2f}" for angle in result.angles)
+                writer.writerow([result.input_path, result.output_path, result.status, result.pages,
+                                 f"{result.seconds:.2f}", angles, result.error or ""])
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
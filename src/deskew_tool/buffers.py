@@ -0,0 +1,125 @@
+# src/deskew_tool/buffers.py
+
+import weakref
+
+import numpy as np
+
+
+class _PixmapArray:
+    """通过 __array_interface__ 暴露 Pixmap 的像素内存，numpy 数组以此对象为 base，从而保持 Pixmap 存活。"""
+
+    def __init__(self, pix):
+        self.pixmap = pix
+        self.__array_interface__ = {
+            "shape": (pix.height, pix.width, pix.n),
+            "typestr": "|u1",
+            "data": (pix.samples_ptr, False),
+            "strides": (pix.stride, pix.n, 1),
+            "version": 3,
+        }
+
+
+def pixmap_array(pix) -> np.ndarray:
+    """
+    不复制地把 fitz.Pixmap 的像素内存包装为 (高, 宽, 通道数) 的 uint8 数组。
+    与 np.frombuffer(pix.samples) 不同，不会先把整页像素复制为 bytes；数组存活期间 Pixmap 不会被释放，
+    数组可写，修改会直接作用于 Pixmap。
+    """
+    return np.asarray(_PixmapArray(pix))
+
+
+class BufferPool:
+    """
+    可复用的整页图像缓冲区池，用作 OpenCV 函数的 dst 输出，避免每页每个处理阶段都重新分配数兆字节的数组。
+
+    缓冲区按 dtype 分组、按容量（字节数）最佳匹配复用：旋转后的图像尺寸随角度变化，
+    只要容量足够即可复用，返回的是缓冲区前部按所需形状重塑的视图。新缓冲区按 headroom 比例多分配容量，
+    使旋转后（几度以内的倾斜约大 10%-20%）的图像和编码时的临时图像也能放进处理前各阶段归还的缓冲区，
+    整页流程只需两三个缓冲区。
+    归还（give）时只接受本池分配、且尚未归还的数组，其他数组被忽略，因此可以放心归还来源不明的中间结果；
+    但归还后调用方不得再使用该数组。未归还的数组（例如处理中途抛出异常）照常被垃圾回收，不会滞留在池中。
+    空闲缓冲区总量超过 max_bytes 时，多余的缓冲区直接释放。
+    每个实例只应在单个线程中使用。
+    """
+
+    enabled = True
+
+    def __init__(self, max_bytes=256 * 2 ** 20, headroom=0.25):
+        """
+        :param max_bytes: 池中最多保留的空闲缓冲区总字节数
+        :param headroom: 新缓冲区相对所需大小多分配的比例
+        """
+        self.max_bytes = int(max_bytes)
+        self.headroom = float(headroom)
+        self.allocations = 0
+        self.reuses = 0
+        self._free = {}      # dtype -> 空闲的一维缓冲区列表
+        self._in_use = weakref.WeakValueDictionary()    # id(缓冲区) -> 已取出的缓冲区
+        self._free_bytes = 0
+
+    def take(self, shape, dtype=np.uint8) -> np.ndarray:
+        """
+        取出一个指定形状和类型的数组，内容未初始化。
+        :return: C 连续的数组
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        free = self._free.get(dtype, [])
+        best = None
+        for index, buffer in enumerate(free):
+            if buffer.size >= size and (best is None or buffer.size < free[best].size):
+                best = index
+        if best is not None:
+            buffer = free.pop(best)
+            self._free_bytes -= buffer.nbytes
+            self.reuses += 1
+        else:
+            buffer = np.empty(int(size * (1 + self.headroom)), dtype=dtype)
+            self.allocations += 1
+        self._in_use[id(buffer)] = buffer
+        return buffer[:size].reshape(shape)
+
+    def take_like(self, image: np.ndarray) -> np.ndarray:
+        """取出一个与 image 形状和类型相同的数组。"""
+        return self.take(image.shape, image.dtype)
+
+    def give(self, *arrays):
+        """归还不再使用的数组；不是本池分配或已归还的数组被忽略。"""
+        for array in arrays:
+            if array is None:
+                continue
+            buffer = self._in_use.pop(id(array.base), None)
+            if buffer is None:
+                continue
+            if self._free_bytes + buffer.nbytes > self.max_bytes:
+                continue
+            self._free.setdefault(buffer.dtype, []).append(buffer)
+            self._free_bytes += buffer.nbytes
+
+    def clear(self):
+        """释放所有空闲缓冲区。"""
+        self._free.clear()
+        self._free_bytes = 0
+
+
+class NullPool:
+    """不复用任何缓冲区的空实现：take 返回 None，OpenCV 函数收到 dst=None 时照常分配新数组。"""
+
+    enabled = False
+    allocations = 0
+    reuses = 0
+
+    def take(self, shape, dtype=np.uint8):
+        return None
+
+    def take_like(self, image):
+        return None
+
+    def give(self, *arrays):
+        pass
+
+    def clear(self):
+        pass
+
+
+NULL_POOL = NullPool()
@@ -3,45 +3,89 @@
 import fitz  # PyMuPDF
 import cv2
 import numpy as np
-from PIL import Image
 from deskew import determine_skew
-import os
+import time
 import shutil
 import logging
+import functools
+import itertools
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from typing import Optional, Union
 
-def rotate_image(image: np.ndarray, angle: float, background: tuple = (255, 255, 255)) -> np.ndarray:
+from .angle_cache import cache_key, page_fingerprint
+from .buffers import NULL_POOL, BufferPool, pixmap_array
+from .encoding import OUTPUT_ENCODINGS, EncodedImage, TiledImage, binarize, encode_page
+from .journal import PageJournal, remove_journal
+from .point_ops import quantize
+from .profiling import NULL_RECORDER, ProfileRecorder
+from .skew import projection_skew
+from .watermark import WATERMARK_MASKS, WatermarkModel
+from .writer import PdfPageWriter
+
+# 修复（inpaint）时参考的邻域半径（像素）
+_INPAINT_RADIUS = 3
+
+def _luminance(color) -> int:
+    """RGB 颜色的亮度（ITU-R BT.601 权重），与 fitz 灰度渲染一致。"""
+    red, green, blue = color[:3]
+    return int(round(0.299 * red + 0.587 * green + 0.114 * blue))
+
+def _rotation_matrix(width, height, angle):
     """
-    旋转图像以校正倾斜。
+    绕图像中心旋转并扩展画布以容纳整幅图像的仿射矩阵。
+    :return: (2x3 仿射矩阵, 旋转后图像的 (宽, 高))
     """
-    old_height, old_width = image.shape[:2]
     angle_radian = np.radians(angle)
-    new_width = abs(np.sin(angle_radian) * old_height) + abs(np.cos(angle_radian) * old_width)
-    new_height = abs(np.sin(angle_radian) * old_width) + abs(np.cos(angle_radian) * old_height)
+    new_width = abs(np.sin(angle_radian) * height) + abs(np.cos(angle_radian) * width)
+    new_height = abs(np.sin(angle_radian) * width) + abs(np.cos(angle_radian) * height)
 
-    image_center = tuple(np.array(image.shape[1::-1]) / 2)
-    rot_mat = cv2.getRotationMatrix2D(image_center, angle, 1.0)
-    rot_mat[1, 2] += (new_height - old_height) / 2
-    rot_mat[0, 2] += (new_width - old_width) / 2
+    rot_mat = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    rot_mat[1, 2] += (new_height - height) / 2
+    rot_mat[0, 2] += (new_width - width) / 2
+    return rot_mat, (int(round(new_width)), int(round(new_height)))
 
-    return cv2.warpAffine(image, rot_mat, (int(round(new_width)), int(round(new_height))), borderValue=background)
+def _fill_value(background, single_channel, bilevel=False):
+    """旋转后露出区域的填充值：单通道图像只使用背景色的亮度，二值图像取为纯黑或纯白。"""
+    if not single_channel:
+        return background
+    luminance = _luminance(background)
+    return (255 if luminance >= 128 else 0) if bilevel else luminance
+
+def rotate_image(image: np.ndarray, angle: float, background: tuple = (255, 255, 255), bilevel: bool = False, pool=NULL_POOL) -> np.ndarray:
+    """
+    旋转图像以校正倾斜。单通道图像按背景色的亮度填充。
+    :param bilevel: 输入为 0/255 的单通道二值图像。先双线性插值再按 128 重新阈值化，
+                    输出仍为二值图像，笔画边缘比最近邻插值平滑
+    :param pool: 缓冲区池，输出图像从中取出
+    """
+    rot_mat, size = _rotation_matrix(image.shape[1], image.shape[0], angle)
+    background = _fill_value(background, image.ndim == 2, bilevel)
+    rotated = cv2.warpAffine(image, rot_mat, size, dst=pool.take(size[::-1] + image.shape[2:], image.dtype),
+                             borderValue=background)
+    if bilevel:
+        cv2.threshold(rotated, 127, 255, cv2.THRESH_BINARY, dst=rotated)
+    return rotated
 
-def remove_watermark(image: np.ndarray, method: str = "Inpainting", algorithm: str = "Telea", threshold: int = 127) -> np.ndarray:
+def remove_watermark(image: np.ndarray, method: str = "Inpainting", algorithm: str = "Telea", threshold: int = 127, pool=NULL_POOL, region=None) -> np.ndarray:
     """
     使用Inpainting方法移除水印。
     :param image: 输入图像
     :param method: 移除方法，目前仅支持"Inpainting"
     :param algorithm: 修复算法，"Telea"或"Navier-Stokes"
     :param threshold: 掩码阈值，用于生成水印掩码
+    :param pool: 缓冲区池，掩码等临时图像和输出图像从中取出
+    :param region: 可选的水印区域 (x, y, 区域掩码)，见 WatermarkModel.region。指定时只在该区域内生成掩码并修复，
+                   区域为空时原样返回 image
     :return: 移除水印后的图像
     """
     if method != "Inpainting":
         logging.warning(f"Unsupported watermark removal method: {method}")
         return image
 
-    # 生成水印掩码
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
-
     # 选择修复算法
     if algorithm == "Telea":
         flags = cv2.INPAINT_TELEA
@@ -51,12 +95,41 @@ def remove_watermark(image: np.ndarray, method: str = "Inpainting", algorithm: s
         logging.warning(f"Unsupported inpainting algorithm: {algorithm}, defaulting to Telea")
         flags = cv2.INPAINT_TELEA
 
+    if region is not None:
+        x, y, area = region
+        if not area.size:
+            return image
+        # 只处理水印区域及其周围修复所需的像素，区域外的内容原样复制
+        height, width = image.shape[:2]
+        left, top = max(0, x - _INPAINT_RADIUS * 2), max(0, y - _INPAINT_RADIUS * 2)
+        right = min(width, x + area.shape[1] + _INPAINT_RADIUS * 2)
+        bottom = min(height, y + area.shape[0] + _INPAINT_RADIUS * 2)
+        roi = image[top:bottom, left:right]
+        gray = roi if roi.ndim == 2 else cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+        gate = np.zeros_like(mask)
+        gate[y - top:y - top + area.shape[0], x - left:x - left + area.shape[1]] = area
+        cv2.bitwise_and(mask, gate, dst=mask)
+        inpainted = pool.take_like(image)
+        if inpainted is None:
+            inpainted = np.empty_like(image)
+        np.copyto(inpainted, image)
+        inpainted[top:bottom, left:right] = cv2.inpaint(roi, mask, _INPAINT_RADIUS, flags)
+        return inpainted
+
+    # 生成水印掩码（单通道灰度图像直接使用）
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=pool.take(image.shape[:2]))
+    _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV, dst=pool.take(image.shape[:2]))
+    if gray is not image:
+        pool.give(gray)
+
     # 应用Inpainting
-    inpainted = cv2.inpaint(image, mask, 3, flags)
+    inpainted = cv2.inpaint(image, mask, _INPAINT_RADIUS, flags, dst=pool.take_like(image))
+    pool.give(mask)
 
     return inpainted
 
-def enhance_image(image: np.ndarray, contrast_level: int = 2, denoising_method: str = "Gaussian", denoising_kernel: int = 3, sharpening: bool = False, sharpening_strength: int = 3) -> np.ndarray:
+def enhance_image(image: np.ndarray, contrast_level: int = 2, denoising_method: str = "Gaussian", denoising_kernel: int = 3, sharpening: bool = False, sharpening_strength: int = 3, pool=NULL_POOL) -> np.ndarray:
     """
     优化图像的可读性。
     :param image: 输入图像
@@ -65,6 +138,7 @@ def enhance_image(image: np.ndarray, contrast_level: int = 2, denoising_method:
     :param denoising_kernel: 去噪内核大小（奇数）
     :param sharpening: 是否进行锐化
     :param sharpening_strength: 锐化强度，1-5
+    :param pool: 缓冲区池，中间图像和输出图像从中取出，中间图像用完即归还
     :return: 增强后的图像
     """
     # 对比度调整
@@ -84,16 +158,18 @@ def enhance_image(image: np.ndarray, contrast_level: int = 2, denoising_method:
         alpha = 1.5
         beta = 30
 
-    contrasted = cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
+    contrasted = cv2.convertScaleAbs(image, alpha=alpha, beta=beta, dst=pool.take_like(image))
 
     # 去噪
     if denoising_method == "Gaussian":
-        denoised = cv2.GaussianBlur(contrasted, (denoising_kernel, denoising_kernel), 0)
+        denoised = cv2.GaussianBlur(contrasted, (denoising_kernel, denoising_kernel), 0, dst=pool.take_like(contrasted))
     elif denoising_method == "Median":
-        denoised = cv2.medianBlur(contrasted, denoising_kernel)
+        denoised = cv2.medianBlur(contrasted, denoising_kernel, dst=pool.take_like(contrasted))
     else:
         logging.warning(f"Unsupported denoising method: {denoising_method}, skipping denoising")
         denoised = contrasted
+    if denoised is not contrasted:
+        pool.give(contrasted)
 
     # 锐化
     if sharpening:
@@ -101,13 +177,14 @@ def enhance_image(image: np.ndarray, contrast_level: int = 2, denoising_method:
         kernel = np.array([[0, -1, 0],
                            [-1, 5, -1],
                            [0, -1, 0]], dtype=np.float32)
-        sharpened = cv2.filter2D(denoised, -1, kernel * sharpening_strength)
+        sharpened = cv2.filter2D(denoised, -1, kernel * sharpening_strength, dst=pool.take_like(denoised))
+        pool.give(denoised)
     else:
         sharpened = denoised
 
     return sharpened
 
-def convert_grayscale(image: np.ndarray, quant_levels: int = 64, scale_factor: int = 1, smoothing_method: str = "Gaussian", smoothing_kernel: int = 3) -> np.ndarray:
+def convert_grayscale(image: np.ndarray, quant_levels: int = 64, scale_factor: int = 1, smoothing_method: str = "Gaussian", smoothing_kernel: int = 3, pool=NULL_POOL) -> np.ndarray:
     """
     将图像转换为灰度图像，并应用量化、缩放和平滑。
     :param image: 输入图像
@@ -115,192 +192,1086 @@ def convert_grayscale(image: np.ndarray, quant_levels: int = 64, scale_factor: i
     :param scale_factor: 缩放比例（1-5）
     :param smoothing_method: 平滑方法，"Gaussian"或"Median"
     :param smoothing_kernel: 平滑内核大小（奇数）
-    :return: 转换后的灰度图像
+    :param pool: 缓冲区池，中间图像和输出图像从中取出，中间图像用完即归还
+    :return: 转换后的灰度图像；输入为单通道图像时输出单通道图像，否则输出三通道图像
     """
     # 转换为灰度图像
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    single_channel = image.ndim == 2
+    gray = image if single_channel else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=pool.take(image.shape[:2]))
 
-    # 灰度量化
-    gray_quant = np.floor_divide(gray, 256 // quant_levels) * (256 // quant_levels)
-    gray_quant = gray_quant.astype(np.uint8)
+    # 灰度量化：一次遍历完成，新转换得到的灰度图像直接原地修改
+    gray_quant = quantize(gray, quant_levels, dst=pool.take_like(gray) if single_channel else gray)
 
     # 缩放
     if scale_factor != 1:
         width = int(gray_quant.shape[1] * scale_factor)
         height = int(gray_quant.shape[0] * scale_factor)
-        gray_quant = cv2.resize(gray_quant, (width, height), interpolation=cv2.INTER_LINEAR)
+        resized = cv2.resize(gray_quant, (width, height), dst=pool.take((height, width)), interpolation=cv2.INTER_LINEAR)
+        pool.give(gray_quant)
+        gray_quant = resized
 
     # 平滑
     if smoothing_method == "Gaussian":
-        smoothed = cv2.GaussianBlur(gray_quant, (smoothing_kernel, smoothing_kernel), 0)
+        smoothed = cv2.GaussianBlur(gray_quant, (smoothing_kernel, smoothing_kernel), 0, dst=pool.take_like(gray_quant))
     elif smoothing_method == "Median":
-        smoothed = cv2.medianBlur(gray_quant, smoothing_kernel)
+        smoothed = cv2.medianBlur(gray_quant, smoothing_kernel, dst=pool.take_like(gray_quant))
     else:
         logging.warning(f"Unsupported smoothing method: {smoothing_method}, skipping smoothing")
         smoothed = gray_quant
+    if smoothed is not gray_quant:
+        pool.give(gray_quant)
+
+    if single_channel:
+        return smoothed
 
     # 转换回BGR以保持一致性
-    gray_final = cv2.cvtColor(smoothed, cv2.COLOR_GRAY2BGR)
+    gray_final = cv2.cvtColor(smoothed, cv2.COLOR_GRAY2BGR, dst=pool.take(smoothed.shape + (3,)))
+    pool.give(smoothed)
 
     return gray_final
 
-def deskew_pdf(input_pdf_path, output_pdf_path, dpi=300, background_color=(255, 255, 255), progress_callback=None, current_page_callback=None, status_callback=None, is_running_callback=None, selected_features=None):
+# 支持的输出模式
+OUTPUT_MODES = ("raster", "transform")
+
+# 支持的倾斜检测算法："deskew" 为 deskew 库的 Hough 变换，"projection" 为内置的投影轮廓检测
+SKEW_DETECTORS = ("deskew", "projection")
+
+# 会修改像素的图像处理功能
+IMAGE_STAGES = ("remove_watermark", "enhance_image", "convert_grayscale")
+
+# 各图像处理功能读取的参数（第一项为是否启用该功能）；这些参数不变时，该功能对同一输入的输出不变
+STAGE_FEATURES = {
+    "remove_watermark": ("remove_watermark", "watermark_method", "inpainting_algorithm", "watermark_threshold"),
+    "enhance_image": ("enhance_image", "contrast_level", "denoising_method", "denoising_kernel", "sharpening",
+                      "sharpening_strength"),
+    "convert_grayscale": ("convert_grayscale", "grayscale_quant_levels", "grayscale_scale_factor",
+                          "grayscale_smoothing_method", "grayscale_smoothing_kernel"),
+}
+
+# 光栅化页面的像素格式："color" 为 RGB 三通道；"gray" 直接以灰度解码或渲染，
+# 各处理阶段和旋转均在单通道图像上进行，输出单通道图像；"bilevel" 在渲染后立即二值化，
+# 检测、旋转均在单通道图像上进行，输出 1 位图像（此模式下不应用图像处理功能）
+COLOR_MODES = ("color", "gray", "bilevel")
+
+# 未选中页面的处理方式："copy" 原样复制到输出文件，"drop" 不输出
+UNSELECTED_PAGE_MODES = ("copy", "drop")
+
+# 分块处理的内存估计。整页处理时渲染图像、各处理阶段的输入输出、旋转结果和编码临时图像
+# 最多约有 5 份整页图像同时存在；分块处理时每个图块的源区域约有 4 份，输出图块约有 2 份
+_FULL_PAGE_COPIES = 5
+_TILE_SOURCE_COPIES = 4
+_TILE_OUTPUT_COPIES = 2
+# 图块边长按 JPEG 的 16 像素编码块对齐，且不小于 _MIN_TILE
+_TILE_ALIGN = 16
+_MIN_TILE = 64
+# deskew 库的 Hough 检测会生成多份浮点数组，按每像素 32 字节估计检测图像的内存占用
+_DETECT_BYTES_PER_PIXEL = 32
+# 修复（inpaint）从掩码边界向内传播，超出半径的影响很小，分块时按此宽度扩展图块边缘
+_INPAINT_HALO = 16
+
+@dataclass
+class _PageSettings:
+    """单页处理参数，在主进程与工作进程之间传递。"""
+    dpi: int
+    background_color: tuple
+    selected_features: dict
+    detect_dpi: Optional[int] = None
+    output_mode: str = "raster"
+    angle_tolerance: float = 0.0
+    native_images: bool = True
+    skew_detector: str = "deskew"
+    profile: bool = False
+    output_encoding: str = "auto"
+    jpeg_quality: int = 75
+    color_mode: str = "color"
+    memory_budget: Optional[int] = None
+    # 文档级水印模型，由主进程在处理前估计一次，随参数传给工作进程
+    watermark_model: Optional[WatermarkModel] = None
+    # 在结果中附带校正后的图像数组：True 为全部页面，也可以是页码（从 0 开始）集合
+    keep_arrays: Union[bool, frozenset] = False
+
+@dataclass
+class PageResult:
     """
-    校正 PDF 文件中的图像倾斜，并根据用户选择应用图像处理功能。
+    单页处理结果，由 iter_deskewed_pages 逐页产出。
+    kind 为 "raster" 时 image 为校正后的编码图像（分块处理的页面为 TiledImage），image.read() 返回编码数据；
+    为 "transform" 时 image 为 None，输出页面通过旋转源页面的原始内容生成；为 "copy" 时页面无需校正，原样复制源页面。
+    selected 为 False 表示未被选中处理、原样复制的页面。
+    array 为校正后的图像（RGB 三通道或单通道），仅在要求返回图像时对整页处理的光栅化页面提供。
+    seconds 为处理该页的墙钟时间（从断点续传日志读取或未选中的页面为 0）；
+    stage_records 为工作进程中测量的各阶段性能数据，由主进程汇总。
     """
-    # 打开 PDF 文件，添加错误处理
+    page_num: int
+    angle: Optional[float]
+    image: Optional[EncodedImage]  # 或 TiledImage
+    dpi: float
+    kind: str = "raster"
+    stage_records: list = field(default_factory=list)
+    selected: bool = True
+    array: Optional[np.ndarray] = None
+    seconds: float = 0.0
+
+@dataclass
+class DeskewReport:
+    """deskew_pdf 的处理结果：输出页数及各页检测到的倾斜角度（未检测到时为 None）。"""
+    pages: int
+    angles: list
+
+def detect_skew(image: np.ndarray, image_dpi: float, detect_dpi: Optional[float] = None, detector: str = "deskew") -> Optional[float]:
+    """
+    检测图像的倾斜角度。倾斜角度与分辨率无关，因此可在降采样后的图像上检测以节省时间。
+    :param image: 输入图像（三通道或单通道）
+    :param image_dpi: 输入图像的分辨率
+    :param detect_dpi: 检测时使用的分辨率，为 None 或不低于 image_dpi 时使用原始分辨率
+    :param detector: 检测算法，见 SKEW_DETECTORS
+    :return: 倾斜角度，未检测到时为 None
+    """
+    if detect_dpi and detect_dpi < image_dpi:
+        scale = detect_dpi / image_dpi
+        width = max(1, int(round(image.shape[1] * scale)))
+        height = max(1, int(round(image.shape[0] * scale)))
+        # INTER_AREA 在缩小时相当于按面积平均，能保留文本行的方向信息
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    if image.ndim == 3 and image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if detector == "projection":
+        return projection_skew(image)
+    return determine_skew(image)
+
+def parse_page_ranges(spec: str, total_pages: int) -> list:
+    """
+    解析页码范围，如 "1-10,57,200-"。页码从 1 开始；"200-" 表示第 200 页到最后一页，"-5" 表示前 5 页。
+    超出文档页数的部分被忽略。
+    :param spec: 逗号分隔的页码或页码范围
+    :param total_pages: 文档总页数
+    :return: 排序去重后的页码列表（从 0 开始）
+    """
+    selected = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, separator, last = part.partition("-")
+        try:
+            start = int(first) if first.strip() else 1
+            end = int(last) if last.strip() else None
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part!r}")
+        if not separator:
+            end = start
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Invalid page range: {part!r}")
+        selected.update(range(start - 1, total_pages if end is None else min(end, total_pages)))
+    return sorted(selected)
+
+def _replace(pool, old, new):
+    """用 new 替换 old：两者不是同一数组时把 old 归还缓冲区池。:return: new"""
+    if new is not old:
+        pool.give(old)
+    return new
+
+def _stages_enabled(selected_features):
+    """是否选择了任何会修改像素的图像处理功能。"""
+    return any(selected_features.get(stage, False) for stage in IMAGE_STAGES)
+
+def _needs_reencode(settings, features):
+    """
+    光栅化输出时倾斜可忽略的页面是否也必须重新编码：选择了图像处理功能，或指定了非默认的像素格式或输出编码。
+    原样复制的页面保留源页面的内容和编码，不满足这些设置。
+    :param features: 实际应用的图像处理功能（二值模式下为空）
+    """
+    return _stages_enabled(features) or settings.color_mode != "color" or settings.output_encoding != "auto"
+
+def _apply_image_stages(img, selected_features, stage_callback=None, stages=IMAGE_STAGES, recorder=NULL_RECORDER, page_num=None, pool=NULL_POOL, watermark_region=None):
+    """
+    按用户选择依次应用去水印、图像增强和灰度转换。
+    :param stages: 本次调用允许执行的处理功能，用于把处理流程拆分在倾斜检测前后
+    :param watermark_region: 使用文档级水印模型时，img 上的水印区域（见 WatermarkModel.region）
+    :param recorder: 性能记录器，按页码 page_num 记录每个处理功能的耗时
+    :param pool: 缓冲区池。各处理功能的输出从中取出，每个功能的输入（包括传入的 img）在其完成后归还，
+                 因此调用后不得再使用传入的 img
+    :return: (处理后的图像, 图像相对输入的缩放比例)
+    """
+    scale = 1
+    # 图像预处理
+    # 1. 根据用户选择移除水印
+    if "remove_watermark" in stages and selected_features.get("remove_watermark", False):
+        method = selected_features.get("watermark_method", "Inpainting")
+        algorithm = selected_features.get("inpainting_algorithm", "Telea")
+        threshold = selected_features.get("watermark_threshold", 127)
+        with recorder.stage(page_num, "remove_watermark"):
+            img = _replace(pool, img, remove_watermark(img, method=method, algorithm=algorithm, threshold=threshold,
+                                                       pool=pool, region=watermark_region))
+        if stage_callback:
+            stage_callback(5, "Removing watermarks...")
+
+    # 2. 根据用户选择增强图像
+    if "enhance_image" in stages and selected_features.get("enhance_image", False):
+        contrast_level = selected_features.get("contrast_level", 2)
+        denoising_method = selected_features.get("denoising_method", "Gaussian")
+        denoising_kernel = selected_features.get("denoising_kernel", 3)
+        sharpening = selected_features.get("sharpening", False)
+        sharpening_strength = selected_features.get("sharpening_strength", 3)
+        with recorder.stage(page_num, "enhance_image"):
+            img = _replace(pool, img, enhance_image(
+                img,
+                contrast_level=contrast_level,
+                denoising_method=denoising_method,
+                denoising_kernel=denoising_kernel,
+                sharpening=sharpening,
+                sharpening_strength=sharpening_strength,
+                pool=pool
+            ))
+        if stage_callback:
+            stage_callback(10, "Enhancing image readability...")
+
+    # 3. 根据用户选择转换为灰度图像
+    if "convert_grayscale" in stages and selected_features.get("convert_grayscale", False):
+        quant_levels = selected_features.get("grayscale_quant_levels", 64)
+        scale_factor = selected_features.get("grayscale_scale_factor", 1)
+        smoothing_method = selected_features.get("grayscale_smoothing_method", "Gaussian")
+        smoothing_kernel = selected_features.get("grayscale_smoothing_kernel", 3)
+        with recorder.stage(page_num, "convert_grayscale"):
+            img = _replace(pool, img, convert_grayscale(
+                img,
+                quant_levels=quant_levels,
+                scale_factor=scale_factor,
+                smoothing_method=smoothing_method,
+                smoothing_kernel=smoothing_kernel,
+                pool=pool
+            ))
+        # 灰度缩放会改变像素尺寸
+        scale = scale_factor
+        if stage_callback:
+            stage_callback(15, "Converting to grayscale...")
+
+    return img, scale
+
+def _render_page(page, dpi, pool=NULL_POOL):
+    """将页面渲染为三通道图像。图像直接引用 Pixmap 的像素内存，不复制。"""
+    pix = page.get_pixmap(dpi=dpi)
+    img = pixmap_array(pix)
+
+    # 如果图像是灰度，则转换为 RGB
+    if img.shape[2] == 1:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR, dst=pool.take(img.shape[:2] + (3,)))
+    return img
+
+def _native_image(pdf_document, page):
+    """
+    判断页面是否只由一张铺满页面、未旋转的嵌入图像构成（典型的扫描件）。
+    :return: (图像 xref, 图像分辨率)；不是这样的页面时返回 None
+    """
+    if page.rotation or page.first_annot is not None:
+        return None
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    xref, smask = images[0][0], images[0][1]
+    if smask or pdf_document.xref_get_key(xref, "ImageMask")[1] == "true":
+        return None
+    # 带 Decode 数组的图像需按 PDF 语义反转取值，交由渲染处理
+    if pdf_document.xref_get_key(xref, "Decode")[0] != "null":
+        return None
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    rect, matrix = placements[0]
+    # 只接受未旋转、未翻转的放置方式
+    if matrix.b or matrix.c or matrix.a <= 0 or matrix.d <= 0:
+        return None
+    page_rect = page.rect
+    tolerance = 0.01 * max(page_rect.width, page_rect.height)
+    if any(abs(a - b) > tolerance for a, b in zip(rect, page_rect)):
+        return None
+    if page.get_text("text").strip() or page.get_drawings():
+        return None
+
+    width, height = images[0][2], images[0][3]
+    dpi_x = width * 72 / rect.width
+    dpi_y = height * 72 / rect.height
+    # 水平与垂直分辨率不一致时需要重新采样，交由渲染处理
+    if abs(dpi_x - dpi_y) > 0.01 * dpi_x:
+        return None
+    return xref, dpi_x
+
+def _extract_native_image(pdf_document, page, gray=False, pool=NULL_POOL):
+    """
+    若页面只由一张铺满页面、未旋转的嵌入图像构成（典型的扫描件），按其原始分辨率解码该图像，
+    避免按渲染 DPI 重新采样。返回的图像归调用方所有，可以原地修改。
+    :param pdf_document: 已打开的 fitz 文档
+    :param page: fitz 页面
+    :param gray: 为 True 时直接解码为单通道灰度图像
+    :param pool: 缓冲区池，MuPDF 直接解码的图像复制到从中取出的数组
+    :return: (RGB 三通道或单通道灰度图像, 图像分辨率)；页面含有其他内容或无法直接解码时返回 None
+    """
+    native = _native_image(pdf_document, page)
+    if native is None:
+        return None
+    xref, dpi_x = native
+    info = pdf_document.extract_image(xref)
+    if not info:
+        return None
+    width, height = info["width"], info["height"]
+
+    img = None
+    # CMYK JPEG 常带有 Adobe 反相标记，OpenCV 的解码结果不可靠
+    if info["colorspace"] in (1, 3):
+        flags = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
+        img = cv2.imdecode(np.frombuffer(info["image"], dtype=np.uint8), flags)
+    if img is not None and img.shape[:2] == (height, width):
+        if not gray:
+            # 解码结果只在此处使用，原地交换通道
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+    else:
+        # OpenCV 无法解码的格式（如 JPX、CMYK）由 MuPDF 解码
+        colorspace = fitz.csGRAY if gray else fitz.csRGB
+        pix = fitz.Pixmap(pdf_document, xref)
+        converted = pix.colorspace is None or pix.colorspace.n != colorspace.n or pix.alpha
+        if converted:
+            pix = fitz.Pixmap(colorspace, pix)
+            if pix.alpha:
+                pix = fitz.Pixmap(pix, 0)
+        img = pixmap_array(pix)
+        if gray:
+            img = img.reshape(pix.height, pix.width)
+        if not converted:
+            # 由 xref 直接解码的 Pixmap 与 MuPDF 缓存中的条目共用像素内存，后续处理会原地修改图像，须先复制
+            img = cv2.copyTo(img, None, dst=pool.take_like(img))
+    return img, dpi_x
+
+def _load_page_image(pdf_document, page, settings, pool=NULL_POOL):
+    """
+    获取待处理的页面图像：单图扫描页直接解码嵌入图像，其他页面按设置的 DPI 渲染。
+    灰度模式下直接以灰度解码或渲染，二值模式下再立即二值化。
+    :return: (RGB 三通道图像、单通道灰度图像或 0/255 单通道二值图像, 图像分辨率)
+    """
+    color_mode = _effective_color_mode(settings)
+    bilevel = color_mode == "bilevel"
+    gray = color_mode != "color"
+    native = _extract_native_image(pdf_document, page, gray=gray, pool=pool) if settings.native_images else None
+    if native is not None:
+        img, image_dpi = native
+    elif gray:
+        img, image_dpi = _render_gray(page, settings.dpi), settings.dpi
+    else:
+        return _render_page(page, settings.dpi, pool), settings.dpi
+    if bilevel:
+        # 解码或渲染得到的灰度图像只在此处使用，原地二值化
+        img = binarize(img, dst=img)
+    return img, image_dpi
+
+def _effective_color_mode(settings):
+    """实际使用的像素格式：彩色模式下选择了灰度转换时，输出必为灰度，直接走灰度流程。"""
+    if settings.color_mode == "color" and settings.selected_features.get("convert_grayscale", False):
+        return "gray"
+    return settings.color_mode
+
+def _render_gray(page, dpi):
+    """将页面直接渲染为单通道灰度图像，图像直接引用 Pixmap 的像素内存，不复制。"""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return pixmap_array(pix).reshape(pix.height, pix.width)
+
+def _detection_params(settings):
+    """
+    影响倾斜检测输入的参数，作为角度缓存键的一部分。
+    图像增强和灰度转换在检测之后进行，不影响检测结果，因此不计入。
+    """
+    features = settings.selected_features
+    params = {
+        "dpi": settings.dpi,
+        "detect_dpi": settings.detect_dpi,
+        "native_images": settings.native_images,
+        "skew_detector": settings.skew_detector,
+        "remove_watermark": bool(features.get("remove_watermark", False)),
+    }
+    # 二值模式在二值化后的图像上检测；彩色和灰度模式都在灰度图像上检测，不写入此项，以保持原有的缓存键不变
+    if settings.color_mode == "bilevel":
+        params["color_mode"] = settings.color_mode
+    # 分块处理时检测分辨率可能受内存预算限制
+    if settings.memory_budget is not None:
+        params["memory_budget"] = settings.memory_budget
+    if params["remove_watermark"]:
+        params["watermark_method"] = features.get("watermark_method", "Inpainting")
+        params["inpainting_algorithm"] = features.get("inpainting_algorithm", "Telea")
+        params["watermark_threshold"] = features.get("watermark_threshold", 127)
+        if settings.watermark_model is not None:
+            params["watermark_mask"] = settings.watermark_model.fingerprint
+    return params
+
+def _journal_settings(settings):
+    """影响输出结果的处理参数，用于确认断点续传日志属于同一次处理。"""
+    model = settings.watermark_model
+    values = asdict(replace(settings, watermark_model=None))
+    values.pop("profile")
+    values.pop("keep_arrays")
+    values["watermark_model"] = None if model is None else model.fingerprint
+    return values
+
+def _watermark_region(settings, width, height, box=None):
+    """文档级水印模型在 (宽, 高) 像素的整页图像（或其中的 box 范围）上的水印区域；未使用模型时为 None。"""
+    model = settings.watermark_model
+    return None if model is None else model.region(width, height, box)
+
+def _is_negligible(angle, tolerance):
+    """未检测到倾斜或倾斜角度不超过容差时无需校正。"""
+    return angle is None or abs(angle) <= tolerance
+
+def _page_pixel_size(page, dpi):
+    """页面按 dpi 渲染时的像素尺寸 (宽, 高)。"""
+    rect = (page.rect * fitz.Matrix(dpi / 72, dpi / 72)).irect
+    return rect.width, rect.height
+
+def _render_clip(page, dpi, box, gray=False):
+    """
+    按 dpi 只渲染页面的一部分，结果与整页渲染图像中的对应区域一致。
+    :param box: 整页渲染图像中的像素范围 (x0, y0, x1, y1)
+    :return: RGB 三通道或单通道灰度图像，直接引用 Pixmap 的像素内存
+    """
+    # dpi 可能是嵌入图像的非整数分辨率，通过缩放矩阵指定
+    clip = fitz.Rect(box) * (72 / dpi)
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), clip=clip,
+                          colorspace=fitz.csGRAY if gray else fitz.csRGB)
+    img = pixmap_array(pix)
+    return img.reshape(pix.height, pix.width) if gray else img
+
+def _stage_halo(selected_features):
+    """分块应用图像处理功能时图块每侧需要扩展的像素数，使滤波结果与整页处理一致（去水印为近似）。"""
+    halo = 0
+    if selected_features.get("remove_watermark", False):
+        halo += _INPAINT_HALO
+    if selected_features.get("enhance_image", False):
+        halo += selected_features.get("denoising_kernel", 3) // 2
+        if selected_features.get("sharpening", False):
+            halo += 1
+    if selected_features.get("convert_grayscale", False):
+        # 缩放时线性插值还需要一个相邻像素
+        halo += selected_features.get("grayscale_smoothing_kernel", 3) // 2 + 1
+    return halo
+
+def _raster_dpi(pdf_document, page, settings):
+    """页面光栅化处理时的分辨率：单图扫描页为嵌入图像的原始分辨率，其他页面为设置的 DPI。"""
+    native = _native_image(pdf_document, page) if settings.native_images else None
+    return settings.dpi if native is None else native[1]
+
+def _needs_tiling(page, dpi, settings):
+    """按整页处理的估计内存判断页面在 dpi 分辨率下是否超出内存预算，需要分块处理。"""
+    if settings.memory_budget is None or settings.output_mode == "transform":
+        return False
+    width, height = _page_pixel_size(page, dpi)
+    features = settings.selected_features
+    scale = features.get("grayscale_scale_factor", 1) if features.get("convert_grayscale", False) else 1
+    channels = 3 if _effective_color_mode(settings) == "color" else 1
+    return width * height * scale ** 2 * channels * _FULL_PAGE_COPIES > settings.memory_budget * 2 ** 20
+
+def _tile_size(budget, channels, halo):
+    """
+    在内存预算内的最大输出图块边长。输出图块旋转后对应的源区域最大为其 √2 倍（倾斜 45° 时），
+    再加上两侧的 halo 和插值所需的像素。
+    :param budget: 内存预算（字节）
+    :param halo: 处理后图像中每侧扩展的像素数
+    """
+    def tile_bytes(tile):
+        source = tile * 1.415 + 2 * (halo + 2)
+        return channels * (_TILE_SOURCE_COPIES * source ** 2 + _TILE_OUTPUT_COPIES * tile ** 2)
+
+    tile = _MIN_TILE
+    while tile_bytes(tile + _TILE_ALIGN) <= budget:
+        tile += _TILE_ALIGN
+    return tile
+
+def _process_page_tiled(page, page_num, dpi, settings, stage_callback=None, angle_known=False, known_angle=None, recorder=NULL_RECORDER, pool=NULL_POOL):
+    """
+    分块处理超出内存预算的页面，整页图像从不完整地存在于内存中：
+    在低分辨率的整页灰度渲染上检测倾斜后，把旋转后的输出图像划分为图块，对每个图块反算其在源图像中的区域，
+    只渲染该区域（各侧扩展 halo 像素），应用图像处理功能并去掉 halo，再旋转映射到输出图块并单独编码。
+    单图扫描页不整幅解码，而是按嵌入图像的原始分辨率分块渲染；二值模式使用在检测图像上计算的统一 Otsu 阈值，
+    避免各图块阈值不同。
+    :param dpi: 渲染分辨率，见 _raster_dpi
+    :return: PageResult，image 为 TiledImage
+    """
+    color_mode = _effective_color_mode(settings)
+    bilevel = color_mode == "bilevel"
+    gray = color_mode != "color"
+    features = {} if bilevel else settings.selected_features
+    budget = settings.memory_budget * 2 ** 20
+    width, height = _page_pixel_size(page, dpi)
+
+    # 检测图像同样受内存预算限制
+    detect_dpi = max(1, int(min(settings.detect_dpi or dpi,
+                                dpi * np.sqrt(budget / (_DETECT_BYTES_PER_PIXEL * width * height)))))
+    threshold = None
+    with recorder.stage(page_num, "detect"):
+        detect_image = _render_gray(page, detect_dpi)
+        if bilevel:
+            threshold, _ = cv2.threshold(detect_image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        if angle_known:
+            angle = known_angle
+        else:
+            region = _watermark_region(settings, detect_image.shape[1], detect_image.shape[0])
+            detect_image, _ = _apply_image_stages(detect_image, features, stages=("remove_watermark",),
+                                                  watermark_region=region)
+            if bilevel:
+                detect_image = binarize(detect_image, dst=detect_image)
+            angle = detect_skew(detect_image, detect_dpi, detector=settings.skew_detector)
+        del detect_image
+    if not _needs_reencode(settings, features) and _is_negligible(angle, settings.angle_tolerance):
+        return PageResult(page_num, angle, None, settings.dpi, kind="copy")
+
+    scale = features.get("grayscale_scale_factor", 1) if features.get("convert_grayscale", False) else 1
+    halo = _stage_halo(features)
+    channels = 1 if gray else 3
+    tile = _tile_size(budget, channels, halo * scale)
+    rot_mat, (output_width, output_height) = _rotation_matrix(width * scale, height * scale, angle or 0.0)
+    inverse = cv2.invertAffineTransform(rot_mat)
+    fill = _fill_value(settings.background_color, gray, bilevel)
+
+    tiles = []
+    with recorder.stage(page_num, "tiles"):
+        for y in range(0, output_height, tile):
+            for x in range(0, output_width, tile):
+                tile_width, tile_height = min(tile, output_width - x), min(tile, output_height - y)
+                shape = (tile_height, tile_width) if gray else (tile_height, tile_width, 3)
+                # 输出图块四角在处理后源图像中的位置，外扩 2 像素供双线性插值使用
+                corners = np.array([[x, y], [x + tile_width, y], [x, y + tile_height],
+                                    [x + tile_width, y + tile_height]], dtype=np.float64)
+                mapped = corners @ inverse[:, :2].T + inverse[:, 2]
+                x0 = max(0, int(np.floor(mapped[:, 0].min())) - 2)
+                y0 = max(0, int(np.floor(mapped[:, 1].min())) - 2)
+                x1 = min(width * scale, int(np.ceil(mapped[:, 0].max())) + 2)
+                y1 = min(height * scale, int(np.ceil(mapped[:, 1].max())) + 2)
+                if x0 >= x1 or y0 >= y1:
+                    # 图块完全落在旋转后露出的角落中
+                    output = pool.take(shape)
+                    if output is None:
+                        output = np.empty(shape, dtype=np.uint8)
+                    output[...] = fill if gray else fill[:3]
+                else:
+                    # 对应的源像素范围（灰度缩放前），各侧扩展 halo，使图块边缘的滤波结果与整页处理一致
+                    box = (max(0, x0 // scale - halo), max(0, y0 // scale - halo),
+                           min(width, -(-x1 // scale) + halo), min(height, -(-y1 // scale) + halo))
+                    source = _render_clip(page, dpi, box, gray)
+                    if bilevel:
+                        source = cv2.threshold(source, threshold, 255, cv2.THRESH_BINARY, dst=source)[1]
+                    processed, _ = _apply_image_stages(source, features, pool=pool,
+                                                       watermark_region=_watermark_region(settings, width, height, box))
+                    offset_x, offset_y = x0 - box[0] * scale, y0 - box[1] * scale
+                    region = processed[offset_y:offset_y + y1 - y0, offset_x:offset_x + x1 - x0]
+                    tile_mat = rot_mat.copy()
+                    tile_mat[:, 2] += rot_mat[:, :2] @ (x0, y0) - (x, y)
+                    output = cv2.warpAffine(region, tile_mat, (tile_width, tile_height), dst=pool.take(shape),
+                                            borderValue=fill)
+                    pool.give(processed)
+                    del source, processed, region
+                    if bilevel:
+                        cv2.threshold(output, 127, 255, cv2.THRESH_BINARY, dst=output)
+                tiles.append((x, y, encode_page(output, settings.output_encoding, settings.jpeg_quality,
+                                                bilevel=bilevel, pool=pool)))
+                pool.give(output)
+    # 释放 MuPDF 为渲染各图块缓存的解码图像
+    fitz.TOOLS.store_shrink(100)
+    if stage_callback:
+        stage_callback(15, f"Processed page in {len(tiles)} tiles")
+    return PageResult(page_num, angle, TiledImage(output_width, output_height, tiles), dpi * scale)
+
+def _process_page(pdf_document, page_num, settings, stage_callback=None, angle_known=False, known_angle=None, recorder=NULL_RECORDER, pool=NULL_POOL):
+    """
+    渲染（或直接解码扫描图像）单页，按用户选择应用图像处理功能，校正倾斜并编码校正后的图像。
+    倾斜检测在去水印之后、图像增强和灰度转换之前进行。
+    倾斜可忽略且无需重新编码（见 _needs_reencode）的页面由写入端直接复制源页面。
+    :param pdf_document: 已打开的 fitz 文档
+    :param page_num: 页码（从 0 开始）
+    :param settings: _PageSettings 处理参数
+    :param stage_callback: 可选，每完成一个处理阶段时以 (进度增量, 状态信息) 调用
+    :param angle_known: 为 True 时跳过倾斜检测，直接使用 known_angle（例如来自角度缓存）
+    :param known_angle: 已知的倾斜角度，None 表示未检测到倾斜
+    :param recorder: 性能记录器，记录渲染、各处理功能、检测、旋转和编码阶段
+    :param pool: 缓冲区池，各阶段的整页图像从中取出，页面处理完成后全部归还，供后续页面复用
+    :return: PageResult
+    """
+    page = pdf_document.load_page(page_num)
+    if settings.memory_budget is not None:
+        raster_dpi = _raster_dpi(pdf_document, page, settings)
+        if _needs_tiling(page, raster_dpi, settings):
+            return _process_page_tiled(page, page_num, raster_dpi, settings, stage_callback, angle_known, known_angle,
+                                       recorder, pool)
+
+    dpi = settings.dpi
+    detect_dpi = settings.detect_dpi or dpi
+    bilevel = _effective_color_mode(settings) == "bilevel"
+    # 二值模式下不应用图像处理功能
+    features = {} if bilevel else settings.selected_features
+    stages_enabled = _stages_enabled(features)
+    reencode = _needs_reencode(settings, features)
+
+    if settings.output_mode == "transform" or (not stages_enabled and detect_dpi < dpi):
+        # 无需处理像素时，先在低分辨率灰度渲染上测量角度，只有需要校正时才进行全分辨率渲染
+        if angle_known:
+            angle = known_angle
+        else:
+            with recorder.stage(page_num, "detect"):
+                gray = _render_gray(page, detect_dpi)
+                angle = detect_skew(binarize(gray, dst=gray) if bilevel else gray, detect_dpi,
+                                    detector=settings.skew_detector)
+        # 变换模式不光栅化页面，倾斜可忽略时总是复制
+        if _is_negligible(angle, settings.angle_tolerance) and (settings.output_mode == "transform" or not reencode):
+            return PageResult(page_num, angle, None, dpi, kind="copy")
+        # 变换模式：输出时直接旋转原始页面内容
+        if settings.output_mode == "transform":
+            return PageResult(page_num, angle, None, dpi, kind="transform")
+        with recorder.stage(page_num, "render"):
+            img, output_dpi = _load_page_image(pdf_document, page, settings, pool)
+    else:
+        with recorder.stage(page_num, "render"):
+            img, image_dpi = _load_page_image(pdf_document, page, settings, pool)
+        # 水印会干扰倾斜检测，需在检测前移除
+        img, _ = _apply_image_stages(img, features, stage_callback, stages=("remove_watermark",),
+                                     recorder=recorder, page_num=page_num, pool=pool,
+                                     watermark_region=_watermark_region(settings, img.shape[1], img.shape[0]))
+
+        # 在降采样的灰度图像上确定倾斜角度，角度随后应用于全分辨率图像
+        if angle_known:
+            angle = known_angle
+        else:
+            with recorder.stage(page_num, "detect"):
+                angle = detect_skew(img, image_dpi, detect_dpi, settings.skew_detector)
+        if not reencode and _is_negligible(angle, settings.angle_tolerance):
+            pool.give(img)
+            return PageResult(page_num, angle, None, dpi, kind="copy")
+
+        img, scale = _apply_image_stages(img, features, stage_callback,
+                                         stages=("enhance_image", "convert_grayscale"),
+                                         recorder=recorder, page_num=page_num, pool=pool)
+        # 灰度缩放会改变像素尺寸，换算页面大小时需使用等效 DPI
+        output_dpi = image_dpi * scale
+
+    # 如果检测到角度则进行校正，使用自定义背景颜色
+    if angle is not None:
+        with recorder.stage(page_num, "rotate"):
+            corrected_img = _replace(pool, img, rotate_image(img, angle, background=settings.background_color,
+                                                             bilevel=bilevel, pool=pool))
+    else:
+        corrected_img = img
+
+    # 直接在内存中编码校正后的图像，不经过中间文件
+    with recorder.stage(page_num, "encode"):
+        encoded = encode_page(corrected_img, settings.output_encoding, settings.jpeg_quality, bilevel=bilevel,
+                              pool=pool)
+    keep_array = settings.keep_arrays if isinstance(settings.keep_arrays, bool) else page_num in settings.keep_arrays
+    if keep_array:
+        # 图像随结果交给调用方，不再归还缓冲区池
+        return PageResult(page_num, angle, encoded, output_dpi, array=corrected_img)
+    pool.give(corrected_img)
+    return PageResult(page_num, angle, encoded, output_dpi)
+
+# 工作进程中各自打开的输入文档及各自的缓冲区池
+_worker_document = None
+_worker_pool = NULL_POOL
+
+def _init_worker(input_pdf_path):
+    """进程池初始化函数：每个工作进程打开自己的 fitz 文档，并创建在其处理的各页之间复用的缓冲区池。"""
+    global _worker_document, _worker_pool
+    _worker_document = fitz.open(input_pdf_path)
+    _worker_pool = BufferPool()
+
+def _worker_process_page(task, settings, spill_dir=None):
+    """
+    在工作进程中处理单页；指定 spill_dir 时编码数据写入磁盘，只回传文件路径。
+    :param task: (页码, 角度是否已知, 已知角度)
+    """
+    page_num, angle_known, known_angle = task
+    with ProfileRecorder() if settings.profile else NULL_RECORDER as recorder:
+        start = time.perf_counter()
+        result = _process_page(_worker_document, page_num, settings, angle_known=angle_known, known_angle=known_angle,
+                               recorder=recorder, pool=_worker_pool)
+        result.seconds = time.perf_counter() - start
+    fitz.TOOLS.store_shrink(100)
+    if settings.profile:
+        result.stage_records = recorder.records
+    if spill_dir and result.image is not None:
+        result.image.spill(spill_dir, f"page_{page_num}.bin")
+    return result
+
+def _iter_pages_parallel(input_pdf_path, tasks, workers, settings, spill_dir=None):
+    """
+    使用进程池并行处理页面，并按页码顺序逐页产出结果。
+    同时在途的页面数量限制为 workers 的两倍，以免乱序完成的结果堆积在内存中。
+    :param tasks: 按页码顺序的 (页码, 角度是否已知, 已知角度) 序列，提交页面时才逐个取出
+    """
+    pages = iter(tasks)
+    pending = deque()
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(str(input_pdf_path),)
+    )
     try:
-        pdf_document = fitz.open(input_pdf_path)
+        for task in itertools.islice(pages, workers * 2):
+            pending.append(executor.submit(_worker_process_page, task, settings, spill_dir))
+        while pending:
+            result = pending.popleft().result()
+            next_task = next(pages, None)
+            if next_task is not None:
+                pending.append(executor.submit(_worker_process_page, next_task, settings, spill_dir))
+            yield result
+    finally:
+        # 取消时丢弃尚未开始的页面，只等待正在处理的页面结束
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _open_pdf(input_pdf_path):
+    """打开输入 PDF，失败时抛出 IOError。"""
+    try:
+        return fitz.open(input_pdf_path)
     except Exception as e:
         logging.error(f"无法打开 PDF 文件: {e}")
-        if status_callback:
-            status_callback(f"无法打开 PDF 文件: {e}")
         raise IOError(f"无法打开 PDF 文件: {e}")
 
-    output_images = []
-    temp_folder = "temp_images"
+def _select_pages(pages, total_pages):
+    """
+    解析要处理的页面。
+    :param pages: 页码范围字符串、从 0 开始的页码序列或 None（全部页面），见 iter_deskewed_pages
+    :return: 升序的页码列表（从 0 开始）
+    """
+    if pages is None:
+        return list(range(total_pages))
+    if isinstance(pages, str):
+        page_numbers = parse_page_ranges(pages, total_pages)
+    else:
+        page_numbers = sorted({int(page_num) for page_num in pages if 0 <= int(page_num) < total_pages})
+    if not page_numbers:
+        raise ValueError(f"No pages selected out of {total_pages}")
+    return page_numbers
 
-    if not os.path.exists(temp_folder):
-        os.makedirs(temp_folder)
+def _iter_pages_serial(pdf_document, tasks, settings, recorder, stage_callback=None):
+    """
+    在当前进程中逐页处理，各页的整页图像缓冲区在页面之间复用。
+    :param tasks: 按页码顺序的 (页码, 角度是否已知, 已知角度) 序列
+    :param stage_callback: 见 iter_deskewed_pages
+    """
+    pool = BufferPool()
+    for page_num, angle_known, known_angle in tasks:
+        if stage_callback:
+            stage_callback(page_num, 0, None)
+        page_callback = functools.partial(stage_callback, page_num) if stage_callback else None
+        start = time.perf_counter()
+        result = _process_page(pdf_document, page_num, settings, page_callback, angle_known, known_angle, recorder,
+                               pool)
+        result.seconds = time.perf_counter() - start
+        # 释放 MuPDF 为渲染本页缓存的解码图像，缓存不随页数增长
+        fitz.TOOLS.store_shrink(100)
+        yield result
 
+def iter_deskewed_pages(input_pdf_path, dpi=300, background_color=(255, 255, 255), selected_features=None, workers=1, spill_to_disk=False, detect_dpi=None, output_mode="raster", angle_tolerance=0.0, native_images=True, angle_cache=None, skew_detector="deskew", recorder=None, journal_dir=None, resume=False, pages=None, unselected_pages="copy", output_encoding="auto", jpeg_quality=75, color_mode="color", memory_budget=None, with_arrays=False, stage_callback=None):
+    """
+    逐页校正 PDF 中的图像倾斜并按页码顺序产出每页的结果（PageResult），每页处理完成即可取得，
+    不必等待整个文件处理完毕，下游处理（OCR、上传、建立索引等）可以与后续页面的处理同时进行。
+    参数在调用时立即校验；输入文件在开始迭代时才打开，迭代结束或生成器被关闭（close）时关闭，
+    并行处理时同时停止进程池。
+    :param selected_features: 图像处理功能及其参数。其中 watermark_mask（见 WATERMARK_MASKS）为 "document" 时，
+                              先从抽样页面估计一次各页共有的水印区域（WatermarkModel），各页只在该区域内去水印
+    :param detect_dpi: 倾斜检测使用的分辨率，为 None 时与 dpi 相同（命令行默认为 100）；检测到的角度始终应用于 dpi 分辨率的图像
+    :param output_mode: "raster" 将页面光栅化、处理并旋转后重新嵌入；
+                        "transform" 只测量角度，输出时以旋转变换包裹原始页面内容（保留文本层和原始图像），
+                        此模式下不应用图像处理功能
+    :param angle_tolerance: 角度容差（度）。未选择图像处理功能时，未检测到倾斜或倾斜不超过容差的页面原样复制
+    :param native_images: 对只含一张铺满页面的嵌入图像的扫描页，按原始分辨率解码该图像而不是按 dpi 渲染，
+                          输出页面尺寸保持不变；含有文本或其他内容的页面仍按 dpi 渲染
+    :param skew_detector: 倾斜检测算法："deskew"（deskew 库的 Hough 变换，精度 1°）或
+                          "projection"（内置的投影轮廓检测，先粗扫后细化，精度 0.1°，速度更快）
+    :param angle_cache: 可选的 AngleCache 角度缓存。命中的页面跳过倾斜检测，未命中的页面检测后写入缓存；
+                        缓存只在主进程中访问
+    :param recorder: 可选的 ProfileRecorder，记录每页各处理阶段的墙钟时间、CPU 时间和峰值内存；
+                     并行处理时由工作进程测量后汇总到此记录器；由调用方在测量结束后关闭
+    :param journal_dir: 断点续传日志目录。每产出一页之前记录其结果和编码数据；日志目录由调用方在不再需要时删除
+                        （见 journal.remove_journal）
+    :param resume: 为 True 且 journal_dir 中的日志与当前输入和参数一致时，已记录的页面直接从日志读取，不再处理
+    :param output_encoding: 光栅化页面的输出编码（见 OUTPUT_ENCODINGS）："auto" 对纯黑白页面使用 CCITT G4、
+                            其余页面使用 JPEG；"jpeg" 有损；"flate" 无损；"fax" 二值化后使用 CCITT G4。
+                            编码在处理页面的进程中完成
+    :param jpeg_quality: JPEG 编码质量（1-100）
+    :param color_mode: 光栅化页面的像素格式（见 COLOR_MODES）："color" 按 RGB 处理（选择了灰度转换时自动按 "gray" 处理）；
+                       "gray" 以单通道灰度渲染、处理并嵌入；"bilevel" 渲染后立即二值化，
+                       以单通道图像检测和旋转并输出 1 位图像（auto 编码下为 CCITT G4），此模式下不应用图像处理功能
+    :param pages: 只处理选中的页面：页码范围字符串（如 "1-10,57,200-"，页码从 1 开始，见 parse_page_ranges），
+                  或从 0 开始的页码序列；为 None 时处理全部页面
+    :param unselected_pages: 未选中页面的处理方式，"copy" 产出 selected 为 False 的 "copy" 结果，"drop" 不产出
+    :param memory_budget: 单页光栅化处理的内存预算（MB，每个工作进程各自计算）。按整页处理估计会超出预算的页面
+                          （如高 DPI 的大幅面图纸）改为分块处理：分块渲染、逐块应用图像处理功能和旋转，
+                          结果为多张图块图像拼成的 TiledImage；为 None 时不限制
+    :param with_arrays: 为 True 时整页处理的光栅化页面在结果的 array 中附带校正后的图像（并行处理时需在进程间传递）；
+                        也可以是页码（从 0 开始）序列，只为这些页面附带
+    :param workers: 并行处理页面的进程数，1 表示在当前进程中逐页处理
+    :param spill_to_disk: 并行处理时将已编码、等待按序产出的页面暂存到临时目录，适用于内存受限的场景
+    :param stage_callback: 可选，在当前进程中处理页面时，页面开始处理时以 (页码, 0, None) 调用，
+                           每完成一个处理阶段以 (页码, 进度增量, 状态信息) 调用；文档级的状态信息以 (None, 0, 状态信息) 调用
+    :return: 按页码顺序产出 PageResult 的生成器
+    """
+    recorder = recorder or NULL_RECORDER
+    settings = _page_settings(dpi, background_color, selected_features, detect_dpi, output_mode, angle_tolerance,
+                              native_images, skew_detector, recorder, output_encoding, jpeg_quality, color_mode,
+                              memory_budget, with_arrays, unselected_pages)
+    return _iter_deskewed_pages(input_pdf_path, settings, pages, unselected_pages, workers, spill_to_disk,
+                                angle_cache, recorder, journal_dir, resume, stage_callback)
+
+def _page_settings(dpi, background_color, selected_features, detect_dpi, output_mode, angle_tolerance, native_images, skew_detector, recorder, output_encoding, jpeg_quality, color_mode, memory_budget, with_arrays, unselected_pages):
+    """校验 iter_deskewed_pages 的处理参数并生成 _PageSettings；参数无效时抛出 ValueError。"""
+    selected_features = selected_features or {}
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unsupported output mode: {output_mode}")
+    if skew_detector not in SKEW_DETECTORS:
+        raise ValueError(f"Unsupported skew detector: {skew_detector}")
+    if color_mode not in COLOR_MODES:
+        raise ValueError(f"Unsupported color mode: {color_mode}")
+    if output_encoding not in OUTPUT_ENCODINGS:
+        raise ValueError(f"Unsupported output encoding: {output_encoding}")
+    if not 1 <= int(jpeg_quality) <= 100:
+        raise ValueError(f"JPEG quality must be between 1 and 100: {jpeg_quality}")
+    if unselected_pages not in UNSELECTED_PAGE_MODES:
+        raise ValueError(f"Unsupported unselected page mode: {unselected_pages}")
+    if memory_budget is not None and int(memory_budget) <= 0:
+        raise ValueError(f"Memory budget must be positive: {memory_budget}")
+    if selected_features.get("watermark_mask", "page") not in WATERMARK_MASKS:
+        raise ValueError(f"Unsupported watermark mask: {selected_features['watermark_mask']}")
+    if output_mode == "transform" and _stages_enabled(selected_features):
+        logging.warning("Image processing stages are ignored in transform output mode")
+    elif color_mode == "bilevel" and _stages_enabled(selected_features):
+        logging.warning("Image processing stages are ignored in bilevel color mode")
+    return _PageSettings(dpi, background_color, selected_features, detect_dpi, output_mode, angle_tolerance,
+                         native_images, skew_detector, recorder.enabled, output_encoding, int(jpeg_quality),
+                         color_mode, None if memory_budget is None else int(memory_budget),
+                         keep_arrays=with_arrays if isinstance(with_arrays, bool) else frozenset(with_arrays))
+
+def _iter_deskewed_pages(input_pdf_path, settings, pages, unselected_pages, workers, spill_to_disk, angle_cache, recorder, journal_dir, resume, stage_callback, pdf_document=None):
+    """
+    iter_deskewed_pages 的生成器部分，参数已校验。
+    :param pdf_document: 调用方已打开的输入文档，此时 pages 须为 _select_pages 选定的页码列表，文档由调用方关闭；
+                         为 None 时自行打开 input_pdf_path 并选择页面
+    """
+    owns_document = pdf_document is None
+    if owns_document:
+        pdf_document = _open_pdf(input_pdf_path)
+    workers = max(1, int(workers or 1))
+    spill_dir = None
+    processed = None
     try:
         total_pages = len(pdf_document)
-        for page_num in range(total_pages):
-            # 检查是否需要取消处理
-            if is_running_callback and not is_running_callback():
-                if status_callback:
-                    status_callback("Processing cancelled.")
-                logging.info("Processing cancelled by user.")
-                return
+        page_numbers = _select_pages(pages, total_pages) if owns_document else pages
+        if len(page_numbers) < total_pages:
+            logging.info(f"Processing {len(page_numbers)} of {total_pages} pages")
+        selected = set(page_numbers)
 
-            # 发送当前页数
-            if current_page_callback:
-                current_page_callback(page_num + 1)
+        features = settings.selected_features
+        if features.get("watermark_mask") == "document" and features.get("remove_watermark", False) \
+                and settings.output_mode == "raster" and settings.color_mode != "bilevel":
+            if stage_callback:
+                stage_callback(None, 0, "Estimating watermark mask...")
+            settings.watermark_model = WatermarkModel.estimate(
+                pdf_document, page_numbers, threshold=features.get("watermark_threshold", 127))
+            if settings.watermark_model is None:
+                logging.info("Too few pages to estimate a document watermark mask, using per-page masks")
 
-            # 基本进度计算
-            base_progress = int((page_num / total_pages) * 100)
-            if progress_callback:
-                progress_callback(base_progress)
-
-            # 将页面渲染为图像
-            page = pdf_document.load_page(page_num)
-            pix = page.get_pixmap(dpi=dpi)
-            img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-
-            # 如果图像是灰度，则转换为 RGB
-            if img.ndim == 2:
-                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-
-            # 图像预处理
-            # 1. 根据用户选择移除水印
-            if selected_features.get("remove_watermark", False):
-                method = selected_features.get("watermark_method", "Inpainting")
-                algorithm = selected_features.get("inpainting_algorithm", "Telea")
-                threshold = selected_features.get("watermark_threshold", 127)
-                img = remove_watermark(img, method=method, algorithm=algorithm, threshold=threshold)
-                if progress_callback:
-                    progress_callback(base_progress + 5)
-                if status_callback:
-                    status_callback("Removing watermarks...")
-
-            # 2. 根据用户选择增强图像
-            if selected_features.get("enhance_image", False):
-                contrast_level = selected_features.get("contrast_level", 2)
-                denoising_method = selected_features.get("denoising_method", "Gaussian")
-                denoising_kernel = selected_features.get("denoising_kernel", 3)
-                sharpening = selected_features.get("sharpening", False)
-                sharpening_strength = selected_features.get("sharpening_strength", 3)
-                img = enhance_image(
-                    img,
-                    contrast_level=contrast_level,
-                    denoising_method=denoising_method,
-                    denoising_kernel=denoising_kernel,
-                    sharpening=sharpening,
-                    sharpening_strength=sharpening_strength
-                )
-                if progress_callback:
-                    progress_callback(base_progress + 10)
-                if status_callback:
-                    status_callback("Enhancing image readability...")
-
-            # 3. 根据用户选择转换为灰度图像
-            if selected_features.get("convert_grayscale", False):
-                quant_levels = selected_features.get("grayscale_quant_levels", 64)
-                scale_factor = selected_features.get("grayscale_scale_factor", 1)
-                smoothing_method = selected_features.get("grayscale_smoothing_method", "Gaussian")
-                smoothing_kernel = selected_features.get("grayscale_smoothing_kernel", 3)
-                img = convert_grayscale(
-                    img,
-                    quant_levels=quant_levels,
-                    scale_factor=scale_factor,
-                    smoothing_method=smoothing_method,
-                    smoothing_kernel=smoothing_kernel
-                )
-                if progress_callback:
-                    progress_callback(base_progress + 15)
-                if status_callback:
-                    status_callback("Converting to grayscale...")
+        journal = None
+        journaled = set()
+        if journal_dir:
+            journal = PageJournal(journal_dir, input_pdf_path, _journal_settings(settings))
+            journaled = set(journal.open(resume))
+        pending_pages = [page_num for page_num in page_numbers if page_num not in journaled]
 
-            # 转换为灰度图像并确定倾斜角度
-            grayscale = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            angle = determine_skew(grayscale)
+        # 尚未写入缓存的页面：页码 -> 缓存键
+        uncached_keys = {}
+        detection_params = _detection_params(settings)
 
-            # 如果检测到角度则进行校正
-            if angle is not None:
-                logging.info(f"Detected skew angle {angle} degrees on page {page_num + 1}")
-                if status_callback:
-                    status_callback(f"Detected skew angle {angle} degrees on page {page_num + 1}")
-                # 旋转图像校正倾斜，使用自定义背景颜色
-                corrected_img = rotate_image(img, angle, background=background_color)
+        def iter_tasks():
+            for page_num in pending_pages:
+                if angle_cache is None:
+                    yield page_num, False, None
+                    continue
+                key = cache_key(page_fingerprint(pdf_document, page_num), detection_params)
+                found, angle = angle_cache.get(key)
+                if not found:
+                    uncached_keys[page_num] = key
+                yield page_num, found, angle
+
+        if workers > 1 and len(pending_pages) > 1:
+            logging.info(f"Processing {len(pending_pages)} pages with {workers} worker processes")
+            if spill_to_disk:
+                spill_dir = tempfile.mkdtemp(prefix="pdf_deskew_")
+            processed = _iter_pages_parallel(input_pdf_path, iter_tasks(), workers, settings, spill_dir)
+        else:
+            processed = _iter_pages_serial(pdf_document, iter_tasks(), settings, recorder, stage_callback)
+
+        # 按页码顺序合并日志中已完成的页面、新处理的页面以及原样复制的未选中页面
+        for page_num in range(total_pages):
+            if page_num not in selected:
+                if unselected_pages == "copy":
+                    yield PageResult(page_num, None, None, None, "copy", selected=False)
+            elif page_num in journaled:
+                kind, angle, page_dpi, image = journal.load(page_num)
+                yield PageResult(page_num, angle, image, page_dpi, kind)
             else:
-                logging.info(f"No skew detected on page {page_num + 1}")
-                if status_callback:
-                    status_callback(f"No skew detected on page {page_num + 1}")
-                corrected_img = img
+                result = next(processed)
+                recorder.extend(result.stage_records)
+                if journal is not None:
+                    journal.record(result)
+                if page_num in uncached_keys:
+                    angle_cache.put(uncached_keys.pop(page_num), result.angle)
+                yield result
+    finally:
+        # 取消或出错时关闭页面生成器，从而停止进程池
+        if processed is not None:
+            processed.close()
+        if owns_document:
+            pdf_document.close()
+        if angle_cache is not None:
+            angle_cache.flush()
+        # 清理溢出到磁盘的临时文件
+        if spill_dir:
+            try:
+                shutil.rmtree(spill_dir)
+            except Exception as e:
+                logging.warning(f"Unable to remove temporary folder {spill_dir}: {e}")
 
+def deskew_pdf(input_pdf_path, output_pdf_path, dpi=300, background_color=(255, 255, 255), progress_callback=None, current_page_callback=None, status_callback=None, is_running_callback=None, selected_features=None, workers=1, spill_to_disk=False, detect_dpi=None, output_mode="raster", angle_tolerance=0.0, native_images=True, angle_cache=None, skew_detector="deskew", recorder=None, journal_dir=None, resume=False, pages=None, unselected_pages="copy", output_encoding="auto", jpeg_quality=75, color_mode="color", memory_budget=None, with_arrays=False, page_callback=None):
+    """
+    校正 PDF 文件中的图像倾斜，并根据用户选择应用图像处理功能，生成输出 PDF。
+    逐页消费 iter_deskewed_pages 的结果并立即写入输出文件；处理参数见 iter_deskewed_pages。
+    多个文档只能在各自的进程中同时处理：PyMuPDF 和 AngleCache 都不支持在同一进程的多个线程中同时使用。
+    :param output_pdf_path: 输出 PDF 路径。写入过程中使用临时文件，成功后才替换为最终文件
+    :param progress_callback: 可选，以 0-100 的进度百分比调用
+    :param current_page_callback: 可选，开始处理（并行处理时为写入）某页时以页码（从 1 开始）调用
+    :param status_callback: 可选，以状态信息调用
+    :param is_running_callback: 可选，每写入一页前调用，返回 False 时取消处理
+    :param journal_dir: 断点续传日志目录。每完成一页即记录其结果和编码数据；处理成功后删除该目录，
+                        取消或出错时保留
+    :param resume: 为 True 且 journal_dir 中的日志与当前输入和参数一致时，跳过已记录的页面，
+                   只处理其余页面，再与已记录的页面一起生成输出文件
+    :param unselected_pages: 未选中页面的处理方式，"copy" 原样复制到输出文件，"drop" 不输出
+    :param with_arrays: 见 iter_deskewed_pages，附带的校正后图像通过 page_callback 传给调用方
+    :param page_callback: 可选，每写入一页（包括原样复制的未选中页面）后以该页的 PageResult 调用
+    :return: DeskewReport，angles 与输出页面一一对应（原样复制的未选中页面为 None）；用户取消时返回 None
+    """
+    recorder = recorder or NULL_RECORDER
+    # 进度按选中页面的处理顺序计算
+    position = {}
+    started = set()
+
+    def stage_done(page_num, step, message):
+        if page_num is not None:
+            if message is None:
+                # 页面开始处理
+                started.add(page_num)
+                if current_page_callback:
+                    current_page_callback(page_num + 1)
             if progress_callback:
-                progress_callback(base_progress + 20)
-            if status_callback:
-                status_callback("Detecting and correcting skew...")
+                progress_callback(int((position[page_num] / len(position)) * 100) + step)
+        if message and status_callback:
+            status_callback(message)
 
-            # 保存校正后的图像到临时文件夹
-            corrected_img_path = os.path.join(temp_folder, f"page_{page_num}.png")
-            cv2.imwrite(corrected_img_path, corrected_img)
-            output_images.append(corrected_img_path)
+    settings = _page_settings(dpi, background_color, selected_features, detect_dpi, output_mode, angle_tolerance,
+                              native_images, skew_detector, recorder, output_encoding, jpeg_quality, color_mode,
+                              memory_budget, with_arrays, unselected_pages)
 
-            if progress_callback:
-                progress_callback(base_progress + 25)
-            if status_callback:
-                status_callback("Saving corrected images...")
+    # 打开 PDF 文件，添加错误处理
+    try:
+        pdf_document = _open_pdf(input_pdf_path)
+    except IOError as e:
+        if status_callback:
+            status_callback(str(e))
+        raise
+
+    writer = None
+
+    try:
+        page_numbers = _select_pages(pages, len(pdf_document))
+        for index, page_num in enumerate(page_numbers):
+            position[page_num] = index
+
+        # 生成器与写入端共用同一个已打开的输入文档
+        results = _iter_deskewed_pages(input_pdf_path, settings, page_numbers, unselected_pages, workers,
+                                       spill_to_disk, angle_cache, recorder, journal_dir, resume, stage_done,
+                                       pdf_document=pdf_document)
+        writer = PdfPageWriter(output_pdf_path)
+        angles = []
+
+        try:
+            while True:
+                # 检查是否需要取消处理
+                if is_running_callback and not is_running_callback():
+                    if status_callback:
+                        status_callback("Processing cancelled.")
+                    logging.info("Processing cancelled by user.")
+                    writer.abort()
+                    return
+
+                result = next(results, None)
+                if result is None:
+                    break
+                page_num, angle = result.page_num, result.angle
+                if not result.selected:
+                    writer.copy_page(pdf_document, page_num)
+                    angles.append(None)
+                    if page_callback:
+                        page_callback(result)
+                    continue
+                angles.append(angle)
+
+                if page_num not in started and current_page_callback:
+                    current_page_callback(page_num + 1)
+
+                if angle is not None:
+                    logging.info(f"Detected skew angle {angle} degrees on page {page_num + 1}")
+                    if status_callback:
+                        status_callback(f"Detected skew angle {angle} degrees on page {page_num + 1}")
+                else:
+                    logging.info(f"No skew detected on page {page_num + 1}")
+                    if status_callback:
+                        status_callback(f"No skew detected on page {page_num + 1}")
+
+                if status_callback:
+                    status_callback("Detecting and correcting skew...")
+
+                # 校正后的页面立即写入输出 PDF，不在内存中累积
+                with recorder.stage(page_num, "write"):
+                    if result.kind == "copy":
+                        writer.copy_page(pdf_document, page_num)
+                        logging.info(f"Page {page_num + 1} needs no correction, copied unchanged")
+                    elif result.kind == "transform":
+                        writer.add_transformed_page(pdf_document, page_num, angle, background_color)
+                    else:
+                        writer.add_image_page(result.image, result.dpi)
+
+                if page_callback:
+                    page_callback(result)
+                if progress_callback:
+                    progress_callback(int(((position[page_num] + 1) / len(position)) * 100))
+                if status_callback:
+                    status_callback("Saving corrected images...")
+        finally:
+            # 取消或出错时关闭生成器，从而停止进程池
+            results.close()
 
         if progress_callback:
             progress_callback(100)
         if status_callback:
             status_callback("Generating output PDF...")
 
-        # 使用 PIL 将所有校正后的图像重新保存为 PDF
-        image_list = [Image.open(img_path).convert("RGB") for img_path in output_images]
-        if image_list:
-            image_list[0].save(output_pdf_path, save_all=True, append_images=image_list[1:])
+        writer.close()
+        if journal_dir:
+            remove_journal(journal_dir)
 
         if status_callback:
             status_callback("Processing completed successfully.")
         logging.info(f"Processing completed successfully for {output_pdf_path}")
+        return DeskewReport(writer.page_count, angles)
 
     except Exception as e:
         logging.error(f"Error during deskewing PDF: {e}")
+        if writer is not None:
+            writer.abort()
         if status_callback:
             status_callback(f"Error during processing: {e}")
         raise e
 
     finally:
-        # 清理临时文件夹
-        for img_path in output_images:
-            try:
-                os.remove(img_path)
-            except Exception as e:
-                logging.warning(f"Unable to remove temporary image {img_path}: {e}")
-        try:
-            shutil.rmtree(temp_folder)
-        except Exception as e:
-            logging.warning(f"Unable to remove temporary folder {temp_folder}: {e}")
+        pdf_document.close()
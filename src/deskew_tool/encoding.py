@@ -0,0 +1,175 @@
+# src/deskew_tool/encoding.py
+
+import io
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .buffers import NULL_POOL
+
+# 支持的输出编码：
+# "auto" 只含黑白两种像素值的页面使用 fax，其余页面使用 jpeg；
+# "jpeg" 有损 JPEG（DCTDecode），质量可调；
+# "flate" 无损 Flate 压缩原始像素；
+# "fax" 二值化后使用 CCITT Group 4 传真编码（1 位/像素），适用于黑白文字页面
+OUTPUT_ENCODINGS = ("auto", "jpeg", "flate", "fax")
+
+
+@dataclass
+class EncodedImage:
+    """
+    已编码、可直接写入 PDF 图像对象的页面图像。
+    data 为 None 时，编码数据已溢出到磁盘文件 path 中。
+    decode_parms 为图像对象的 DecodeParms 字典（PDF 语法），不需要时为 None。
+    """
+    width: int
+    height: int
+    colorspace: str
+    bits_per_component: int
+    filter: str
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    decode_parms: Optional[str] = None
+
+    def spill(self, directory, name):
+        """将编码数据写入 directory 下的文件并释放内存中的副本。"""
+        self.path = os.path.join(directory, name)
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        self.data = None
+        return self
+
+    def read(self) -> bytes:
+        """返回编码数据；若已溢出到磁盘，则读取后删除该文件。"""
+        if self.data is not None:
+            return self.data
+        with open(self.path, "rb") as f:
+            data = f.read()
+        os.remove(self.path)
+        self.path = None
+        return data
+
+
+@dataclass
+class TiledImage:
+    """
+    由多张分别编码的图块拼成的页面图像，用于分块处理的超大页面，整页像素从不同时存在于内存中。
+    tiles 为 (x, y, EncodedImage) 列表，x、y 为图块左上角在整页中的像素坐标。
+    """
+    width: int
+    height: int
+    tiles: list
+
+    def spill(self, directory, name):
+        """将各图块的编码数据分别写入 directory 下的文件。"""
+        for index, (_, _, image) in enumerate(self.tiles):
+            image.spill(directory, f"{name}.{index}")
+        return self
+
+
+def encode_image(image: np.ndarray, quality: int = 75, pool=NULL_POOL) -> EncodedImage:
+    """
+    将图像在内存中直接编码为 JPEG（DCTDecode），供 PDF 写入器原样嵌入，无需中间文件或二次编码。
+    默认质量与此前 PIL 生成 PDF 时使用的 JPEG 质量一致。
+    :param image: RGB 三通道或单通道灰度图像（uint8）
+    :param quality: JPEG 质量（1-100）
+    :param pool: 缓冲区池，RGB 转 BGR 的临时图像从中取出，编码后归还
+    :return: 编码后的图像
+    """
+    height, width = image.shape[:2]
+    if image.ndim == 2 or image.shape[2] == 1:
+        colorspace = "DeviceGray"
+    else:
+        colorspace = "DeviceRGB"
+        # 页面像素按 RGB 顺序排列，而 OpenCV 编码时按 BGR 解释
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR, dst=pool.take_like(image))
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if colorspace == "DeviceRGB":
+        pool.give(image)
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return EncodedImage(width, height, colorspace, 8, "DCTDecode", buffer.tobytes())
+
+
+def _encode_flate(image: np.ndarray, bilevel: bool = False) -> EncodedImage:
+    """无损压缩原始像素（FlateDecode）；bilevel 为 True 时先将 0/255 单通道图像按位打包为 1 位/像素。"""
+    height, width = image.shape[:2]
+    if bilevel:
+        # packbits 按行独立打包，行尾不足一个字节的部分补零，与 PDF 的行填充规则一致
+        data = zlib.compress(np.packbits(image.reshape(height, width) > 127, axis=1).tobytes(), 3)
+        return EncodedImage(width, height, "DeviceGray", 1, "FlateDecode", data)
+    colorspace = "DeviceGray" if image.ndim == 2 or image.shape[2] == 1 else "DeviceRGB"
+    # 扫描页面上较高的压缩级别几乎不再减小体积，却明显更慢
+    data = zlib.compress(np.ascontiguousarray(image).tobytes(), 3)
+    return EncodedImage(width, height, colorspace, 8, "FlateDecode", data)
+
+
+def binarize(image: np.ndarray, dst: np.ndarray = None) -> np.ndarray:
+    """
+    转为灰度后按 Otsu 阈值二值化，返回 0/255 的单通道图像。
+    :param dst: 可选的输出数组（与输出形状相同的单通道 uint8 数组，可以就是单通道的 image 本身）
+    """
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.shape[2] == 3 else image[:, :, 0]
+    _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=dst)
+    return binary
+
+
+def _encode_fax(image: np.ndarray, bilevel: bool = False) -> EncodedImage:
+    """
+    二值化后使用 CCITT Group 4 编码（CCITTFaxDecode）；bilevel 为 True 表示图像已是 0/255 单通道图像。
+    借助 PIL 的 libtiff 生成只含一个条带的 TIFF，再取出其中的编码数据。
+    """
+    binary = image.reshape(image.shape[:2]) if bilevel else binarize(image)
+    height, width = binary.shape
+    buffer = io.BytesIO()
+    # 整页作为一个条带编码，条带之间的数据不能直接拼接
+    # 直接按位打包构造 1 位图像，避免 PIL 转换模式时的抖动计算
+    bitmap = Image.frombytes("1", (width, height), np.packbits(binary > 127, axis=1).tobytes())
+    bitmap.save(buffer, "TIFF", compression="group4", tiffinfo={278: height})
+    with Image.open(io.BytesIO(buffer.getvalue())) as tiff:
+        offsets, counts = tiff.tag_v2[273], tiff.tag_v2[279]
+    if len(offsets) != 1:
+        raise ValueError("CCITT encoding produced more than one strip")
+    data = buffer.getvalue()[offsets[0]:offsets[0] + counts[0]]
+    # PIL 按 BlackIsZero 写入 1 位图像，编码中的“黑”游程对应值为 1 的白色像素
+    decode_parms = f"<</K -1/Columns {width}/Rows {height}/BlackIs1 true>>"
+    return EncodedImage(width, height, "DeviceGray", 1, "CCITTFaxDecode", data, decode_parms=decode_parms)
+
+
+def _is_bilevel(image: np.ndarray) -> bool:
+    """图像是否只含纯黑和纯白两种像素值。"""
+    if image.ndim == 3:
+        if image.shape[2] != 1 and not (np.array_equal(image[:, :, 0], image[:, :, 1])
+                                        and np.array_equal(image[:, :, 0], image[:, :, 2])):
+            return False
+        image = image[:, :, 0]
+    return not np.any((image != 0) & (image != 255))
+
+
+def encode_page(image: np.ndarray, encoding: str = "auto", quality: int = 75, bilevel: bool = False, pool=NULL_POOL) -> EncodedImage:
+    """
+    按指定的输出编码压缩页面图像。
+    :param image: RGB 三通道或单通道灰度图像（uint8）
+    :param encoding: 输出编码，见 OUTPUT_ENCODINGS
+    :param quality: encoding 为 jpeg（或 auto 选择 jpeg）时的 JPEG 质量
+    :param bilevel: 图像已是只含 0 和 255 的单通道图像；此时 fax 和 flate 直接输出 1 位图像，auto 选择 fax
+    :param pool: 缓冲区池，用于编码时的临时图像
+    :return: 编码后的图像
+    """
+    if encoding not in OUTPUT_ENCODINGS:
+        raise ValueError(f"Unsupported output encoding: {encoding}")
+    if encoding == "auto":
+        encoding = "fax" if bilevel or _is_bilevel(image) else "jpeg"
+    if encoding == "fax":
+        return _encode_fax(image, bilevel)
+    if encoding == "flate":
+        return _encode_flate(image, bilevel)
+    return encode_image(image, quality, pool)
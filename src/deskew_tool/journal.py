@@ -0,0 +1,148 @@
+# src/deskew_tool/journal.py
+
+import os
+import json
+import shutil
+import logging
+
+from .encoding import EncodedImage, TiledImage
+
+# 日志格式版本，格式不兼容时递增，旧日志将被丢弃
+JOURNAL_VERSION = 1
+
+
+def _write_atomic(path, data: bytes):
+    """先写入临时文件再替换，进程中途被终止时不会留下不完整的文件。"""
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class PageJournal:
+    """
+    断点续传日志：在日志目录中逐页记录已完成页面的处理结果及编码后的图像数据。
+    重新运行并启用 resume 时，已记录的页面直接从日志读取，不再重新处理。
+
+    目录结构：
+        journal.json        输入文件及处理参数的标识，不一致时日志作废
+        <页码>.json          页面结果（种类、角度、DPI、图像属性），写入该文件即表示页面已完成
+        <页码>.bin           编码后的图像数据（仅光栅化页面）
+        <页码>.<序号>.bin     分块处理的页面各图块的编码数据
+    """
+
+    def __init__(self, directory, input_pdf_path, settings: dict):
+        """
+        :param directory: 日志目录
+        :param input_pdf_path: 输入 PDF 路径
+        :param settings: 影响输出结果的处理参数（可 JSON 序列化）
+        """
+        self.directory = str(directory)
+        stat = os.stat(input_pdf_path)
+        self.identity = {
+            "version": JOURNAL_VERSION,
+            "input": os.path.abspath(str(input_pdf_path)),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "settings": settings,
+        }
+        self.completed = set()
+
+    def open(self, resume=False):
+        """
+        准备日志目录。resume 为 True 且已有日志与当前输入和参数一致时，载入已完成的页码；
+        否则清空日志重新开始。目录已存在、非空且不是日志目录时抛出 ValueError。
+        :return: 已完成的页码集合
+        """
+        manifest_path = os.path.join(self.directory, "journal.json")
+        if resume and os.path.isfile(manifest_path):
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    matches = json.load(f) == json.loads(json.dumps(self.identity, default=str))
+            except (OSError, ValueError):
+                matches = False
+            if matches:
+                self.completed = {
+                    int(name[:-5]) for name in os.listdir(self.directory)
+                    if name.endswith(".json") and name[:-5].isdigit()
+                }
+                logging.info(f"Resuming from journal {self.directory}: {len(self.completed)} pages already done")
+                return self.completed
+            logging.warning(f"Journal {self.directory} belongs to a different input or settings, starting over")
+
+        if os.path.isdir(self.directory) and os.listdir(self.directory):
+            # 只清空确认是日志的目录，避免误删用户文件
+            if not os.path.isfile(manifest_path):
+                raise ValueError(f"Journal directory is not empty and is not a journal: {self.directory}")
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(manifest_path, json.dumps(self.identity, indent=2, default=str).encode("utf-8"))
+        self.completed = set()
+        return self.completed
+
+    def _page_path(self, page_num, extension):
+        return os.path.join(self.directory, f"{page_num:06d}.{extension}")
+
+    def record(self, result):
+        """
+        记录一个已完成的页面。编码图像的数据随之载入内存（若已溢出到磁盘则读取并删除溢出文件）。
+        :param result: PageResult
+        """
+        entry = {"kind": result.kind, "angle": result.angle, "dpi": result.dpi}
+        if isinstance(result.image, TiledImage):
+            entry["tiled"] = {"width": result.image.width, "height": result.image.height, "tiles": [
+                {"x": x, "y": y, "image": self._record_image(tile, self._page_path(result.page_num, f"{index}.bin"))}
+                for index, (x, y, tile) in enumerate(result.image.tiles)
+            ]}
+        elif result.image is not None:
+            entry["image"] = self._record_image(result.image, self._page_path(result.page_num, "bin"))
+        # 页面结果最后写入，作为该页已完成的标记
+        _write_atomic(self._page_path(result.page_num, "json"), json.dumps(entry).encode("utf-8"))
+        self.completed.add(result.page_num)
+
+    @staticmethod
+    def _record_image(image, path):
+        """写入编码图像的数据。:return: 图像属性"""
+        image.data = image.read()
+        _write_atomic(path, image.data)
+        return {
+            "width": image.width,
+            "height": image.height,
+            "colorspace": image.colorspace,
+            "bits_per_component": image.bits_per_component,
+            "filter": image.filter,
+            "decode_parms": image.decode_parms,
+        }
+
+    def load(self, page_num):
+        """
+        读取已记录页面的结果。
+        :return: (种类, 角度, DPI, EncodedImage、TiledImage 或 None)
+        """
+        with open(self._page_path(page_num, "json"), encoding="utf-8") as f:
+            entry = json.load(f)
+        image = None
+        if "image" in entry:
+            with open(self._page_path(page_num, "bin"), "rb") as f:
+                image = EncodedImage(data=f.read(), **entry["image"])
+        elif "tiled" in entry:
+            tiles = []
+            for index, tile in enumerate(entry["tiled"]["tiles"]):
+                with open(self._page_path(page_num, f"{index}.bin"), "rb") as f:
+                    tiles.append((tile["x"], tile["y"], EncodedImage(data=f.read(), **tile["image"])))
+            image = TiledImage(entry["tiled"]["width"], entry["tiled"]["height"], tiles)
+        return entry["kind"], entry["angle"], entry["dpi"], image
+
+    def remove(self):
+        """输出完成后删除日志目录。"""
+        remove_journal(self.directory)
+
+
+def remove_journal(directory):
+    """删除日志目录；只在目录确为日志目录时删除，不存在时忽略。"""
+    if not os.path.isfile(os.path.join(str(directory), "journal.json")):
+        return
+    try:
+        shutil.rmtree(directory)
+    except OSError as e:
+        logging.warning(f"Unable to remove journal {directory}: {e}")
@@ -0,0 +1,35 @@
+# src/deskew_tool/point_ops.py
+
+import cv2
+import numpy as np
+
+# 逐像素点运算。cv2.LUT 查表每次遍历比 convertScaleAbs、threshold、bitwise_and 等向量化运算更慢
+# （见 benchmarks/bench_point_ops.py），而流水线中的对比度调整、灰度量化和二值化之后都紧接着去噪、平滑或旋转
+# 等非点运算，Otsu 阈值又依赖图像内容，没有可以组合为一张查找表的连续点运算，
+# 因此只在运算本身没有向量化实现时（步长不是 2 的幂的灰度量化）查表。
+
+
+def _quantize_table(levels: int) -> np.ndarray:
+    """灰度量化的查找表：256 个 uint8 元素，第 i 项为像素值 i 向下取整到 256 // levels 的整数倍。"""
+    step = max(1, 256 // max(1, int(levels)))
+    # levels 为 1 时步长为 256，结果按 uint8 回绕为 0，与原先的整数运算一致
+    return (np.arange(256) // step * step).astype(np.uint8)
+
+
+def quantize(image: np.ndarray, levels: int, dst: np.ndarray = None) -> np.ndarray:
+    """
+    灰度量化：把像素值向下取整到 256 // levels 的整数倍，只遍历一次像素。
+    步长为 2 的幂时（levels 为 2 的幂）等价于清除低位，用向量化的按位与完成；否则查表。
+    :param dst: 可选的输出数组（形状和类型与 image 相同），可以就是 image 本身，实现原地修改
+    :return: 结果图像
+    """
+    step = max(1, 256 // max(1, int(levels)))
+    if step & (step - 1) == 0:
+        # OpenCV 把单个整数解释为只作用于第一个通道的 Scalar，需为每个通道给出掩码
+        mask = (256 - step,) * 4
+        if dst is None:
+            return cv2.bitwise_and(image, mask)
+        return cv2.bitwise_and(image, mask, dst=dst)
+    if dst is None:
+        return cv2.LUT(image, _quantize_table(levels))
+    return cv2.LUT(image, _quantize_table(levels), dst=dst)
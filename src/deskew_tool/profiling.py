@@ -0,0 +1,150 @@
+# src/deskew_tool/profiling.py
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class StageRecord:
+    """单页单个处理阶段的测量结果。"""
+    page: int
+    stage: str
+    wall_ms: float
+    cpu_ms: float
+    peak_bytes: int
+
+
+class NullRecorder:
+    """不做任何记录的记录器，未启用性能分析时使用，几乎没有额外开销。"""
+    enabled = False
+
+    def stage(self, page, name):
+        return nullcontext()
+
+    def extend(self, records):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def close(self):
+        pass
+
+
+# 默认共享的空记录器
+NULL_RECORDER = NullRecorder()
+
+
+class ProfileRecorder:
+    """
+    记录每页每个处理阶段的墙钟时间、CPU 时间和峰值内存。
+    峰值内存通过 tracemalloc 测量，为阶段执行期间相对开始时新增的已分配内存峰值，
+    包括 NumPy/OpenCV 返回的数组，但不含库内部的临时缓冲区。
+    CPU 时间为当前进程的 CPU 时间；并行处理时由各工作进程分别测量后汇总到主进程。
+    tracemalloc 和进程 CPU 时间都是进程级的，同一进程中有其他作业同时运行时，测量值也包含这些作业的开销。
+    测量结束后须调用 close（或用 with 语句）停止 tracemalloc，否则跟踪开销会延续到之后的处理中；
+    close 之后仍可调用 summary、save 等方法。
+    """
+    enabled = True
+
+    def __init__(self):
+        self.records = []
+        # 只停止由本记录器启动的跟踪，调用方自己启动的 tracemalloc 保持不变
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """停止本记录器启动的 tracemalloc 跟踪，可重复调用。"""
+        if self._started_tracing:
+            self._started_tracing = False
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, page, name):
+        """
+        测量一个处理阶段。
+        :param page: 页码（从 0 开始）
+        :param name: 阶段名称
+        """
+        start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            peak = tracemalloc.get_traced_memory()[1] - start_memory
+            self.records.append(StageRecord(page, name, wall * 1000, cpu * 1000, max(0, peak)))
+
+    def extend(self, records):
+        """合并其他记录器（例如工作进程）的测量结果。"""
+        self.records.extend(records)
+
+    def summary(self):
+        """
+        按阶段汇总。
+        :return: {阶段名称: {"count", "wall_ms": {"p50", "p95", "max", "total"}, "cpu_ms": {...}, "peak_mb": {...}}}
+        """
+        stages = {}
+        for record in self.records:
+            stages.setdefault(record.stage, []).append(record)
+        result = {}
+        for name, records in stages.items():
+            result[name] = {
+                "count": len(records),
+                "wall_ms": _distribution([r.wall_ms for r in records]),
+                "cpu_ms": _distribution([r.cpu_ms for r in records]),
+                "peak_mb": _distribution([r.peak_bytes / 2 ** 20 for r in records]),
+            }
+        return result
+
+    def format_summary(self):
+        """返回按阶段汇总的文本表格。"""
+        lines = [f"{'stage':<20} {'pages':>6} {'wall p50':>9} {'p95':>9} {'max':>9} "
+                 f"{'cpu p50':>9} {'peak MB':>8}"]
+        for name, summary in self.summary().items():
+            wall, cpu, peak = summary["wall_ms"], summary["cpu_ms"], summary["peak_mb"]
+            lines.append(f"{name:<20} {summary['count']:>6} {wall['p50']:>9.1f} {wall['p95']:>9.1f} "
+                         f"{wall['max']:>9.1f} {cpu['p50']:>9.1f} {peak['max']:>8.1f}")
+        return "\n".join(lines)
+
+    def save(self, path):
+        """将逐页测量结果和汇总写入 JSON 文件。"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "summary": self.summary(),
+                "records": [asdict(record) for record in self.records],
+            }, f, indent=2)
+
+
+def _percentile(values, q):
+    """线性插值的百分位数，values 须已排序。"""
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _distribution(values):
+    values = sorted(values)
+    return {
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": values[-1],
+        "total": sum(values),
+    }
@@ -0,0 +1,115 @@
+# src/deskew_tool/watermark.py
+
+import math
+import hashlib
+import logging
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+# 水印掩码的来源："page" 为每页按阈值单独生成；"document" 为从抽样页面估计一次、所有页面共用的文档级掩码
+WATERMARK_MASKS = ("page", "document")
+
+
+class WatermarkModel:
+    """
+    文档级水印模型：同一枚水印出现在每页的同一位置时，在抽样页面的阈值掩码中始终存在，
+    而正文内容逐页不同。对低分辨率渲染的抽样页面分别生成掩码，保留在（默认全部）抽样页面中都存在的像素，
+    即得到水印区域。行距和字号统一的正文在相同位置的像素也常常重合，因此抽样页面越多，
+    误判为水印的正文越少；孤立的重合像素再经开运算去除。
+
+    模型在页面归一化坐标下保存（与页面尺寸和渲染分辨率无关），只保存水印区域外接矩形内的掩码，
+    因此可以低成本地随处理参数传递给工作进程。去水印时只在该区域内生成掩码并修复，
+    区域外的正文不会被当作水印。
+    """
+
+    def __init__(self, size, offset, mask, pages):
+        """
+        :param size: 模型掩码对应的整页尺寸 (宽, 高)
+        :param offset: mask 左上角在整页中的位置 (x, y)
+        :param mask: 水印区域外接矩形内的单通道掩码，非零为水印区域；没有找到水印时为空数组
+        :param pages: 参与估计的页面数
+        """
+        self.size = tuple(size)
+        self.offset = tuple(offset)
+        self.mask = mask
+        self.pages = pages
+
+    @classmethod
+    def estimate(cls, pdf_document, page_numbers, threshold=127, dpi=100, samples=16, agreement=1.0):
+        """
+        从均匀抽样的页面估计水印区域。
+        :param pdf_document: 已打开的 fitz 文档
+        :param page_numbers: 可供抽样的页码（从 0 开始）
+        :param threshold: 掩码阈值，亮度低于该值的像素视为候选水印像素，与 remove_watermark 一致
+        :param dpi: 抽样页面的渲染分辨率
+        :param samples: 最多抽样的页面数
+        :param agreement: 像素至少在该比例的抽样页面中为候选像素时才属于水印区域，1.0 为取交集，0.5 相当于取中值
+        :return: WatermarkModel；可抽样的页面少于两页、无法区分水印与正文时返回 None
+        """
+        page_numbers = list(page_numbers)
+        if len(page_numbers) < 2:
+            return None
+        count = min(samples, len(page_numbers))
+        sampled = [page_numbers[round(index * (len(page_numbers) - 1) / (count - 1))] for index in range(count)]
+        kernel = np.ones((3, 3), dtype=np.uint8)
+        size = None
+        votes = None
+        for page_num in sampled:
+            pix = pdf_document.load_page(page_num).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+            if size is None:
+                size = (pix.width, pix.height)
+                votes = np.zeros((pix.height, pix.width), dtype=np.uint16)
+            elif (pix.width, pix.height) != size:
+                # 尺寸不同的页面按页面归一化坐标对齐
+                gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+            _, candidate = cv2.threshold(gray, threshold, 1, cv2.THRESH_BINARY_INV)
+            votes += candidate
+        mask = np.where(votes >= math.ceil(agreement * count), 255, 0).astype(np.uint8)
+        # 去除正文偶然重合的孤立像素，再扩张一个像素，容忍扫描时水印位置的轻微偏移
+        mask = cv2.dilate(cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel), kernel)
+
+        x, y, width, height = cv2.boundingRect(mask)
+        model = cls(size, (x, y), mask[y:y + height, x:x + width].copy(), count)
+        if model.mask.size:
+            coverage = np.count_nonzero(model.mask) / (size[0] * size[1])
+            logging.info(f"Estimated watermark mask from {count} pages, covering {coverage:.1%} of the page")
+        else:
+            logging.info(f"No watermark shared by {count} sampled pages")
+        return model
+
+    @property
+    def fingerprint(self) -> str:
+        """模型内容的哈希值，用于断点续传日志和角度缓存的参数比较。"""
+        digest = hashlib.sha256(repr((self.size, self.offset, self.mask.shape)).encode())
+        digest.update(self.mask.tobytes())
+        return digest.hexdigest()
+
+    def region(self, width, height, box=None):
+        """
+        把水印区域换算到 (宽, 高) 像素的整页图像上，可只取其中的一部分（用于分块处理）。
+        :param box: 只取整页图像中的像素范围 (x0, y0, x1, y1)，为 None 时取整页
+        :return: (x, y, 掩码)：掩码为水印区域外接矩形内的单通道图像（非零为水印区域），
+                 (x, y) 为其左上角在 box 中的位置；区域与 box 不相交时掩码为空数组
+        """
+        x0, y0, x1, y1 = box if box is not None else (0, 0, width, height)
+        scale_x, scale_y = width / self.size[0], height / self.size[1]
+        mask_height, mask_width = self.mask.shape
+        # 外扩一个像素，覆盖线性插值后的边缘
+        left = max(x0, int(math.floor(self.offset[0] * scale_x)) - 1)
+        top = max(y0, int(math.floor(self.offset[1] * scale_y)) - 1)
+        right = min(x1, int(math.ceil((self.offset[0] + mask_width) * scale_x)) + 1)
+        bottom = min(y1, int(math.ceil((self.offset[1] + mask_height) * scale_y)) + 1)
+        if not self.mask.size or left >= right or top >= bottom:
+            return 0, 0, np.zeros((0, 0), dtype=np.uint8)
+        # 输出像素中心映射到模型掩码坐标（WARP_INVERSE_MAP）
+        matrix = np.array([
+            [1 / scale_x, 0, (left + 0.5) / scale_x - 0.5 - self.offset[0]],
+            [0, 1 / scale_y, (top + 0.5) / scale_y - 0.5 - self.offset[1]],
+        ])
+        area = cv2.warpAffine(self.mask, matrix, (right - left, bottom - top),
+                              flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderValue=0)
+        cv2.threshold(area, 0, 255, cv2.THRESH_BINARY, dst=area)
+        return left - x0, top - y0, area
@@ -0,0 +1,184 @@
+# src/deskew_tool/writer.py
+
+import os
+import math
+import uuid
+import logging
+
+import fitz  # PyMuPDF
+
+from .encoding import TiledImage
+
+
+class PdfPageWriter:
+    """
+    逐页写入输出 PDF，峰值内存与文档页数无关。
+
+    页面先加入内存中的 fitz 文档，尚未保存的图像数据累积超过 flush_bytes 时增量保存到
+    "<输出路径>.<随机后缀>.spool" 暂存文件并重新打开，已写出的页面随即释放。
+    复制或变换源页面时，同一源文档的共享资源（字体、图像等）只导入一次；重新打开文档会
+    丢失这一对应关系，因此只按数据量而不是按页数保存，复制不含大图像的源页面不会触发保存。
+    close() 时把全部页面完整保存到 "<输出路径>.<随机后缀>.part"，合并重复对象并压缩未压缩的流，
+    暂存文件中的增量修订不会进入输出；成功后才替换为最终输出文件，abort() 则删除临时文件。
+    每个写入器的临时文件各不相同，同时写入同一输出路径的作业互不破坏对方的数据。
+    """
+
+    def __init__(self, output_path, flush_bytes=16 * 1024 * 1024):
+        """
+        :param output_path: 输出 PDF 路径
+        :param flush_bytes: 尚未保存的图像数据超过多少字节时保存一次
+        """
+        self.output_path = str(output_path)
+        self.flush_bytes = max(1, int(flush_bytes))
+        self.page_count = 0
+        stem = f"{self.output_path}.{uuid.uuid4().hex[:8]}"
+        self._part_path = f"{stem}.part"
+        self._spool_path = f"{stem}.spool"
+        self._document = fitz.open()
+        self._saved = False
+        self._pending_pages = 0
+        self._pending_bytes = 0
+        # 当前文档中已导入的源图像 (源文档 id, xref)，重新打开文档后清空
+        self._grafted = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def add_image_page(self, image, dpi):
+        """
+        新建一页并铺满一张已编码图像，页面物理尺寸由像素尺寸和 DPI 换算得到。
+        编码数据按原样写入图像对象，不会被解码或重新压缩。
+        :param image: EncodedImage 编码图像，或由多个图块拼成的 TiledImage（每个图块为一个图像对象）
+        :param dpi: 图像分辨率
+        """
+        document = self._document
+        page = document.new_page(width=image.width * 72 / dpi, height=image.height * 72 / dpi)
+        tiles = image.tiles if isinstance(image, TiledImage) else [(0, 0, image)]
+        for x, y, tile in tiles:
+            rect = fitz.Rect(x, y, x + tile.width, y + tile.height) * (72 / dpi)
+            page.insert_image(rect, xref=self._add_image_object(tile))
+        self._page_added()
+
+    def _add_image_object(self, image):
+        """把编码图像写入为图像对象。:return: 图像对象的 xref"""
+        document = self._document
+        data = image.read()
+        self._pending_bytes += len(data)
+        xref = document.get_new_xref()
+        document.update_object(
+            xref,
+            f"<</Type/XObject/Subtype/Image/Width {image.width}/Height {image.height}"
+            f"/ColorSpace/{image.colorspace}/BitsPerComponent {image.bits_per_component}>>"
+        )
+        document.update_stream(xref, data, compress=False)
+        # update_stream 会移除原有的 Filter，需在写入数据后重新设置
+        document.xref_set_key(xref, "Filter", f"/{image.filter}")
+        if image.decode_parms:
+            document.xref_set_key(xref, "DecodeParms", image.decode_parms)
+        return xref
+
+    def copy_page(self, source_document, page_num):
+        """
+        将源页面原样复制到输出文档，不做任何处理。
+        :param source_document: 已打开的源 fitz 文档
+        :param page_num: 源页码（从 0 开始）
+        """
+        self._count_source_images(source_document, page_num)
+        # final=False 保留源文档的对象对应关系，之后复制的页面复用已导入的共享资源
+        self._document.insert_pdf(source_document, from_page=page_num, to_page=page_num, final=False)
+        self._page_added()
+
+    def add_transformed_page(self, source_document, page_num, angle, background_color=(255, 255, 255)):
+        """
+        新建一页，将源页面的原始内容（含文本层和嵌入图像）整体旋转后放入，不做任何光栅化。
+        页面尺寸为旋转后源页面的外接矩形。
+        :param source_document: 已打开的源 fitz 文档
+        :param page_num: 源页码（从 0 开始）
+        :param angle: 旋转角度，方向与 rotate_image 一致
+        :param background_color: 旋转后露出的页面角落的填充颜色（RGB，0-255）
+        """
+        source_rect = source_document[page_num].rect
+        radians = math.radians(angle)
+        sin, cos = abs(math.sin(radians)), abs(math.cos(radians))
+        width = source_rect.width * cos + source_rect.height * sin
+        height = source_rect.width * sin + source_rect.height * cos
+        page = self._document.new_page(width=width, height=height)
+        if tuple(background_color) != (255, 255, 255):
+            page.draw_rect(page.rect, color=None, fill=tuple(c / 255 for c in background_color), overlay=False)
+        self._count_source_images(source_document, page_num)
+        page.show_pdf_page(page.rect, source_document, page_num, rotate=angle)
+        self._page_added()
+
+    def _count_source_images(self, source_document, page_num):
+        """把源页面中尚未导入当前文档的图像按其压缩后的大小计入未保存数据量。"""
+        for image in source_document[page_num].get_images(full=True):
+            key = (id(source_document), image[0])
+            if key in self._grafted:
+                continue
+            self._grafted.add(key)
+            kind, value = source_document.xref_get_key(image[0], "Length")
+            if kind == "int":
+                self._pending_bytes += int(value)
+
+    def _page_added(self):
+        self.page_count += 1
+        self._pending_pages += 1
+        if self._pending_bytes >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        """把尚未保存的页面写入暂存文件，并重新打开文档以释放其内存。"""
+        if self._pending_pages == 0:
+            return
+        if self._saved:
+            self._document.saveIncr()
+        else:
+            self._document.save(self._spool_path)
+            self._saved = True
+        self._document.close()
+        self._document = fitz.open(self._spool_path)
+        self._pending_pages = 0
+        self._pending_bytes = 0
+        self._grafted.clear()
+        fitz.TOOLS.store_shrink(100)
+
+    def close(self):
+        """完成写入并生成最终输出文件；没有任何页面时不生成文件。"""
+        if self._document is None:
+            return
+        if self.page_count == 0:
+            self.abort()
+            return
+        try:
+            # 暂存文件中尚未保存的页面随完整保存一并写出，garbage=3 合并重复对象
+            self._document.save(self._part_path, garbage=3, deflate=True)
+        except Exception:
+            self.abort()
+            raise
+        self._document.close()
+        self._document = None
+        self._remove(self._spool_path)
+        os.replace(self._part_path, self.output_path)
+
+    def abort(self):
+        """放弃写入并删除临时文件。"""
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+        self._remove(self._spool_path)
+        self._remove(self._part_path)
+
+    @staticmethod
+    def _remove(path):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except Exception as e:
+                logging.warning(f"Unable to remove partial output {path}: {e}")
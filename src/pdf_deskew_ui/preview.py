@@ -0,0 +1,116 @@
+# src/pdf_deskew_ui/preview.py
+
+from collections import OrderedDict
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from PyQt6.QtGui import QImage
+
+from deskew_tool.buffers import pixmap_array
+from deskew_tool.deskew_pdf import IMAGE_STAGES, STAGE_FEATURES, _apply_image_stages
+
+
+def fit_dpi(rect, size):
+    """
+    计算页面恰好放入显示区域时的渲染分辨率。
+    :param rect: 页面矩形（点）
+    :param size: 显示区域 (宽, 高)，单位为像素
+    :return: 整数 DPI，至少为 1
+    """
+    width, height = size
+    return max(1, int(min(width / rect.width, height / rect.height) * 72))
+
+
+def render_page(page, dpi):
+    """
+    以显示分辨率渲染页面，不按处理 DPI 渲染整页。
+    :param page: fitz 页面
+    :param dpi: 渲染分辨率，通常由 fit_dpi 计算
+    :return: RGB 图像
+    """
+    return pixmap_array(page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False))
+
+
+def fit_image(image, size):
+    """把图像缩小到恰好放入显示区域，比显示区域小的图像原样返回。"""
+    height, width = image.shape[:2]
+    scale = min(size[0] / width, size[1] / height)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def to_qimage(image):
+    """
+    把 RGB 或单通道 uint8 图像转换为 QImage。
+    QImage 复制像素数据，不依赖数组的生命周期，可以在工作线程中创建后通过信号传给界面线程。
+    """
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    image_format = QImage.Format.Format_Grayscale8 if image.ndim == 2 else QImage.Format.Format_RGB888
+    return QImage(image.data, width, height, image.strides[0], image_format).copy()
+
+
+class LRUCache:
+    """条目数有限的缓存，超出容量时淘汰最久未使用的条目。"""
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class StagePreview:
+    """
+    在一张显示分辨率的页面图像上依次应用图像处理功能，并保留每个功能的输出。
+    设置变化时只重新执行参数发生变化的功能及其之后的功能，之前的功能直接复用上次的输出。
+    """
+
+    def __init__(self, image):
+        """
+        :param image: 处理前的页面图像，不会被修改
+        """
+        self.image = image
+        # 每个功能一项：(该功能及之前各功能的参数, 该功能的输出)
+        self._outputs = []
+
+    def run(self, selected_features, is_current=None):
+        """
+        :param selected_features: 图像处理功能及其参数，与 deskew_pdf 相同
+        :param is_current: 可选，执行每个功能之前调用，返回 False 表示设置已经过时，放弃本次处理
+        :return: 处理后的图像；放弃处理时为 None
+        """
+        img = self.image
+        key = ()
+        for index, stage in enumerate(IMAGE_STAGES):
+            enabled = selected_features.get(stage, False)
+            key += (tuple(selected_features.get(name) for name in STAGE_FEATURES[stage]) if enabled else None,)
+            if index < len(self._outputs) and self._outputs[index][0] == key:
+                img = self._outputs[index][1]
+                continue
+            if is_current is not None and not is_current():
+                return None
+            # 未使用缓冲区池时各功能不修改输入图像，上一功能的输出可以保留复用
+            img, _ = _apply_image_stages(img, selected_features, stages=(stage,))
+            del self._outputs[index:]
+            self._outputs.append((key, img))
+        return img
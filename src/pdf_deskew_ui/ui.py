@@ -12,10 +12,13 @@ from PyQt6.QtWidgets import (
     QComboBox, QProgressBar, QColorDialog, QApplication, QTextEdit, QSlider,
     QTabWidget
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QIcon, QPixmap
 
-from .worker import WorkerThread
+import fitz  # PyMuPDF
+
+from deskew_tool.deskew_pdf import parse_page_ranges
+from .worker import PreviewThread, WorkerThread
 from qt_material import apply_stylesheet
 
 # 定义语言枚举
@@ -55,6 +58,15 @@ class MainWindow(QMainWindow):
                 "output_pdf": "Output PDF File:",
                 "use_defaults": "Use Recommended Settings (DPI=300, Background=White)",
                 "render_dpi": "Render DPI:",
+                "detect_dpi": "Detection DPI:",
+                "detect_dpi_same": "Same as render DPI",
+                "detect_dpi_tooltip": "Skew is measured on a downscaled copy at this DPI and applied at the render DPI",
+                "pages": "Pages:",
+                "pages_placeholder": "All pages, e.g. 1-10,57,200-",
+                "pages_tooltip": "Only deskew these pages (1-based). '200-' runs to the last page",
+                "drop_unselected": "Leave other pages out of the output",
+                "pages_error_title": "Page Range Error",
+                "pages_error_text": "Please enter a valid page range, e.g. 1-10,57,200-.",
                 "background_color": "Background Color:",
                 "white": "White",
                 "black": "Black",
@@ -86,6 +98,9 @@ class MainWindow(QMainWindow):
                 "input_path": "Input PDF File Path:",
                 "output_path": "Output PDF File Path:",
                 "dpi": "Render DPI:",
+                "detect_dpi_confirm": "Detection DPI:",
+                "pages_confirm": "Pages:",
+                "all_pages": "All",
                 "bg_color": "Background Color:",
                 "confirm": "Confirm",
                 "cancel": "Cancel",
@@ -112,6 +127,9 @@ class MainWindow(QMainWindow):
                 "enhance_image": "Enhance Image",
                 "convert_grayscale": "Convert to Grayscale",
                 "log_label": "Log:",
+                "live_preview": "Live Preview",
+                "live_preview_tooltip": "Preview the image processing settings on one page while you change them",
+                "preview_page": "Page:",
                 # Tab页标签
                 "tab_basic": "Basic Settings",
                 "tab_watermark": "Watermark Removal",
@@ -123,6 +141,9 @@ class MainWindow(QMainWindow):
                 "telea": "Telea",
                 "navier_stokes": "Navier-Stokes",
                 "watermark_mask_threshold": "Watermark Mask Threshold:",
+                "watermark_mask": "Watermark Mask:",
+                "watermark_mask_page": "Each page",
+                "watermark_mask_document": "Shared by all pages",
                 "contrast_enhancement": "Contrast Enhancement:",
                 "contrast_level": "Contrast Level:",
                 "denoising_method": "Denoising Method:",
@@ -143,6 +164,15 @@ class MainWindow(QMainWindow):
                 "output_pdf": "输出 PDF 文件:",
                 "use_defaults": "使用推荐设置 (DPI=300, 背景色=白色)",
                 "render_dpi": "渲染 DPI:",
+                "detect_dpi": "检测 DPI:",
+                "detect_dpi_same": "与渲染 DPI 相同",
+                "detect_dpi_tooltip": "在此 DPI 的降采样图像上检测倾斜角度，并在渲染 DPI 下进行校正",
+                "pages": "页码范围:",
+                "pages_placeholder": "全部页面，例如 1-10,57,200-",
+                "pages_tooltip": "只校准这些页面（页码从 1 开始），“200-”表示到最后一页",
+                "drop_unselected": "输出文件中不保留其他页面",
+                "pages_error_title": "页码范围错误",
+                "pages_error_text": "请输入有效的页码范围，例如 1-10,57,200-。",
                 "background_color": "背景颜色:",
                 "white": "白色",
                 "black": "黑色",
@@ -174,6 +204,9 @@ class MainWindow(QMainWindow):
                 "input_path": "输入 PDF 文件路径:",
                 "output_path": "输出 PDF 文件路径:",
                 "dpi": "渲染 DPI:",
+                "detect_dpi_confirm": "检测 DPI:",
+                "pages_confirm": "页码范围:",
+                "all_pages": "全部",
                 "bg_color": "背景颜色:",
                 "confirm": "确认",
                 "cancel": "取消",
@@ -200,6 +233,9 @@ class MainWindow(QMainWindow):
                 "enhance_image": "增强图像",
                 "convert_grayscale": "转换为灰度图像",
                 "log_label": "日志:",
+                "live_preview": "实时预览",
+                "live_preview_tooltip": "调整设置时在单个页面上预览图像处理效果",
+                "preview_page": "页码:",
                 # Tab页标签
                 "tab_basic": "基础设置",
                 "tab_watermark": "水印移除",
@@ -211,6 +247,9 @@ class MainWindow(QMainWindow):
                 "telea": "Telea",
                 "navier_stokes": "Navier-Stokes",
                 "watermark_mask_threshold": "水印掩码阈值:",
+                "watermark_mask": "水印掩码:",
+                "watermark_mask_page": "逐页生成",
+                "watermark_mask_document": "各页共有",
                 "contrast_enhancement": "对比度增强:",
                 "contrast_level": "对比度等级:",
                 "denoising_method": "去噪方法:",
@@ -242,6 +281,13 @@ class MainWindow(QMainWindow):
         self.output_browse.setToolTip(t["browse_tooltip"])
         self.default_checkbox.setText(t["use_defaults"])
         self.dpi_label.setText(t["render_dpi"])
+        self.detect_dpi_label.setText(t["detect_dpi"])
+        self.detect_dpi_spin.setSpecialValueText(t["detect_dpi_same"])
+        self.detect_dpi_spin.setToolTip(t["detect_dpi_tooltip"])
+        self.pages_label.setText(t["pages"])
+        self.pages_line.setPlaceholderText(t["pages_placeholder"])
+        self.pages_line.setToolTip(t["pages_tooltip"])
+        self.drop_unselected_checkbox.setText(t["drop_unselected"])
         self.bg_label.setText(t["background_color"])
         self.bg_combo.clear()
         self.bg_combo.addItems([t["white"], t["black"], t["custom"]])
@@ -267,7 +313,6 @@ class MainWindow(QMainWindow):
         self.current_page_label.setText(t.get("current_page_label", "Current Page:"))
 
         # 更新图像处理选项标签和复选框
-        self.image_processing_group.setTitle(t.get("image_processing", "Image Processing Options:"))
         self.remove_watermark_checkbox.setText(t.get("remove_watermark", "Remove Watermark"))
         self.enhance_image_checkbox.setText(t.get("enhance_image", "Enhance Image"))
         self.contrast_enhancement_checkbox.setText(t.get("contrast_enhancement", "Contrast Enhancement:"))
@@ -276,6 +321,11 @@ class MainWindow(QMainWindow):
         # 更新日志标签
         self.log_label.setText(t.get("log_label", "Log:"))
 
+        # 更新实时预览选项
+        self.live_preview_checkbox.setText(t.get("live_preview", "Live Preview"))
+        self.live_preview_checkbox.setToolTip(t.get("live_preview_tooltip", "Preview the image processing settings"))
+        self.preview_page_label.setText(t.get("preview_page", "Page:"))
+
         # 更新标签页标题
         if hasattr(self, 'tabs'):
             self.tabs.setTabText(0, t.get("tab_basic", "Basic Settings"))
@@ -287,6 +337,9 @@ class MainWindow(QMainWindow):
         self.watermark_removal_method_label.setText(t.get("watermark_removal_method", "Watermark Removal Method:"))
         self.inpainting_algorithm_label.setText(t.get("inpainting_algorithm", "Inpainting Algorithm:"))
         self.watermark_mask_threshold_label.setText(t.get("watermark_mask_threshold", "Watermark Mask Threshold:"))
+        self.watermark_mask_label.setText(t.get("watermark_mask", "Watermark Mask:"))
+        self.watermark_mask_combo.setItemText(0, t.get("watermark_mask_page", "Each page"))
+        self.watermark_mask_combo.setItemText(1, t.get("watermark_mask_document", "Shared by all pages"))
 
         # 更新图像增强参数
         self.contrast_level_label.setText(t.get("contrast_level", "Contrast Level:"))
@@ -365,199 +418,27 @@ class MainWindow(QMainWindow):
         dpi_layout.addStretch()
         basic_layout.addLayout(dpi_layout)
 
-        # 背景颜色
-        bg_layout = QHBoxLayout()
-        self.bg_label = QLabel()
-        self.bg_combo = QComboBox()
-        self.bg_combo.setEnabled(False)
-        self.bg_combo.currentIndexChanged.connect(self.bg_selection_changed)
-        self.bg_button = QPushButton()
-        self.bg_button.setIcon(QIcon.fromTheme("color-picker"))
-        self.bg_button.setEnabled(False)
-        self.bg_button.clicked.connect(self.choose_color)
-        bg_layout.addWidget(self.bg_label)
-        bg_layout.addWidget(self.bg_combo)
-        bg_layout.addWidget(self.bg_button)
-        bg_layout.addStretch()
-        basic_layout.addLayout(bg_layout)
-
-        basic_layout.addStretch()
-        basic_widget.setLayout(basic_layout)
-        self.tabs.addTab(basic_widget, "Basic Settings")
-
-        # ===== 标签页 2: 水印移除 =====
-        watermark_widget = QWidget()
-        watermark_layout = QVBoxLayout()
-
-        self.remove_watermark_checkbox = QCheckBox()
-        self.remove_watermark_checkbox.setChecked(True)
-        self.remove_watermark_checkbox.stateChanged.connect(self.toggle_watermark_options)
-        watermark_layout.addWidget(self.remove_watermark_checkbox)
-
-        watermark_method_layout = QHBoxLayout()
-        self.watermark_removal_method_label = QLabel()
-        self.watermark_removal_method_combo = QComboBox()
-        self.watermark_removal_method_combo.addItems(["Inpainting"])
-        self.watermark_removal_method_combo.setEnabled(False)
-        watermark_method_layout.addWidget(self.watermark_removal_method_label)
-        watermark_method_layout.addWidget(self.watermark_removal_method_combo)
-        watermark_method_layout.addStretch()
-        watermark_layout.addLayout(watermark_method_layout)
-
-        inpainting_layout = QHBoxLayout()
-        self.inpainting_algorithm_label = QLabel()
-        self.inpainting_algorithm_combo = QComboBox()
-        self.inpainting_algorithm_combo.addItems(["Telea", "Navier-Stokes"])
-        self.inpainting_algorithm_combo.setEnabled(False)
-        inpainting_layout.addWidget(self.inpainting_algorithm_label)
-        inpainting_layout.addWidget(self.inpainting_algorithm_combo)
-        inpainting_layout.addStretch()
-        watermark_layout.addLayout(inpainting_layout)
-
-        threshold_layout = QHBoxLayout()
-        self.watermark_mask_threshold_label = QLabel()
-        self.watermark_mask_threshold_spin = QSpinBox()
-        self.watermark_mask_threshold_spin.setRange(0, 255)
-        self.watermark_mask_threshold_spin.setValue(127)
-        self.watermark_mask_threshold_spin.setEnabled(False)
-        threshold_layout.addWidget(self.watermark_mask_threshold_label)
-        threshold_layout.addWidget(self.watermark_mask_threshold_spin)
-        threshold_layout.addStretch()
-        watermark_layout.addLayout(threshold_layout)
-
-        watermark_layout.addStretch()
-        watermark_widget.setLayout(watermark_layout)
-        self.tabs.addTab(watermark_widget, "Watermark Removal")
-
-        # ===== 标签页 3: 图像增强 =====
-        enhance_widget = QWidget()
-        enhance_layout = QVBoxLayout()
-
-        self.enhance_image_checkbox = QCheckBox()
-        self.enhance_image_checkbox.setChecked(True)
-        self.enhance_image_checkbox.stateChanged.connect(self.toggle_enhance_options)
-        enhance_layout.addWidget(self.enhance_image_checkbox)
-
-        # 对比度增强
-        self.contrast_enhancement_checkbox = QCheckBox()
-        self.contrast_enhancement_checkbox.setChecked(True)
-        self.contrast_enhancement_checkbox.stateChanged.connect(self.toggle_contrast_enhancement_options)
-        enhance_layout.addWidget(self.contrast_enhancement_checkbox)
-
-        contrast_layout = QHBoxLayout()
-        self.contrast_level_label = QLabel()
-        self.contrast_level_slider = QSlider(Qt.Orientation.Horizontal)
-        self.contrast_level_slider.setRange(1, 3)
-        self.contrast_level_slider.setValue(2)
-        self.contrast_level_slider.setEnabled(False)
-        contrast_layout.addWidget(self.contrast_level_label)
-        contrast_layout.addWidget(self.contrast_level_slider)
-        enhance_layout.addLayout(contrast_layout)
-
-        # 去噪
-        denoising_layout = QHBoxLayout()
-        self.denoising_method_label = QLabel()
-        self.denoising_method_combo = QComboBox()
-        self.denoising_method_combo.addItems(["Gaussian", "Median"])
-        self.denoising_method_combo.setEnabled(False)
-        denoising_layout.addWidget(self.denoising_method_label)
-        denoising_layout.addWidget(self.denoising_method_combo)
-        denoising_layout.addStretch()
-        enhance_layout.addLayout(denoising_layout)
-
-        kernel_layout = QHBoxLayout()
-        self.denoising_kernel_label = QLabel()
-        self.denoising_kernel_spin = QSpinBox()
-        self.denoising_kernel_spin.setRange(1, 31)
-        self.denoising_kernel_spin.setValue(3)
-        self.denoising_kernel_spin.setEnabled(False)
-        kernel_layout.addWidget(self.denoising_kernel_label)
-        kernel_layout.addWidget(self.denoising_kernel_spin)
-        kernel_layout.addStretch()
-        enhance_layout.addLayout(kernel_layout)
-
-        # 锐化
-        self.sharpening_checkbox = QCheckBox()
-        self.sharpening_checkbox.setChecked(False)
-        self.sharpening_checkbox.stateChanged.connect(self.toggle_sharpening_options)
-        enhance_layout.addWidget(self.sharpening_checkbox)
-
-        sharp_layout = QHBoxLayout()
-        self.sharpening_strength_label = QLabel()
-        self.sharpening_strength_slider = QSlider(Qt.Orientation.Horizontal)
-        self.sharpening_strength_slider.setRange(1, 5)
-        self.sharpening_strength_slider.setValue(3)
-        self.sharpening_strength_slider.setEnabled(False)
-        sharp_layout.addWidget(self.sharpening_strength_label)
-        sharp_layout.addWidget(self.sharpening_strength_slider)
-        enhance_layout.addLayout(sharp_layout)
-
-        enhance_layout.addStretch()
-        enhance_widget.setLayout(enhance_layout)
-        self.tabs.addTab(enhance_widget, "Image Enhancement")
-
-        # ===== 标签页 4: 灰度转换 =====
-        grayscale_widget = QWidget()
-        grayscale_layout = QVBoxLayout()
-
-        self.convert_grayscale_checkbox = QCheckBox()
-        self.convert_grayscale_checkbox.setChecked(False)
-        self.convert_grayscale_checkbox.stateChanged.connect(self.toggle_grayscale_options)
-        grayscale_layout.addWidget(self.convert_grayscale_checkbox)
-
-        quant_layout = QHBoxLayout()
-        self.grayscale_quantization_label = QLabel()
-        self.grayscale_quant_levels_label = QLabel()
-        self.grayscale_quant_levels_spin = QSpinBox()
-        self.grayscale_quant_levels_spin.setRange(2, 256)
-        self.grayscale_quant_levels_spin.setValue(64)
-        self.grayscale_quant_levels_spin.setEnabled(False)
-        quant_layout.addWidget(self.grayscale_quantization_label)
-        quant_layout.addWidget(self.grayscale_quant_levels_label)
-        quant_layout.addWidget(self.grayscale_quant_levels_spin)
-        quant_layout.addStretch()
-        grayscale_layout.addLayout(quant_layout)
-
-        scale_layout = QHBoxLayout()
-        self.grayscale_scaling_label = QLabel()
-        self.grayscale_scale_factor_label = QLabel()
-        self.grayscale_scale_factor_spin = QSpinBox()
-        self.grayscale_scale_factor_spin.setRange(1, 5)
-        self.grayscale_scale_factor_spin.setValue(1)
-        self.grayscale_scale_factor_spin.setEnabled(False)
-        scale_layout.addWidget(self.grayscale_scaling_label)
-        scale_layout.addWidget(self.grayscale_scale_factor_label)
-        scale_layout.addWidget(self.grayscale_scale_factor_spin)
-        scale_layout.addStretch()
-        grayscale_layout.addLayout(scale_layout)
-
-        smooth_method_layout = QHBoxLayout()
-        self.grayscale_smoothing_method_label = QLabel()
-        self.grayscale_smoothing_method_combo = QComboBox()
-        self.grayscale_smoothing_method_combo.addItems(["Gaussian", "Median"])
-        self.grayscale_smoothing_method_combo.setEnabled(False)
-        smooth_method_layout.addWidget(self.grayscale_smoothing_method_label)
-        smooth_method_layout.addWidget(self.grayscale_smoothing_method_combo)
-        smooth_method_layout.addStretch()
-        grayscale_layout.addLayout(smooth_method_layout)
-
-        smooth_kernel_layout = QHBoxLayout()
-        self.grayscale_smoothing_kernel_label = QLabel()
-        self.grayscale_smoothing_kernel_spin = QSpinBox()
-        self.grayscale_smoothing_kernel_spin.setRange(1, 31)
-        self.grayscale_smoothing_kernel_spin.setValue(3)
-        self.grayscale_smoothing_kernel_spin.setEnabled(False)
-        smooth_kernel_layout.addWidget(self.grayscale_smoothing_kernel_label)
-        smooth_kernel_layout.addWidget(self.grayscale_smoothing_kernel_spin)
-        smooth_kernel_layout.addStretch()
-        grayscale_layout.addLayout(smooth_kernel_layout)
-
-        grayscale_layout.addStretch()
-        grayscale_widget.setLayout(grayscale_layout)
-        self.tabs.addTab(grayscale_widget, "Grayscale Conversion")
-
-        main_layout.addWidget(self.tabs)
-        basic_layout.addLayout(dpi_layout)
+        # 检测 DPI 设置（最小值 0 表示与渲染 DPI 相同）
+        detect_dpi_layout = QHBoxLayout()
+        self.detect_dpi_label = QLabel()
+        self.detect_dpi_spin = QSpinBox()
+        self.detect_dpi_spin.setRange(0, 1200)
+        self.detect_dpi_spin.setValue(100)
+        self.detect_dpi_spin.setEnabled(False)
+        detect_dpi_layout.addWidget(self.detect_dpi_label)
+        detect_dpi_layout.addWidget(self.detect_dpi_spin)
+        detect_dpi_layout.addStretch()
+        basic_layout.addLayout(detect_dpi_layout)
+
+        # 页码范围（留空表示全部页面），不受推荐设置影响
+        pages_layout = QHBoxLayout()
+        self.pages_label = QLabel()
+        self.pages_line = QLineEdit()
+        self.drop_unselected_checkbox = QCheckBox()
+        pages_layout.addWidget(self.pages_label)
+        pages_layout.addWidget(self.pages_line)
+        pages_layout.addWidget(self.drop_unselected_checkbox)
+        basic_layout.addLayout(pages_layout)
 
         # 背景颜色
         bg_layout = QHBoxLayout()
@@ -619,6 +500,18 @@ class MainWindow(QMainWindow):
         threshold_layout.addStretch()
         watermark_layout.addLayout(threshold_layout)
 
+        # 水印掩码：逐页生成，或从抽样页面估计一次各页共有的水印区域
+        watermark_mask_layout = QHBoxLayout()
+        self.watermark_mask_label = QLabel()
+        self.watermark_mask_combo = QComboBox()
+        self.watermark_mask_combo.addItem("Each page", "page")
+        self.watermark_mask_combo.addItem("Shared by all pages", "document")
+        self.watermark_mask_combo.setEnabled(False)
+        watermark_mask_layout.addWidget(self.watermark_mask_label)
+        watermark_mask_layout.addWidget(self.watermark_mask_combo)
+        watermark_mask_layout.addStretch()
+        watermark_layout.addLayout(watermark_mask_layout)
+
         watermark_layout.addStretch()
         watermark_widget.setLayout(watermark_layout)
         self.tabs.addTab(watermark_widget, "Watermark Removal")
@@ -840,16 +733,30 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(self.log_label)
         main_layout.addWidget(self.log_text)
 
+        # 实时预览：调整设置时在选定页面上预览图像处理效果
+        preview_layout = QHBoxLayout()
+        self.live_preview_checkbox = QCheckBox()
+        self.live_preview_checkbox.stateChanged.connect(self.toggle_live_preview)
+        self.preview_page_label = QLabel()
+        self.preview_page_spin = QSpinBox()
+        self.preview_page_spin.setRange(1, 1)
+        self.preview_page_spin.setEnabled(False)
+        preview_layout.addWidget(self.live_preview_checkbox)
+        preview_layout.addWidget(self.preview_page_label)
+        preview_layout.addWidget(self.preview_page_spin)
+        preview_layout.addStretch()
+        main_layout.addLayout(preview_layout)
+
         # 处理前后对比
         images_layout = QHBoxLayout()
         self.before_label = QLabel("Before")
         self.before_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.before_label.setStyleSheet("border: 1px solid black;")
-        self.before_label.setMaximumHeight(150)
+        self.before_label.setFixedHeight(150)
         self.after_label = QLabel("After")
         self.after_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.after_label.setStyleSheet("border: 1px solid black;")
-        self.after_label.setMaximumHeight(150)
+        self.after_label.setFixedHeight(150)
         images_layout.addWidget(self.before_label)
         images_layout.addWidget(self.after_label)
         main_layout.addLayout(images_layout)
@@ -862,6 +769,25 @@ class MainWindow(QMainWindow):
         # 设置窗口大小
         self.resize(900, 700)
 
+        # 设置变化后等待一段时间再更新预览，连续调整时只处理最后一次设置
+        self.preview_thread = None
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(150)
+        self.preview_timer.timeout.connect(self.request_preview)
+        self.input_line.textChanged.connect(self.schedule_preview)
+        self.preview_page_spin.valueChanged.connect(self.schedule_preview)
+        for checkbox in (self.default_checkbox, self.remove_watermark_checkbox, self.enhance_image_checkbox,
+                         self.contrast_enhancement_checkbox, self.sharpening_checkbox, self.convert_grayscale_checkbox):
+            checkbox.stateChanged.connect(self.schedule_preview)
+        for control in (self.watermark_mask_threshold_spin, self.contrast_level_slider, self.denoising_kernel_spin,
+                        self.sharpening_strength_slider, self.grayscale_quant_levels_spin,
+                        self.grayscale_scale_factor_spin, self.grayscale_smoothing_kernel_spin):
+            control.valueChanged.connect(self.schedule_preview)
+        for combo in (self.inpainting_algorithm_combo, self.denoising_method_combo,
+                      self.grayscale_smoothing_method_combo):
+            combo.currentIndexChanged.connect(self.schedule_preview)
+
         # 初始化文本
         self.init_ui_texts()
 
@@ -911,6 +837,7 @@ class MainWindow(QMainWindow):
         t = self.get_translation()
         if state == Qt.CheckState.Checked.value:
             self.dpi_spin.setEnabled(False)
+            self.detect_dpi_spin.setEnabled(False)
             self.bg_combo.setEnabled(False)
             self.bg_button.setEnabled(False)
             # Disable image processing options when using defaults
@@ -922,6 +849,7 @@ class MainWindow(QMainWindow):
             self.watermark_removal_method_combo.setEnabled(False)
             self.inpainting_algorithm_combo.setEnabled(False)
             self.watermark_mask_threshold_spin.setEnabled(False)
+            self.watermark_mask_combo.setEnabled(False)
             # Disable image enhancement parameters
             self.contrast_level_slider.setEnabled(False)
             self.denoising_method_combo.setEnabled(False)
@@ -935,6 +863,7 @@ class MainWindow(QMainWindow):
             self.grayscale_smoothing_kernel_spin.setEnabled(False)
         else:
             self.dpi_spin.setEnabled(True)
+            self.detect_dpi_spin.setEnabled(True)
             self.bg_combo.setEnabled(True)
             if self.bg_combo.currentText() == t["custom"]:
                 self.bg_button.setEnabled(True)
@@ -949,6 +878,7 @@ class MainWindow(QMainWindow):
             self.watermark_removal_method_combo.setEnabled(self.remove_watermark_checkbox.isChecked())
             self.inpainting_algorithm_combo.setEnabled(self.remove_watermark_checkbox.isChecked())
             self.watermark_mask_threshold_spin.setEnabled(self.remove_watermark_checkbox.isChecked())
+            self.watermark_mask_combo.setEnabled(self.remove_watermark_checkbox.isChecked())
             # Enable image enhancement parameters if enhancement is checked
             self.contrast_level_slider.setEnabled(self.enhance_image_checkbox.isChecked() and self.contrast_enhancement_checkbox.isChecked())
             self.denoising_method_combo.setEnabled(self.enhance_image_checkbox.isChecked() and self.contrast_enhancement_checkbox.isChecked())
@@ -967,6 +897,7 @@ class MainWindow(QMainWindow):
         self.watermark_removal_method_combo.setEnabled(enabled)
         self.inpainting_algorithm_combo.setEnabled(enabled)
         self.watermark_mask_threshold_spin.setEnabled(enabled)
+        self.watermark_mask_combo.setEnabled(enabled)
 
     def toggle_enhance_options(self, state):
         """切换图像增强参数选项"""
@@ -1022,6 +953,52 @@ class MainWindow(QMainWindow):
         t = self.get_translation()
         QMessageBox.information(self, t["help_info_title"], t["help_info_text"])
 
+    def collect_selected_features(self) -> Dict:
+        """根据界面设置（或推荐设置）收集图像处理功能及其参数"""
+        if self.default_checkbox.isChecked():
+            # 使用默认图像处理选项及参数
+            return {
+                "remove_watermark": True,
+                "enhance_image": True,
+                "convert_grayscale": False,
+                "watermark_method": "Inpainting",
+                "inpainting_algorithm": "Telea",
+                "watermark_threshold": 127,
+                "watermark_mask": "page",
+                "contrast_enhancement": True,
+                "contrast_level": 2,
+                "denoising_method": "Gaussian",
+                "denoising_kernel": 3,
+                "sharpening": False,
+                "sharpening_strength": 3,
+                "grayscale_quant_levels": 64,
+                "grayscale_scale_factor": 1,
+                "grayscale_smoothing_method": "Gaussian",
+                "grayscale_smoothing_kernel": 3
+            }
+        return {
+            "remove_watermark": self.remove_watermark_checkbox.isChecked(),
+            "enhance_image": self.enhance_image_checkbox.isChecked(),
+            "convert_grayscale": self.convert_grayscale_checkbox.isChecked(),
+            # 水印移除参数
+            "watermark_method": self.watermark_removal_method_combo.currentText(),
+            "inpainting_algorithm": self.inpainting_algorithm_combo.currentText(),
+            "watermark_threshold": self.watermark_mask_threshold_spin.value(),
+            "watermark_mask": self.watermark_mask_combo.currentData(),
+            # 图像增强参数
+            "contrast_enhancement": self.contrast_enhancement_checkbox.isChecked(),
+            "contrast_level": self.contrast_level_slider.value(),
+            "denoising_method": self.denoising_method_combo.currentText(),
+            "denoising_kernel": self.denoising_kernel_spin.value(),
+            "sharpening": self.sharpening_checkbox.isChecked(),
+            "sharpening_strength": self.sharpening_strength_slider.value(),
+            # 灰度转换参数
+            "grayscale_quant_levels": self.grayscale_quant_levels_spin.value(),
+            "grayscale_scale_factor": self.grayscale_scale_factor_spin.value(),
+            "grayscale_smoothing_method": self.grayscale_smoothing_method_combo.currentText(),
+            "grayscale_smoothing_kernel": self.grayscale_smoothing_kernel_spin.value()
+        }
+
     def start_processing(self):
         """开始PDF校准处理"""
         try:
@@ -1038,30 +1015,30 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, t["output_error_title"], t["output_error_text"])
                 return
 
+            # 校验页码范围
+            pages = self.pages_line.text().strip() or None
+            if pages:
+                # 在界面线程中打开文档前先停止预览线程
+                self.pause_live_preview()
+                try:
+                    with fitz.open(input_pdf) as document:
+                        if not parse_page_ranges(pages, len(document)):
+                            raise ValueError(pages)
+                except ValueError:
+                    QMessageBox.warning(self, t["pages_error_title"], t["pages_error_text"])
+                    return
+                finally:
+                    self.resume_live_preview()
+            unselected_pages = "drop" if self.drop_unselected_checkbox.isChecked() else "copy"
+
             use_defaults = self.default_checkbox.isChecked()
             if use_defaults:
                 dpi = 300
+                detect_dpi = 100
                 background_color = self.background_colors["White"].rgb
-                # 使用默认图像处理选项
-                remove_watermark = True
-                enhance_image = True
-                convert_grayscale = False
-                # 默认参数
-                watermark_method = "Inpainting"
-                inpainting_algo = "Telea"
-                watermark_threshold = 127
-                contrast_enhancement = True
-                contrast_level = 2
-                denoising_method = "Gaussian"
-                denoising_kernel = 3
-                sharpening = False
-                sharpening_strength = 3
-                grayscale_quant_levels = 64
-                grayscale_scale_factor = 1
-                grayscale_smoothing_method = "Gaussian"
-                grayscale_smoothing_kernel = 3
             else:
                 dpi = self.dpi_spin.value()
+                detect_dpi = self.detect_dpi_spin.value() or None
                 bg_selection = self.bg_combo.currentText()
                 if bg_selection == t["white"]:
                     background_color = self.background_colors["White"].rgb
@@ -1072,29 +1049,8 @@ class MainWindow(QMainWindow):
                 else:
                     background_color = self.background_colors["White"].rgb  # 默认白色
 
-                # 获取用户选择的图像处理选项
-                remove_watermark = self.remove_watermark_checkbox.isChecked()
-                enhance_image = self.enhance_image_checkbox.isChecked()
-                convert_grayscale = self.convert_grayscale_checkbox.isChecked()
-
-                # 获取水印移除参数
-                watermark_method = self.watermark_removal_method_combo.currentText()
-                inpainting_algo = self.inpainting_algorithm_combo.currentText()
-                watermark_threshold = self.watermark_mask_threshold_spin.value()
-
-                # 获取图像增强参数
-                contrast_enhancement = self.contrast_enhancement_checkbox.isChecked()
-                contrast_level = self.contrast_level_slider.value()
-                denoising_method = self.denoising_method_combo.currentText()
-                denoising_kernel = self.denoising_kernel_spin.value()
-                sharpening = self.sharpening_checkbox.isChecked()
-                sharpening_strength = self.sharpening_strength_slider.value()
-
-                # 获取灰度转换参数
-                grayscale_quant_levels = self.grayscale_quant_levels_spin.value()
-                grayscale_scale_factor = self.grayscale_scale_factor_spin.value()
-                grayscale_smoothing_method = self.grayscale_smoothing_method_combo.currentText()
-                grayscale_smoothing_kernel = self.grayscale_smoothing_kernel_spin.value()
+            # 获取用户选择的图像处理选项及其参数
+            selected_features = self.collect_selected_features()
 
             # 确认设置
             confirm_text = (
@@ -1102,34 +1058,37 @@ class MainWindow(QMainWindow):
                 f"<p><b>{t['input_path']}</b> {input_pdf}</p>"
                 f"<p><b>{t['output_path']}</b> {output_pdf}</p>"
                 f"<p><b>{t['dpi']}</b> {dpi}</p>"
+                f"<p><b>{t['detect_dpi_confirm']}</b> {detect_dpi or dpi}</p>"
+                f"<p><b>{t['pages_confirm']}</b> {pages or t['all_pages']}</p>"
                 f"<p><b>{t['bg_color']}</b> {background_color}</p>"
-                f"<p><b>{t['remove_watermark']}</b> {'Yes' if remove_watermark else 'No'}</p>"
-                f"<p><b>{t['enhance_image']}</b> {'Yes' if enhance_image else 'No'}</p>"
-                f"<p><b>{t['convert_grayscale']}</b> {'Yes' if convert_grayscale else 'No'}</p>"
+                f"<p><b>{t['remove_watermark']}</b> {'Yes' if selected_features['remove_watermark'] else 'No'}</p>"
+                f"<p><b>{t['enhance_image']}</b> {'Yes' if selected_features['enhance_image'] else 'No'}</p>"
+                f"<p><b>{t['convert_grayscale']}</b> {'Yes' if selected_features['convert_grayscale'] else 'No'}</p>"
             )
 
             if not use_defaults:
                 # 添加详细参数到确认文本
                 confirm_text += "<h3>Watermark Removal Parameters:</h3>"
-                confirm_text += f"<p><b>{t['watermark_removal_method']}</b> {watermark_method}</p>"
-                confirm_text += f"<p><b>{t['inpainting_algorithm']}</b> {inpainting_algo}</p>"
-                confirm_text += f"<p><b>{t['watermark_mask_threshold']}</b> {watermark_threshold}</p>"
+                confirm_text += f"<p><b>{t['watermark_removal_method']}</b> {selected_features['watermark_method']}</p>"
+                confirm_text += f"<p><b>{t['inpainting_algorithm']}</b> {selected_features['inpainting_algorithm']}</p>"
+                confirm_text += f"<p><b>{t['watermark_mask_threshold']}</b> {selected_features['watermark_threshold']}</p>"
+                confirm_text += f"<p><b>{t['watermark_mask']}</b> {t['watermark_mask_' + selected_features['watermark_mask']]}</p>"
 
                 confirm_text += "<h3>Image Enhancement Parameters:</h3>"
-                confirm_text += f"<p><b>{t['contrast_enhancement']}</b> {'Yes' if contrast_enhancement else 'No'}</p>"
-                if contrast_enhancement:
-                    confirm_text += f"<p><b>{t['contrast_level']}</b> {contrast_level}</p>"
-                confirm_text += f"<p><b>{t['denoising_method']}</b> {denoising_method}</p>"
-                confirm_text += f"<p><b>{t['denoising_kernel_size']}</b> {denoising_kernel}</p>"
-                confirm_text += f"<p><b>{t['sharpening']}</b> {'Yes' if sharpening else 'No'}</p>"
-                if sharpening:
-                    confirm_text += f"<p><b>{t['sharpening_strength']}</b> {sharpening_strength}</p>"
+                confirm_text += f"<p><b>{t['contrast_enhancement']}</b> {'Yes' if selected_features['contrast_enhancement'] else 'No'}</p>"
+                if selected_features["contrast_enhancement"]:
+                    confirm_text += f"<p><b>{t['contrast_level']}</b> {selected_features['contrast_level']}</p>"
+                confirm_text += f"<p><b>{t['denoising_method']}</b> {selected_features['denoising_method']}</p>"
+                confirm_text += f"<p><b>{t['denoising_kernel_size']}</b> {selected_features['denoising_kernel']}</p>"
+                confirm_text += f"<p><b>{t['sharpening']}</b> {'Yes' if selected_features['sharpening'] else 'No'}</p>"
+                if selected_features["sharpening"]:
+                    confirm_text += f"<p><b>{t['sharpening_strength']}</b> {selected_features['sharpening_strength']}</p>"
 
                 confirm_text += "<h3>Grayscale Conversion Parameters:</h3>"
-                confirm_text += f"<p><b>{t['grayscale_quantization']}</b> {grayscale_quant_levels} levels</p>"
-                confirm_text += f"<p><b>{t['grayscale_scaling']}</b> {grayscale_scale_factor}x</p>"
-                confirm_text += f"<p><b>{t['grayscale_smoothing_method']}</b> {grayscale_smoothing_method}</p>"
-                confirm_text += f"<p><b>{t['grayscale_smoothing_kernel']}</b> {grayscale_smoothing_kernel}</p>"
+                confirm_text += f"<p><b>{t['grayscale_quantization']}</b> {selected_features['grayscale_quant_levels']} levels</p>"
+                confirm_text += f"<p><b>{t['grayscale_scaling']}</b> {selected_features['grayscale_scale_factor']}x</p>"
+                confirm_text += f"<p><b>{t['grayscale_smoothing_method']}</b> {selected_features['grayscale_smoothing_method']}</p>"
+                confirm_text += f"<p><b>{t['grayscale_smoothing_kernel']}</b> {selected_features['grayscale_smoothing_kernel']}</p>"
 
                 confirm_text += f"<p>{t['confirm_settings_text']}</p>"
 
@@ -1154,25 +1113,12 @@ class MainWindow(QMainWindow):
             self.log_text.clear()  # 清空日志窗口
 
             # 启动工作线程
-            selected_features = {
-                "remove_watermark": remove_watermark,
-                "enhance_image": enhance_image,
-                "convert_grayscale": convert_grayscale,
-                "watermark_method": watermark_method,
-                "inpainting_algorithm": inpainting_algo,
-                "watermark_threshold": watermark_threshold,
-                "contrast_enhancement": contrast_enhancement,
-                "contrast_level": contrast_level,
-                "denoising_method": denoising_method,
-                "denoising_kernel": denoising_kernel,
-                "sharpening": sharpening,
-                "sharpening_strength": sharpening_strength,
-                "grayscale_quant_levels": grayscale_quant_levels,
-                "grayscale_scale_factor": grayscale_scale_factor,
-                "grayscale_smoothing_method": grayscale_smoothing_method,
-                "grayscale_smoothing_kernel": grayscale_smoothing_kernel
-            }
-            self.worker = WorkerThread(input_pdf, output_pdf, dpi, background_color, selected_features)
+            # 预览图像按标签的物理像素尺寸生成
+            ratio = self.devicePixelRatioF()
+            preview_size = (max(1, round(self.before_label.width() * ratio)),
+                            max(1, round(self.before_label.height() * ratio)))
+            self.worker = WorkerThread(input_pdf, output_pdf, dpi, background_color, selected_features, detect_dpi=detect_dpi,
+                                       pages=pages, unselected_pages=unselected_pages, preview_size=preview_size)
             self.worker.progress.connect(self.update_progress)
             self.worker.finished.connect(self.processing_finished)
             self.worker.error.connect(self.processing_error)
@@ -1269,10 +1215,10 @@ class MainWindow(QMainWindow):
         self.set_ui_enabled(True)
         self.cancel_button.setEnabled(False)
 
-    def display_before_after(self, before_image_path, after_image_path):
-        """显示处理前后的图像"""
-        before_pix = QPixmap(before_image_path)
-        after_pix = QPixmap(after_image_path)
+    def display_before_after(self, before_image, after_image):
+        """显示处理前后的预览图像（已按显示尺寸生成）"""
+        before_pix = QPixmap.fromImage(before_image)
+        after_pix = QPixmap.fromImage(after_image)
 
         # 缩放图像以适应标签
         before_pix = before_pix.scaled(self.before_label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
@@ -1281,12 +1227,67 @@ class MainWindow(QMainWindow):
         self.before_label.setPixmap(before_pix)
         self.after_label.setPixmap(after_pix)
 
-        # 清理临时图像文件
-        try:
-            os.remove(before_image_path)
-            os.remove(after_image_path)
-        except Exception as e:
-            logging.warning(f"Unable to remove temporary images: {e}")
+    def toggle_live_preview(self, state):
+        """开启或关闭实时预览"""
+        enabled = self.live_preview_checkbox.isChecked()
+        self.preview_page_spin.setEnabled(enabled)
+        if enabled:
+            self.resume_live_preview()
+        else:
+            self.pause_live_preview()
+
+    def pause_live_preview(self):
+        """
+        停止预览线程。PyMuPDF 不支持多个线程同时使用，
+        处理作业运行期间以及界面线程打开文档之前都须先停止预览线程。
+        """
+        self.preview_timer.stop()
+        if self.preview_thread is not None:
+            self.preview_thread.stop()
+            self.preview_thread.wait()
+            self.preview_thread = None
+
+    def resume_live_preview(self):
+        """开启了实时预览时重新启动预览线程，并按当前设置刷新预览"""
+        if not self.live_preview_checkbox.isChecked() or self.preview_thread is not None:
+            return
+        self.preview_thread = PreviewThread()
+        self.preview_thread.preview_ready.connect(self.display_preview)
+        self.preview_thread.page_count.connect(self.update_preview_pages)
+        self.preview_thread.error.connect(self.update_status)
+        self.preview_thread.start()
+        self.schedule_preview()
+
+    def update_preview_pages(self, page_count):
+        """预览线程打开新文档后更新可预览的页码范围"""
+        self.preview_page_spin.setMaximum(max(1, page_count))
+
+    def schedule_preview(self, *args):
+        """设置变化时（重新）开始计时，计时结束后才请求预览；预览暂停时不请求"""
+        if self.preview_thread is not None:
+            self.preview_timer.start()
+
+    def request_preview(self):
+        """按当前设置请求预览，预览线程只处理最新的请求"""
+        input_pdf = self.input_line.text().strip()
+        if self.preview_thread is None or not os.path.isfile(input_pdf):
+            return
+        # 预览图像按标签的物理像素尺寸生成
+        ratio = self.devicePixelRatioF()
+        preview_size = (max(1, round(self.before_label.width() * ratio)),
+                        max(1, round(self.before_label.height() * ratio)))
+        self.preview_thread.request(input_pdf, self.preview_page_spin.value() - 1, preview_size,
+                                    self.collect_selected_features())
+
+    def display_preview(self, page_num, before_image, after_image):
+        """显示实时预览；忽略已停止的预览线程发出的过时结果"""
+        if self.preview_thread is not None and self.sender() is self.preview_thread:
+            self.display_before_after(before_image, after_image)
+
+    def closeEvent(self, event):
+        """关闭窗口时停止预览线程"""
+        self.pause_live_preview()
+        super().closeEvent(event)
 
     def set_ui_enabled(self, enabled: bool):
         """启用或禁用所有UI元素"""
@@ -1295,6 +1296,9 @@ class MainWindow(QMainWindow):
         self.output_browse.setEnabled(enabled)
         self.default_checkbox.setEnabled(enabled)
         self.dpi_spin.setEnabled(enabled and not self.default_checkbox.isChecked())
+        self.detect_dpi_spin.setEnabled(enabled and not self.default_checkbox.isChecked())
+        self.pages_line.setEnabled(enabled)
+        self.drop_unselected_checkbox.setEnabled(enabled)
         self.bg_combo.setEnabled(enabled and not self.default_checkbox.isChecked())
         self.bg_button.setEnabled(
             enabled and
@@ -1305,6 +1309,13 @@ class MainWindow(QMainWindow):
         self.exit_button.setEnabled(enabled)
         self.language_combo.setEnabled(enabled)
         self.theme_combo.setEnabled(enabled)
+        # 处理作业运行期间暂停实时预览
+        self.live_preview_checkbox.setEnabled(enabled)
+        self.preview_page_spin.setEnabled(enabled and self.live_preview_checkbox.isChecked())
+        if enabled:
+            self.resume_live_preview()
+        else:
+            self.pause_live_preview()
         # 控制图像处理复选框的启用状态
         self.remove_watermark_checkbox.setEnabled(enabled and not self.default_checkbox.isChecked())
         self.enhance_image_checkbox.setEnabled(enabled and not self.default_checkbox.isChecked())
@@ -1314,6 +1325,7 @@ class MainWindow(QMainWindow):
         self.watermark_removal_method_combo.setEnabled(enabled and not self.default_checkbox.isChecked() and self.remove_watermark_checkbox.isChecked())
         self.inpainting_algorithm_combo.setEnabled(enabled and not self.default_checkbox.isChecked() and self.remove_watermark_checkbox.isChecked())
         self.watermark_mask_threshold_spin.setEnabled(enabled and not self.default_checkbox.isChecked() and self.remove_watermark_checkbox.isChecked())
+        self.watermark_mask_combo.setEnabled(enabled and not self.default_checkbox.isChecked() and self.remove_watermark_checkbox.isChecked())
         # 控制图像增强参数的启用状态
         self.contrast_level_slider.setEnabled(enabled and not self.default_checkbox.isChecked() and self.enhance_image_checkbox.isChecked() and self.contrast_enhancement_checkbox.isChecked())
         self.denoising_method_combo.setEnabled(enabled and not self.default_checkbox.isChecked() and self.enhance_image_checkbox.isChecked() and self.contrast_enhancement_checkbox.isChecked())
@@ -1,94 +1,101 @@
 # src/pdf_deskew_ui/worker.py
 
 import logging
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
-import cv2
-import numpy as np
+from PyQt6.QtGui import QImage
 import fitz  # PyMuPDF
-import os
 
-from deskew_tool.deskew_pdf import deskew_pdf
+from deskew_tool.deskew_pdf import deskew_pdf, parse_page_ranges, rotate_image
+from .preview import LRUCache, StagePreview, fit_dpi, fit_image, render_page, to_qimage
 
 class WorkerThread(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
-    before_after = pyqtSignal(str, str)  # 新增信号
+    before_after = pyqtSignal(QImage, QImage)  # 处理前后的预览图像
     status = pyqtSignal(str)  # 新增信号，用于发送状态更新
     total_pages = pyqtSignal(int)  # 新增信号，用于发送总页数
     current_page = pyqtSignal(int)  # 新增信号，用于发送当前页数
 
-    def __init__(self, input_pdf, output_pdf, dpi, background_color, selected_features):
+    def __init__(self, input_pdf, output_pdf, dpi, background_color, selected_features, detect_dpi=None,
+                 pages=None, unselected_pages="copy", preview_size=(400, 400)):
         super().__init__()
         self.input_pdf = input_pdf
         self.output_pdf = output_pdf
         self.dpi = dpi
+        self.detect_dpi = detect_dpi  # 倾斜检测使用的 DPI
         self.background_color = background_color
         self.selected_features = selected_features  # 用户选择的图像处理功能
+        self.pages = pages  # 页码范围，None 表示全部页面
+        self.unselected_pages = unselected_pages  # 未选中页面复制（"copy"）或不输出（"drop"）
+        self.preview_size = preview_size  # 预览图像的显示尺寸（像素）
+        self._preview_page = None  # 用于展示的页码
+        self._preview_result = None  # 该页的处理结果
         self._is_running = True  # 标志位
 
     def run(self):
         try:
             logging.info(f"Processing started for {self.input_pdf}")
             self.status.emit("Opening input PDF file...")
-            # 在处理前保存一张原始页面的图像用于展示
-            temp_before = "temp_before.png"
-            pdf_document = fitz.open(self.input_pdf)
-            total_pages = len(pdf_document)
-            self.total_pages.emit(total_pages)  # 发送总页数
-
-            if total_pages > 0:
-                page = pdf_document.load_page(0)
-                pix = page.get_pixmap(dpi=self.dpi)
-                img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-                if img.ndim == 2:
-                    img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-                cv2.imwrite(temp_before, img)
-                self.status.emit("Saving 'Before' image...")
-
-            # 启动PDF校准
+            before = None
+            with fitz.open(self.input_pdf) as pdf_document:
+                total_pages = len(pdf_document)
+                self.total_pages.emit(total_pages)  # 发送总页数
+
+                # 展示第一个选中的页面，按显示尺寸渲染处理前的图像
+                self._preview_page = parse_page_ranges(self.pages, total_pages)[0] if self.pages else 0
+                if total_pages > 0:
+                    page = pdf_document.load_page(self._preview_page)
+                    before = render_page(page, fit_dpi(page.rect, self.preview_size))
+
+            # 启动PDF校准，展示页面的校正后图像随处理结果返回，不重新打开输出文件
             deskew_pdf(
                 self.input_pdf,
                 self.output_pdf,
                 dpi=self.dpi,
+                detect_dpi=self.detect_dpi,
                 background_color=self.background_color,
                 progress_callback=self.update_progress_with_status,
                 current_page_callback=self.update_current_page_status,
                 status_callback=self.update_status,  # 传递status_callback
                 is_running_callback=self.is_running,  # 传递is_running_callback
-                selected_features=self.selected_features
+                selected_features=self.selected_features,
+                pages=self.pages,
+                unselected_pages=self.unselected_pages,
+                with_arrays=[self._preview_page],
+                page_callback=self.keep_preview_result
             )
 
-            # 在处理后保存一张处理后的页面图像用于展示
-            temp_after = "temp_after.png"
-            self.status.emit("Opening output PDF file...")
-            pdf_document = fitz.open(self.output_pdf)
-            if len(pdf_document) > 0:
-                page = pdf_document.load_page(0)
-                pix = page.get_pixmap(dpi=self.dpi)
-                img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-                if img.ndim == 2:
-                    img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-                cv2.imwrite(temp_after, img)
-                self.status.emit("Saving 'After' image...")
+            after = self.after_preview(before)
             logging.info(f"Processing completed successfully for {self.output_pdf}")
-            self.before_after.emit(temp_before, temp_after)  # 发送信号
+            if before is not None and after is not None:
+                self.before_after.emit(to_qimage(before), to_qimage(after))  # 发送信号
             self.finished.emit(self.output_pdf)
         except Exception as e:
             logging.error(f"Processing error: {e}")
             self.error.emit(str(e))
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_before):
-                try:
-                    os.remove(temp_before)
-                except Exception as e:
-                    logging.warning(f"Unable to remove temporary file {temp_before}: {e}")
-            if os.path.exists(temp_after):
-                try:
-                    os.remove(temp_after)
-                except Exception as e:
-                    logging.warning(f"Unable to remove temporary file {temp_after}: {e}")
+
+    def keep_preview_result(self, result):
+        """保留展示页面的处理结果"""
+        if result.page_num == self._preview_page:
+            self._preview_result = result
+
+    def after_preview(self, before):
+        """
+        由展示页面的处理结果生成处理后的预览图像。
+        :param before: 按显示尺寸渲染的处理前图像
+        :return: 处理后的预览图像；处理被取消时为 None
+        """
+        result = self._preview_result
+        if result is None or before is None:
+            return None
+        if result.array is not None:
+            return fit_image(result.array, self.preview_size)
+        # 原样复制或以旋转变换输出的页面没有校正后的图像，直接旋转处理前的预览图像
+        if result.angle is None or result.kind == "copy":
+            return before
+        return fit_image(rotate_image(before, result.angle, background=self.background_color), self.preview_size)
 
     def update_progress_with_status(self, value):
         """更新进度并发送状态信息"""
@@ -108,6 +115,10 @@ class WorkerThread(QThread):
         else:
             self.status.emit("Processing completed.")
 
+    def update_status(self, message):
+        """转发处理过程中的状态信息"""
+        self.status.emit(message)
+
     def update_current_page_status(self, current_page):
         """发送当前处理的页数"""
         self.current_page.emit(current_page)
@@ -119,3 +130,87 @@ class WorkerThread(QThread):
     def stop(self):
         """停止线程"""
         self._is_running = False
+
+
+class PreviewThread(QThread):
+    """
+    实时预览线程：以显示分辨率渲染选定的页面，并在设置变化时只重新执行受影响的图像处理功能。
+    渲染结果按 (页码, DPI) 保存在容量有限的 LRU 缓存中。只处理最新的预览请求，
+    处理过程中收到新的请求时放弃当前的结果。
+    PyMuPDF 不支持多个线程同时使用，本线程运行期间同一进程中不应有其他线程使用 fitz。
+    """
+    preview_ready = pyqtSignal(int, QImage, QImage)  # 页码（从 0 开始）、处理前后的预览图像
+    page_count = pyqtSignal(int)  # 打开新文档后发送其页数
+    error = pyqtSignal(str)
+
+    def __init__(self, max_pages=8):
+        super().__init__()
+        self._condition = threading.Condition()
+        self._request = None  # 尚未处理的最新请求
+        self._stopped = False
+        self._cache = LRUCache(max_pages)
+        self._input_pdf = None
+        self._document = None
+
+    def request(self, input_pdf, page_num, size, selected_features):
+        """
+        请求预览，替换尚未开始处理的旧请求。
+        :param page_num: 页码（从 0 开始），超出文档页数时预览最后一页
+        :param size: 预览图像的显示尺寸 (宽, 高)
+        """
+        with self._condition:
+            self._request = (input_pdf, page_num, size, dict(selected_features))
+            self._condition.notify()
+
+    def stop(self):
+        """停止线程，正在执行的处理功能完成后退出"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def is_current(self):
+        """当前处理的请求是否仍是最新的"""
+        return self._request is None and not self._stopped
+
+    def run(self):
+        try:
+            while True:
+                with self._condition:
+                    while self._request is None and not self._stopped:
+                        self._condition.wait()
+                    if self._stopped:
+                        return
+                    request, self._request = self._request, None
+                try:
+                    self.preview(*request)
+                except Exception as e:
+                    logging.warning(f"Preview error: {e}")
+                    self.error.emit(str(e))
+        finally:
+            if self._document is not None:
+                self._document.close()
+
+    def preview(self, input_pdf, page_num, size, selected_features):
+        """生成一次预览并发送 preview_ready 信号"""
+        if input_pdf != self._input_pdf:
+            # 更换文档后，缓存的页面图像全部作废
+            if self._document is not None:
+                self._document.close()
+            self._document = None
+            self._input_pdf = None
+            self._cache.clear()
+            self._document = fitz.open(input_pdf)
+            self._input_pdf = input_pdf
+            self.page_count.emit(len(self._document))
+        page_num = max(0, min(page_num, len(self._document) - 1))
+        page = self._document.load_page(page_num)
+        dpi = fit_dpi(page.rect, size)
+        entry = self._cache.get((page_num, dpi))
+        if entry is None:
+            entry = StagePreview(render_page(page, dpi))
+            self._cache.put((page_num, dpi), entry)
+
+        after = entry.run(selected_features, is_current=self.is_current)
+        if after is None or not self.is_current():
+            return
+        self.preview_ready.emit(page_num, to_qimage(entry.image), to_qimage(fit_image(after, size)))
@@ -0,0 +1,146 @@
+# tests/test_batch.py
+
+import unittest
+import csv
+import json
+import os
+import tempfile
+
+import fitz  # PyMuPDF
+
+from deskew_tool.batch import BatchJob, collect_inputs, load_manifest, run_batch, schedule_jobs, write_summary
+from tests.test_deskew import make_skewed_pdf
+
+
+class TestBatchInputs(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        os.makedirs(os.path.join(self.root, "scans", "nested"))
+        sizes = {"scans/a.pdf": 100, "scans/b.PDF": 200, "scans/a_deskewed.pdf": 100,
+                 "scans/notes.txt": 100, "scans/nested/c.pdf": 300}
+        for name, size in sizes.items():
+            with open(os.path.join(self.root, name), "wb") as f:
+                f.write(b"x" * size)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_directories_globs_and_files(self):
+        inputs = collect_inputs([
+            self.path("scans"),
+            os.path.join(self.root, "**", "c.pdf"),
+            self.path("scans/a.pdf"),
+            self.path("scans/a_deskewed.pdf"),
+        ])
+        # 目录不递归、跳过以前的输出；显式给出的文件总是保留，重复的路径只保留一次
+        self.assertEqual(inputs, [
+            self.path("scans/a.pdf"),
+            self.path("scans/b.PDF"),
+            os.path.join(self.root, "scans", "nested", "c.pdf"),
+            self.path("scans/a_deskewed.pdf"),
+        ])
+
+    def test_json_manifest(self):
+        manifest = self.path("jobs.json")
+        with open(manifest, "w", encoding="utf-8") as f:
+            json.dump([
+                {"input": "scans/a.pdf", "dpi": 150, "enhance": True, "bg_color": "black"},
+                {"input": "scans/b.PDF", "output": "out/b.pdf", "native_images": "false", "watermark_mask": "Document"},
+            ], f)
+
+        jobs = load_manifest(manifest, output_dir=self.path("results"))
+        self.assertEqual(jobs[0].input_path, self.path("scans/a.pdf"))
+        self.assertEqual(jobs[0].output_path, os.path.join(self.path("results"), "a_deskewed.pdf"))
+        self.assertEqual(jobs[0].options, {"dpi": 150, "background_color": (0, 0, 0),
+                                           "features": {"enhance_image": True}})
+        self.assertEqual(jobs[1].output_path, self.path("out/b.pdf"))
+        self.assertEqual(jobs[1].options, {"native_images": False, "features": {"watermark_mask": "document"}})
+
+    def test_csv_manifest(self):
+        manifest = self.path("jobs.csv")
+        with open(manifest, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["input", "output", "detect_dpi", "skew_detector", "grayscale"])
+            writer.writerow(["scans/a.pdf", "", "75", "projection", "yes"])
+            writer.writerow(["scans/b.PDF", "", "", "", ""])
+
+        jobs = load_manifest(manifest)
+        self.assertEqual(jobs[0].options, {"detect_dpi": 75, "skew_detector": "projection",
+                                           "features": {"convert_grayscale": True}})
+        self.assertEqual(jobs[1].options, {})
+        self.assertEqual(jobs[1].output_path, self.path("scans/b_deskewed.pdf"))
+
+    def test_manifest_rejects_unknown_fields(self):
+        manifest = self.path("jobs.json")
+        with open(manifest, "w", encoding="utf-8") as f:
+            json.dump([{"input": "scans/a.pdf", "dpii": 150}], f)
+        with self.assertRaises(ValueError):
+            load_manifest(manifest)
+        with open(manifest, "w", encoding="utf-8") as f:
+            json.dump([{"input": "scans/a.pdf", "watermark_mask": "global"}], f)
+        with self.assertRaises(ValueError):
+            load_manifest(manifest)
+
+    def test_schedule_by_size(self):
+        jobs = [BatchJob(self.path(name), "") for name in ("scans/a.pdf", "scans/nested/c.pdf", "scans/b.PDF")]
+        largest = schedule_jobs(jobs, "largest-first")
+        self.assertEqual([job.input_path for job in largest],
+                         [self.path("scans/nested/c.pdf"), self.path("scans/b.PDF"), self.path("scans/a.pdf")])
+        self.assertEqual(schedule_jobs(jobs, "shortest-first"), largest[::-1])
+        self.assertEqual(schedule_jobs(jobs, "input"), jobs)
+
+
+class TestRunBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        make_skewed_pdf(os.path.join(self.root, "two.pdf"), [3.0, -2.0])
+        make_skewed_pdf(os.path.join(self.root, "one.pdf"), [1.0])
+        with open(os.path.join(self.root, "broken.pdf"), "w") as f:
+            f.write("not a pdf")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def jobs(self):
+        return [
+            BatchJob(os.path.join(self.root, "two.pdf"), os.path.join(self.root, "out", "two.pdf"),
+                     {"native_images": False, "dpi": 50}),
+            BatchJob(os.path.join(self.root, "broken.pdf"), os.path.join(self.root, "out", "broken.pdf")),
+            BatchJob(os.path.join(self.root, "one.pdf"), os.path.join(self.root, "out", "one.pdf")),
+        ]
+
+    def check_results(self, results):
+        # 结果按任务顺序返回，失败的文件不影响其他文件
+        self.assertEqual([result.status for result in results], ["ok", "failed", "ok"])
+        self.assertEqual([result.pages for result in results], [2, 0, 1])
+        self.assertEqual([round(angle) for angle in results[0].angles], [3, -2])
+        self.assertIsNotNone(results[1].error)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "out", "broken.pdf")))
+        # 任务自己的参数覆盖公共参数
+        with fitz.open(os.path.join(self.root, "out", "two.pdf")) as document:
+            xref = document[0].get_images()[0][0]
+            self.assertLess(int(document.xref_get_key(xref, "Width")[1]), 600)
+
+    def test_serial(self):
+        completed = []
+        results = run_batch(self.jobs(), {"dpi": 100}, file_workers=1, result_callback=completed.append)
+        self.check_results(results)
+        self.assertEqual(len(completed), 3)
+
+        summary = os.path.join(self.root, "summary.json")
+        write_summary(results, summary)
+        with open(summary, encoding="utf-8") as f:
+            self.assertEqual([entry["status"] for entry in json.load(f)], ["ok", "failed", "ok"])
+
+    def test_process_pool(self):
+        results = run_batch(self.jobs(), {"dpi": 100}, file_workers=2, order="shortest-first")
+        self.check_results(results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,93 @@
 # tests/test_deskew.py
 
 import unittest
+import json
+import multiprocessing
 import os
-from deskew_tool.deskew_pdf import deskew_pdf
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+from benchmarks.synthetic import make_synthetic_pdf
+from deskew_tool.angle_cache import AngleCache
+from deskew_tool.batch import BatchJob, run_batch, write_summary
+from deskew_tool.buffers import NULL_POOL, BufferPool, pixmap_array
+from deskew_tool.encoding import TiledImage, encode_page
+from deskew_tool.point_ops import quantize
+from deskew_tool.profiling import ProfileRecorder
+from deskew_tool.deskew_pdf import (
+    convert_grayscale, deskew_pdf, detect_skew, determine_skew, enhance_image, iter_deskewed_pages, parse_page_ranges,
+    remove_watermark, rotate_image,
+)
+from deskew_tool.skew import projection_skew
+from deskew_tool.watermark import WatermarkModel
+from deskew_tool.writer import PdfPageWriter
+
+# 包中同名的 deskew_pdf 函数遮蔽了模块本身
+deskew_module = sys.modules["deskew_tool.deskew_pdf"]
+
+
+def make_skewed_image(angle, index=0, width=850, height=1100):
+    """生成一张倾斜文本扫描图（100 DPI），检测结果应为 angle。"""
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    for row, y in enumerate(range(80, height - 80, 36)):
+        text = f"Line {row:02d} of page {index + 1}: the quick brown fox jumps"
+        cv2.putText(img, text, (60, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    img = rotate_image(img, -angle)
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def make_skewed_pdf(path, angles, width=850, height=1100):
+    """生成每页为一张倾斜文本扫描图的测试 PDF（页面尺寸按 100 DPI 计算）。"""
+    document = fitz.open()
+    for index, angle in enumerate(angles):
+        img = make_skewed_image(angle, index, width, height)
+        page = document.new_page(width=width * 72 / 100, height=height * 72 / 100)
+        page.insert_image(page.rect, stream=cv2.imencode(".png", img)[1].tobytes())
+    document.save(path)
+    document.close()
+
+
+def make_shared_resource_pdf(path, pages, angle=0.0):
+    """
+    生成每页都引用同一个嵌入字体和同一张嵌入图像的测试 PDF，图像为难以压缩的噪声图（约 480 KB）。
+    文本行按 angle 倾斜，检测结果应为 angle。
+    """
+    noise = np.random.default_rng(0).integers(0, 256, size=(400, 400, 3), dtype=np.uint8)
+    stream = cv2.imencode(".png", noise)[1].tobytes()
+    font = fitz.Font("helv").buffer
+    image_rect = fitz.Rect(456, 642, 556, 742)
+    document = fitz.open()
+    xref = 0
+    for index in range(pages):
+        page = document.new_page(width=612, height=792)
+        page.insert_font(fontname="shared", fontbuffer=font)
+        for y in range(72, 620, 24):
+            page.insert_text((72, y), f"Page {index + 1}: the quick brown fox jumps over the lazy dog",
+                             fontname="shared", fontsize=14, morph=(fitz.Point(306, 396), fitz.Matrix(-angle)))
+        if xref:
+            page.insert_image(image_rect, xref=xref)
+        else:
+            xref = page.insert_image(image_rect, stream=stream)
+    document.save(path, garbage=3, deflate=True)
+    document.close()
+
+
+def page_skew(pdf_path, page_num, dpi=100):
+    """渲染输出 PDF 的指定页并重新检测倾斜角度。"""
+    with fitz.open(pdf_path) as document:
+        pix = document[page_num].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        return determine_skew(gray)
+
 
 class TestDeskewPDF(unittest.TestCase):
     def test_deskew_pdf_valid(self):
@@ -11,7 +96,9 @@ class TestDeskewPDF(unittest.TestCase):
         dpi = 300
         background_color = (255, 255, 255)
 
-        # 确保输入文件存在
+        # 仓库中不包含样例文件时，生成一个合成扫描 PDF 代替
+        if not os.path.isfile(input_pdf):
+            make_synthetic_pdf(input_pdf, pages=2, page_size="a5", dpi=150, noise=4.0)
         self.assertTrue(os.path.isfile(input_pdf), f"{input_pdf} 不存在。")
 
         try:
@@ -30,5 +117,1153 @@ class TestDeskewPDF(unittest.TestCase):
         with self.assertRaises(IOError):
             deskew_pdf(input_pdf, output_pdf)
 
+
+class TestProjectionSkew(unittest.TestCase):
+    def test_fractional_angles(self):
+        straight = make_skewed_image(0.0)
+        height, width = straight.shape[:2]
+        for angle in [-7.3, -2.5, -0.4, 0.0, 0.7, 1.5, 12.2]:
+            with self.subTest(angle=angle):
+                # 原地旋转而不扩大画布：make_skewed_image 缩放回原尺寸时会改变宽高比，使实际角度偏离 angle
+                matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+                image = cv2.warpAffine(straight, matrix, (width, height), borderValue=(255, 255, 255))
+                detected = projection_skew(image)
+                self.assertAlmostEqual(detected, angle, delta=0.15)
+
+    def test_blank_page(self):
+        self.assertIsNone(projection_skew(np.full((200, 100), 255, dtype=np.uint8)))
+
+    def test_deskew_pdf_with_projection_detector(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_pdf = os.path.join(tmpdir, "input.pdf")
+            output_pdf = os.path.join(tmpdir, "output.pdf")
+            make_skewed_pdf(input_pdf, [2.5, -1.5])
+            deskew_pdf(input_pdf, output_pdf, dpi=100, skew_detector="projection")
+            for page_num in range(2):
+                with fitz.open(output_pdf) as document:
+                    pix = document[page_num].get_pixmap(dpi=100, colorspace=fitz.csGRAY)
+                gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+                self.assertAlmostEqual(projection_skew(gray), 0.0, delta=0.15)
+
+            with self.assertRaises(ValueError):
+                deskew_pdf(input_pdf, output_pdf, skew_detector="hough")
+
+
+class TestParallelDeskew(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "skewed.pdf")
+        self.angles = [3.0, -2.0, 1.0, -4.0]
+        make_skewed_pdf(self.input_pdf, self.angles)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_workers_match_serial(self):
+        serial_pdf = os.path.join(self.tmpdir.name, "serial.pdf")
+        parallel_pdf = os.path.join(self.tmpdir.name, "parallel.pdf")
+        serial_pages = []
+        parallel_pages = []
+
+        deskew_pdf(self.input_pdf, serial_pdf, dpi=100, current_page_callback=serial_pages.append)
+        deskew_pdf(self.input_pdf, parallel_pdf, dpi=100, current_page_callback=parallel_pages.append, workers=2)
+
+        # 结果必须按页码顺序写回
+        self.assertEqual(parallel_pages, [1, 2, 3, 4])
+        self.assertEqual(serial_pages, parallel_pages)
+        with fitz.open(serial_pdf) as serial, fitz.open(parallel_pdf) as parallel:
+            self.assertEqual(len(parallel), len(self.angles))
+            for serial_page, parallel_page in zip(serial, parallel):
+                self.assertEqual(serial_page.rect, parallel_page.rect)
+        for page_num in range(len(self.angles)):
+            self.assertAlmostEqual(page_skew(parallel_pdf, page_num), 0.0, delta=0.5)
+
+    def test_workers_spill_to_disk(self):
+        output_pdf = os.path.join(self.tmpdir.name, "spilled.pdf")
+        scratch = os.path.join(self.tmpdir.name, "scratch")
+        os.makedirs(scratch)
+        original_tempdir = tempfile.tempdir
+        tempfile.tempdir = scratch
+        try:
+            deskew_pdf(self.input_pdf, output_pdf, dpi=100, workers=2, spill_to_disk=True)
+        finally:
+            tempfile.tempdir = original_tempdir
+
+        with fitz.open(output_pdf) as document:
+            self.assertEqual(len(document), len(self.angles))
+        # 溢出目录在处理结束后必须被清理
+        self.assertEqual(os.listdir(scratch), [])
+
+    def test_workers_cancellation(self):
+        output_pdf = os.path.join(self.tmpdir.name, "cancelled.pdf")
+        processed = []
+
+        def is_running():
+            return len(processed) < 2
+
+        deskew_pdf(self.input_pdf, output_pdf, dpi=100, current_page_callback=processed.append,
+                   is_running_callback=is_running, workers=2)
+
+        self.assertEqual(processed, [1, 2])
+        self.assertFalse(os.path.isfile(output_pdf))
+
+
+class TestDetectDpi(unittest.TestCase):
+    def test_downscaled_detection_matches_full_resolution(self):
+        img = np.full((1100, 850, 3), 255, dtype=np.uint8)
+        for y in range(80, 1020, 36):
+            cv2.putText(img, "the quick brown fox jumps over the lazy dog", (60, y),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        skewed = rotate_image(img, -3.0)
+        self.assertAlmostEqual(detect_skew(skewed, 100), 3.0, delta=0.5)
+        self.assertAlmostEqual(detect_skew(skewed, 100, detect_dpi=50), 3.0, delta=0.5)
+
+    def test_angle_applied_at_full_resolution(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_pdf = os.path.join(tmpdir, "skewed.pdf")
+            output_pdf = os.path.join(tmpdir, "output.pdf")
+            reference_pdf = os.path.join(tmpdir, "reference.pdf")
+            make_skewed_pdf(input_pdf, [2.0, -3.0])
+
+            deskew_pdf(input_pdf, output_pdf, dpi=150, detect_dpi=75)
+            deskew_pdf(input_pdf, reference_pdf, dpi=150)
+
+            with fitz.open(output_pdf) as output, fitz.open(reference_pdf) as reference:
+                for output_page, reference_page in zip(output, reference):
+                    # 图像保持渲染 DPI 的分辨率，页面尺寸与全分辨率检测一致
+                    self.assertEqual(output_page.get_images()[0][2:4], reference_page.get_images()[0][2:4])
+                    self.assertEqual(output_page.rect, reference_page.rect)
+            for page_num in range(2):
+                self.assertAlmostEqual(page_skew(output_pdf, page_num), 0.0, delta=0.5)
+
+
+class TestTransformMode(unittest.TestCase):
+    def test_transform_keeps_original_content(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_pdf = os.path.join(tmpdir, "skewed.pdf")
+            output_pdf = os.path.join(tmpdir, "output.pdf")
+            make_skewed_pdf(input_pdf, [3.0, -2.0])
+
+            deskew_pdf(input_pdf, output_pdf, dpi=300, detect_dpi=100, output_mode="transform")
+
+            with fitz.open(output_pdf) as document:
+                self.assertEqual(len(document), 2)
+                for page in document:
+                    # 原始嵌入图像按原分辨率保留，没有被重新光栅化
+                    self.assertEqual(page.get_images(full=True)[0][2:4], (850, 1100))
+            # 输出大小与输入接近
+            self.assertLess(os.path.getsize(output_pdf), os.path.getsize(input_pdf) * 1.1)
+            for page_num in range(2):
+                self.assertAlmostEqual(page_skew(output_pdf, page_num), 0.0, delta=0.5)
+
+    def test_transform_shares_resources(self):
+        # 各页共用的字体和图像在输出中只保留一份
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_pdf = os.path.join(tmpdir, "shared.pdf")
+            output_pdf = os.path.join(tmpdir, "output.pdf")
+            make_shared_resource_pdf(input_pdf, 40, angle=2.0)
+
+            report = deskew_pdf(input_pdf, output_pdf, dpi=72, output_mode="transform")
+
+            self.assertEqual([round(angle) for angle in report.angles], [2] * 40)
+            self.assertLess(os.path.getsize(output_pdf), os.path.getsize(input_pdf) * 1.1)
+
+    def test_invalid_output_mode(self):
+        with self.assertRaises(ValueError):
+            deskew_pdf("tests/non_existent.pdf", "tests/output.pdf", output_mode="vector")
+
+
+class TestPassThrough(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "mixed.pdf")
+        make_skewed_pdf(self.input_pdf, [0.0, 3.0, 1.0])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def image_filters(self, pdf_path):
+        with fitz.open(pdf_path) as document:
+            return [document.xref_get_key(page.get_images()[0][0], "Filter")[1] for page in document]
+
+    def test_straight_pages_copied_unchanged(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        deskew_pdf(self.input_pdf, output_pdf, dpi=150, detect_dpi=75, angle_tolerance=1.5)
+
+        # 倾斜不超过容差的页面保留源文件中的原始图像（保存时无损压缩），其余页面重新编码为 JPEG
+        self.assertEqual(self.image_filters(output_pdf), ["/FlateDecode", "/DCTDecode", "/FlateDecode"])
+        with fitz.open(self.input_pdf) as source, fitz.open(output_pdf) as output:
+            self.assertEqual(output[0].rect, source[0].rect)
+            self.assertEqual(output[2].read_contents(), source[2].read_contents())
+            self.assertEqual(output.xref_stream(output[0].get_images()[0][0]),
+                             source.xref_stream(source[0].get_images()[0][0]))
+
+    def test_image_stages_disable_pass_through(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        deskew_pdf(self.input_pdf, output_pdf, dpi=100, angle_tolerance=1.5,
+                   selected_features={"enhance_image": True})
+
+        self.assertEqual(self.image_filters(output_pdf), ["/DCTDecode"] * 3)
+
+
+class TestNativeImages(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "scan.pdf")
+        # 200 DPI 扫描件：第一页只有一张 JPEG，第二页在图像上叠加了文本
+        document = fitz.open()
+        for index in range(2):
+            img = np.full((1100, 850, 3), 255, dtype=np.uint8)
+            for y in range(80, 1020, 36):
+                cv2.putText(img, "the quick brown fox jumps over the lazy dog", (60, y),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+            img = cv2.resize(rotate_image(img, -3.0), (1700, 2200), interpolation=cv2.INTER_LINEAR)
+            page = document.new_page(width=1700 * 72 / 200, height=2200 * 72 / 200)
+            page.insert_image(page.rect, stream=cv2.imencode(".jpg", img)[1].tobytes())
+            if index == 1:
+                page.insert_text((20, 20), "OCR text layer")
+        document.save(self.input_pdf)
+        document.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def output_image_sizes(self, pdf_path):
+        with fitz.open(pdf_path) as document:
+            sizes = []
+            for page in document:
+                xref = page.get_images()[0][0]
+                sizes.append((int(document.xref_get_key(xref, "Width")[1]),
+                              int(document.xref_get_key(xref, "Height")[1])))
+            return sizes
+
+    def test_single_image_page_decoded_at_native_resolution(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        deskew_pdf(self.input_pdf, output_pdf, dpi=100, detect_dpi=100)
+
+        (native_width, _), (rendered_width, _) = self.output_image_sizes(output_pdf)
+        # 原生解码的页面保持 200 DPI，混合内容页面按 100 DPI 渲染
+        self.assertGreater(native_width, 1700)
+        self.assertLess(rendered_width, 1000)
+        with fitz.open(self.input_pdf) as source, fitz.open(output_pdf) as output:
+            for page_num in range(2):
+                self.assertAlmostEqual(output[page_num].rect.width, output[1].rect.width, delta=1)
+                self.assertGreater(output[page_num].rect.width, source[page_num].rect.width)
+        self.assertAlmostEqual(page_skew(output_pdf, 0), 0.0, delta=0.5)
+
+    def test_native_page_detected_at_output_dpi(self):
+        # 未指定 detect_dpi 时按 dpi 检测，原生解码的 200 DPI 图像需先降采样到 100 DPI
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        with mock.patch("deskew_tool.deskew_pdf.determine_skew", wraps=deskew_module.determine_skew) as determine:
+            deskew_pdf(self.input_pdf, output_pdf, dpi=100)
+        self.assertEqual([call.args[0].shape for call in determine.call_args_list], [(1100, 850)] * 2)
+
+    def test_mupdf_decoded_image_not_modified_in_place(self):
+        # MuPDF 由 xref 解码的 Pixmap 与其缓存共用像素内存，原地二值化不得改变再次解码的结果
+        input_pdf = os.path.join(self.tmpdir.name, "gray.pdf")
+        gray = cv2.GaussianBlur(cv2.cvtColor(make_skewed_image(2.0), cv2.COLOR_RGB2GRAY), (5, 5), 0)
+        document = fitz.open()
+        page = document.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=cv2.imencode(".jpg", gray)[1].tobytes())
+        document.save(input_pdf)
+        document.close()
+        settings = deskew_module._PageSettings(100, (255, 255, 255), {}, color_mode="bilevel")
+
+        # OpenCV 无法解码时由 MuPDF 解码
+        with fitz.open(input_pdf) as document, mock.patch.object(cv2, "imdecode", return_value=None):
+            first, _ = deskew_module._load_page_image(document, document[0], settings)
+            second, _ = deskew_module._load_page_image(document, document[0], settings)
+            decoded = pixmap_array(fitz.Pixmap(document, document[0].get_images()[0][0]))
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(first.shape, (1100, 850))
+        self.assertGreater(len(np.unique(decoded)), 2)
+
+    def test_native_images_disabled(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        deskew_pdf(self.input_pdf, output_pdf, dpi=100, detect_dpi=100, native_images=False)
+
+        self.assertTrue(all(width < 1000 for width, _ in self.output_image_sizes(output_pdf)))
+
+
+class TestAngleCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        self.cache_path = os.path.join(self.tmpdir.name, "angles.sqlite")
+        make_skewed_pdf(self.input_pdf, [3.0, -2.0, 0.0])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_warm_cache_skips_detection(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        with AngleCache(self.cache_path) as cache:
+            deskew_pdf(self.input_pdf, output_pdf, dpi=100, angle_cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+        # 更改图像增强设置不影响检测输入，缓存仍然有效
+        with AngleCache(self.cache_path) as cache, \
+                mock.patch("deskew_tool.deskew_pdf.detect_skew") as detect:
+            deskew_pdf(self.input_pdf, output_pdf, dpi=100, selected_features={"enhance_image": True},
+                       angle_cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (3, 0))
+            detect.assert_not_called()
+        self.assertAlmostEqual(page_skew(output_pdf, 0), 0.0, delta=0.5)
+
+    def test_detection_params_are_part_of_key(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        with AngleCache(self.cache_path) as cache:
+            deskew_pdf(self.input_pdf, output_pdf, dpi=100, angle_cache=cache)
+            deskew_pdf(self.input_pdf, output_pdf, dpi=100, detect_dpi=50, angle_cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 6))
+
+    def test_eviction_keeps_most_recent_entries(self):
+        with AngleCache(self.cache_path, max_entries=2) as cache:
+            for index, key in enumerate(["a", "b", "c"]):
+                cache.put(key, float(index))
+            cache.get("a")
+            cache.put("d", None)
+            cache.flush()
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.get("d"), (True, None))
+            self.assertEqual(cache.get("a"), (True, 0.0))
+            self.assertEqual(cache.get("b"), (False, None))
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        self.output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        make_skewed_pdf(self.input_pdf, [3.0, -2.0, 0.0])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_records_every_stage(self):
+        with ProfileRecorder() as recorder:
+            deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, recorder=recorder,
+                       selected_features={"enhance_image": True, "convert_grayscale": True})
+
+        summary = recorder.summary()
+        for stage in ("render", "enhance_image", "convert_grayscale", "detect", "rotate", "encode", "write"):
+            self.assertIn(stage, summary)
+        self.assertEqual(summary["render"]["count"], 3)
+        self.assertEqual(summary["write"]["count"], 3)
+        self.assertGreater(summary["render"]["peak_mb"]["max"], 0)
+        wall = summary["detect"]["wall_ms"]
+        self.assertLessEqual(wall["p50"], wall["p95"])
+        self.assertLessEqual(wall["p95"], wall["max"])
+
+        profile_json = os.path.join(self.tmpdir.name, "profile.json")
+        recorder.save(profile_json)
+        with open(profile_json, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(len(data["records"]), len(recorder.records))
+        self.assertIn("render", recorder.format_summary())
+
+    def test_worker_records_are_collected(self):
+        with ProfileRecorder() as recorder:
+            deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, detect_dpi=50, workers=2, recorder=recorder)
+
+        pages = {record.page for record in recorder.records if record.stage == "detect"}
+        self.assertEqual(pages, {0, 1, 2})
+
+    def test_close_stops_own_tracing(self):
+        self.assertFalse(tracemalloc.is_tracing())
+        with ProfileRecorder() as recorder:
+            self.assertTrue(tracemalloc.is_tracing())
+            with recorder.stage(0, "render"):
+                pass
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(len(recorder.records), 1)
+
+        tracemalloc.start()
+        try:
+            ProfileRecorder().close()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+
+class TestPageSelection(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        self.output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        self.angles = [3.0, -2.0, 1.0, 0.0, -4.0]
+        make_skewed_pdf(self.input_pdf, self.angles)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_parse_page_ranges(self):
+        self.assertEqual(parse_page_ranges("1-3,7,9-", 10), [0, 1, 2, 6, 8, 9])
+        self.assertEqual(parse_page_ranges(" -2 , 2 ,, 12-", 10), [0, 1])
+        self.assertEqual(parse_page_ranges("8-20", 10), [7, 8, 9])
+        for spec in ("0", "5-3", "a-b", "1-2-3"):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                parse_page_ranges(spec, 10)
+
+    def test_copy_unselected(self):
+        with mock.patch("deskew_tool.deskew_pdf._process_page", wraps=deskew_module._process_page) as process:
+            report = deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, pages="2,4-")
+        self.assertEqual(sorted(call.args[1] for call in process.call_args_list), [1, 3, 4])
+        self.assertEqual(report.pages, 5)
+        self.assertEqual(report.angles[0], None)
+        self.assertEqual(report.angles[2], None)
+        self.assertEqual([round(report.angles[i]) for i in (1, 3, 4)], [-2, 0, -4])
+        # 未选中的页面原样复制，仍然倾斜
+        self.assertAlmostEqual(page_skew(self.output_pdf, 0), 3.0, delta=0.5)
+        self.assertAlmostEqual(page_skew(self.output_pdf, 1), 0.0, delta=0.5)
+
+    def test_copied_pages_share_resources(self):
+        # 原样复制的页面共用源文档中的同一个字体和图像，输出中不应出现多份副本
+        input_pdf = os.path.join(self.tmpdir.name, "shared.pdf")
+        make_shared_resource_pdf(input_pdf, 40)
+        deskew_pdf(input_pdf, self.output_pdf, dpi=72, pages="1")
+        with fitz.open(self.output_pdf) as document:
+            self.assertEqual(len(document), 40)
+        self.assertLess(os.path.getsize(self.output_pdf), os.path.getsize(input_pdf) * 1.5)
+
+    def test_drop_unselected_with_workers(self):
+        report = deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, pages=[0, 4], unselected_pages="drop",
+                            workers=2)
+        self.assertEqual([round(angle) for angle in report.angles], [3, -4])
+        with fitz.open(self.output_pdf) as document:
+            self.assertEqual(len(document), 2)
+        self.assertAlmostEqual(page_skew(self.output_pdf, 1), 0.0, delta=0.5)
+
+    def test_empty_selection(self):
+        with self.assertRaises(ValueError):
+            deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, pages="9-")
+        self.assertFalse(os.path.exists(self.output_pdf))
+
+
+class TestResumableJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        self.output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        self.journal_dir = os.path.join(self.tmpdir.name, "journal")
+        self.angles = [3.0, -2.0, 1.0, 0.0, -4.0]
+        make_skewed_pdf(self.input_pdf, self.angles)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def interrupt_after(self, pages, **kwargs):
+        """处理到指定页数后取消，模拟中途被终止的运行。"""
+        done = []
+        deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, journal_dir=self.journal_dir,
+                   current_page_callback=done.append, is_running_callback=lambda: len(done) < pages, **kwargs)
+        self.assertFalse(os.path.exists(self.output_pdf))
+
+    def test_resume_skips_finished_pages(self):
+        self.interrupt_after(3)
+
+        with mock.patch("deskew_tool.deskew_pdf._process_page", wraps=deskew_module._process_page) as process:
+            report = deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, journal_dir=self.journal_dir, resume=True)
+        self.assertEqual(sorted(call.args[1] for call in process.call_args_list), [3, 4])
+        self.assertEqual([round(angle) for angle in report.angles], self.angles)
+        # 成功后删除日志
+        self.assertFalse(os.path.exists(self.journal_dir))
+        with fitz.open(self.output_pdf) as document:
+            self.assertEqual(len(document), 5)
+        for page_num in range(5):
+            self.assertAlmostEqual(page_skew(self.output_pdf, page_num), 0.0, delta=0.5)
+
+    def test_resume_with_workers(self):
+        self.interrupt_after(2)
+        report = deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, journal_dir=self.journal_dir,
+                            resume=True, workers=2)
+        self.assertEqual([round(angle) for angle in report.angles], self.angles)
+
+    def test_changed_settings_start_over(self):
+        self.interrupt_after(3)
+        with mock.patch("deskew_tool.deskew_pdf._process_page", wraps=deskew_module._process_page) as process:
+            deskew_pdf(self.input_pdf, self.output_pdf, dpi=80, journal_dir=self.journal_dir, resume=True)
+        self.assertEqual(process.call_count, 5)
+
+    def test_refuses_foreign_directory(self):
+        os.makedirs(self.journal_dir)
+        with open(os.path.join(self.journal_dir, "keep.txt"), "w") as f:
+            f.write("user data")
+        with self.assertRaises(ValueError):
+            deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, journal_dir=self.journal_dir)
+        self.assertTrue(os.path.isfile(os.path.join(self.journal_dir, "keep.txt")))
+
+
+class TestOutputEncoding(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def image_filters(self, pdf_path):
+        with fitz.open(pdf_path) as document:
+            return [document.xref_get_key(page.get_images()[0][0], "Filter")[1] for page in document]
+
+    def test_round_trip(self):
+        # 宽度不是 8 的倍数，检查 1 位图像的行填充
+        image = np.full((120, 201), 255, dtype=np.uint8)
+        image[30:60, 20:180] = 0
+        image[90:95, :] = 0
+        for encoding, expected_filter in (("fax", "CCITTFaxDecode"), ("flate", "FlateDecode"),
+                                          ("auto", "CCITTFaxDecode")):
+            with self.subTest(encoding=encoding):
+                encoded = encode_page(image, encoding)
+                self.assertEqual(encoded.filter, expected_filter)
+                output_pdf = os.path.join(self.tmpdir.name, f"{encoding}.pdf")
+                with PdfPageWriter(output_pdf) as writer:
+                    writer.add_image_page(encoded, 72)
+                with fitz.open(output_pdf) as document:
+                    pix = document[0].get_pixmap(dpi=72, colorspace=fitz.csGRAY)
+                    rendered = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+                np.testing.assert_array_equal(rendered, image)
+
+        # 含灰度的图像在 auto 模式下使用 JPEG
+        image[0:10, 0:10] = 128
+        self.assertEqual(encode_page(image, "auto").filter, "DCTDecode")
+        with self.assertRaises(ValueError):
+            encode_page(image, "jbig2")
+
+    def test_deskew_with_fax_encoding(self):
+        input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        jpeg_pdf = os.path.join(self.tmpdir.name, "jpeg.pdf")
+        fax_pdf = os.path.join(self.tmpdir.name, "fax.pdf")
+        make_skewed_pdf(input_pdf, [3.0, -2.0, 1.0])
+
+        deskew_pdf(input_pdf, jpeg_pdf, dpi=150, output_encoding="jpeg", jpeg_quality=90)
+        deskew_pdf(input_pdf, fax_pdf, dpi=150, output_encoding="fax", workers=2)
+        self.assertEqual(self.image_filters(jpeg_pdf), ["/DCTDecode"] * 3)
+        self.assertEqual(self.image_filters(fax_pdf), ["/CCITTFaxDecode"] * 3)
+        self.assertLess(os.path.getsize(fax_pdf), os.path.getsize(jpeg_pdf) / 2)
+        for page_num in range(3):
+            self.assertAlmostEqual(page_skew(fax_pdf, page_num), 0.0, delta=0.5)
+
+        with self.assertRaises(ValueError):
+            deskew_pdf(input_pdf, jpeg_pdf, output_encoding="png")
+
+    def test_straight_pages_follow_output_settings(self):
+        # 倾斜可忽略的页面也须按指定的像素格式和输出编码重新编码，不能原样复制
+        input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        make_skewed_pdf(input_pdf, [3.0, 0.0])
+        cases = (
+            ({"color_mode": "bilevel"}, "BitsPerComponent", "1"),
+            ({"color_mode": "gray"}, "ColorSpace", "/DeviceGray"),
+            ({"output_encoding": "fax"}, "Filter", "/CCITTFaxDecode"),
+        )
+        # 依次为整页处理、先在低分辨率上检测的整页处理和分块处理
+        paths = ({}, {"detect_dpi": 50}, {"memory_budget": 3})
+        for options, key, expected in cases:
+            for path in paths:
+                with self.subTest(**options, **path):
+                    output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+                    deskew_pdf(input_pdf, output_pdf, dpi=100, angle_tolerance=0.5, **options, **path)
+                    with fitz.open(output_pdf) as document:
+                        values = {document.xref_get_key(image[0], key)[1]
+                                  for page in document for image in page.get_images()}
+                    self.assertEqual(values, {expected})
+
+
+class TestBilevelMode(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        make_skewed_pdf(self.input_pdf, [3.0, -2.0])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_rotate_keeps_two_levels(self):
+        image = np.full((200, 300), 255, dtype=np.uint8)
+        image[80:120, 50:250] = 0
+        for background, border in (((255, 255, 255), 255), ((0, 0, 0), 0)):
+            rotated = rotate_image(image, 5.0, background=background, bilevel=True)
+            self.assertEqual(rotated.ndim, 2)
+            self.assertEqual(set(np.unique(rotated)), {0, 255})
+            self.assertEqual(rotated[0, 0], border)
+
+    def test_one_bit_output(self):
+        for encoding, expected_filter in (("auto", "CCITTFaxDecode"), ("flate", "FlateDecode")):
+            with self.subTest(encoding=encoding):
+                output_pdf = os.path.join(self.tmpdir.name, f"{encoding}.pdf")
+                # 二值模式下忽略图像处理功能
+                deskew_pdf(self.input_pdf, output_pdf, dpi=150, color_mode="bilevel", output_encoding=encoding,
+                           selected_features={"enhance_image": True}, workers=2)
+                with fitz.open(output_pdf) as document:
+                    for page in document:
+                        xref = page.get_images()[0][0]
+                        self.assertEqual(document.xref_get_key(xref, "BitsPerComponent")[1], "1")
+                        self.assertEqual(document.xref_get_key(xref, "Filter")[1], f"/{expected_filter}")
+                    pix = fitz.Pixmap(document, document[0].get_images()[0][0])
+                    self.assertEqual(set(np.unique(np.frombuffer(pix.samples, dtype=np.uint8))), {0, 255})
+                for page_num in range(2):
+                    self.assertAlmostEqual(page_skew(output_pdf, page_num), 0.0, delta=0.5)
+
+        with self.assertRaises(ValueError):
+            deskew_pdf(self.input_pdf, os.path.join(self.tmpdir.name, "x.pdf"), color_mode="cmyk")
+
+
+class TestGrayMode(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        make_skewed_pdf(self.input_pdf, [3.0, -2.0])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def image_colorspaces(self, pdf_path):
+        with fitz.open(pdf_path) as document:
+            return [document.xref_get_key(page.get_images()[0][0], "ColorSpace")[1] for page in document]
+
+    def test_single_channel_stages(self):
+        gray = make_skewed_image(0.0, 0, 200, 150)[:, :, 0]
+        self.assertEqual(convert_grayscale(gray).shape, gray.shape)
+        self.assertEqual(convert_grayscale(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)).shape, gray.shape + (3,))
+        self.assertEqual(remove_watermark(gray).shape, gray.shape)
+        rotated = rotate_image(gray, 5.0, background=(255, 0, 0))
+        self.assertEqual(rotated.ndim, 2)
+        self.assertEqual(rotated[0, 0], 76)
+
+    def test_gray_output(self):
+        features = {"enhance_image": True, "contrast_enhancement": True}
+        cases = (
+            ("gray", {}),
+            ("gray", features),
+            # 彩色模式下选择灰度转换时自动使用灰度流程
+            ("color", {"convert_grayscale": True}),
+        )
+        for color_mode, selected_features in cases:
+            with self.subTest(color_mode=color_mode, features=selected_features):
+                output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+                deskew_pdf(self.input_pdf, output_pdf, dpi=100, color_mode=color_mode,
+                           selected_features=selected_features)
+                self.assertEqual(self.image_colorspaces(output_pdf), ["/DeviceGray"] * 2)
+                for page_num in range(2):
+                    self.assertAlmostEqual(page_skew(output_pdf, page_num), 0.0, delta=0.5)
+
+
+class TestPointOps(unittest.TestCase):
+    def setUp(self):
+        values = np.arange(256, dtype=np.uint8).reshape(16, 16)
+        self.gray = values
+        self.color = np.dstack([values, values[::-1], values.T])
+
+    def test_quantize(self):
+        for levels in (2, 3, 7, 64, 100, 256):
+            with self.subTest(levels=levels):
+                step = 256 // levels
+                expected = (np.floor_divide(self.color, step) * step).astype(np.uint8)
+                np.testing.assert_array_equal(quantize(self.color, levels), expected)
+                in_place = self.color.copy()
+                self.assertIs(quantize(in_place, levels, dst=in_place), in_place)
+                np.testing.assert_array_equal(in_place, expected)
+
+
+class TestBufferPool(unittest.TestCase):
+    def test_reuse(self):
+        pool = BufferPool(headroom=0.25)
+        first = pool.take((10, 10, 3))
+        self.assertEqual(first.shape, (10, 10, 3))
+        pool.give(first)
+        # 容量足够即复用，即使形状不同
+        second = pool.take((11, 10, 3))
+        self.assertTrue(np.shares_memory(first, second))
+        self.assertEqual((pool.allocations, pool.reuses), (1, 1))
+        # 已取出的缓冲区不会再次分出
+        third = pool.take((10, 10, 3))
+        self.assertFalse(np.shares_memory(second, third))
+        self.assertEqual(pool.take((2, 2), np.float32).dtype, np.float32)
+
+    def test_give_ignores_foreign_and_returned_arrays(self):
+        pool = BufferPool()
+        array = pool.take((4, 4))
+        pool.give(array, array, np.zeros((4, 4), np.uint8), None)
+        self.assertFalse(np.shares_memory(pool.take((4, 4)), pool.take((4, 4))))
+        self.assertEqual(pool.allocations, 2)
+
+    def test_max_bytes(self):
+        pool = BufferPool(max_bytes=150, headroom=0)
+        arrays = [pool.take((100,)), pool.take((100,))]
+        pool.give(*arrays)
+        pool.take((100,))
+        pool.take((100,))
+        # 只保留了一个空闲缓冲区
+        self.assertEqual((pool.allocations, pool.reuses), (3, 1))
+
+    def test_pixmap_array(self):
+        with fitz.open() as document:
+            page = document.new_page(width=100, height=80)
+            page.draw_rect(fitz.Rect(10, 10, 50, 40), color=(1, 0, 0), fill=(0, 0, 1))
+            expected = page.get_pixmap(dpi=72)
+            pix = page.get_pixmap(dpi=72)
+            image = pixmap_array(pix)
+            # 数组保持 Pixmap 存活
+            del pix
+            np.testing.assert_array_equal(image, np.frombuffer(expected.samples, dtype=np.uint8).reshape(image.shape))
+            self.assertEqual(image.shape, (80, 100, 3))
+            self.assertTrue(image.flags.writeable)
+
+    def test_stages_match_without_pool(self):
+        image = make_skewed_image(3.0, 0, 300, 200)
+        stages = (
+            lambda img, pool: rotate_image(img, 3.0, pool=pool),
+            lambda img, pool: remove_watermark(img, pool=pool),
+            lambda img, pool: enhance_image(img, sharpening=True, pool=pool),
+            lambda img, pool: enhance_image(img, denoising_method="Median", pool=pool),
+            lambda img, pool: convert_grayscale(img, scale_factor=2, pool=pool),
+            lambda img, pool: convert_grayscale(img[:, :, 0], smoothing_method="none", pool=pool),
+        )
+        for index, stage in enumerate(stages):
+            with self.subTest(stage=index):
+                pool = BufferPool()
+                original = image.copy()
+                result = stage(image, pool)
+                np.testing.assert_array_equal(result, stage(image, NULL_POOL))
+                np.testing.assert_array_equal(image, original)
+                # 中间图像均已归还，只有输出仍被占用
+                self.assertEqual(len(pool._in_use), 1)
+
+    def test_pages_reuse_buffers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_pdf = os.path.join(tmpdir, "input.pdf")
+            make_skewed_pdf(input_pdf, [3.0, -3.0, 3.0, -3.0])
+            settings = deskew_module._PageSettings(
+                dpi=100, background_color=(255, 255, 255),
+                selected_features={"enhance_image": True, "sharpening": True, "remove_watermark": True},
+            )
+            pool = BufferPool()
+            with fitz.open(input_pdf) as document:
+                results = []
+                for page_num in range(4):
+                    results.append(deskew_module._process_page(document, page_num, settings, pool=pool))
+                    if page_num == 0:
+                        allocations = pool.allocations
+                expected = [deskew_module._process_page(document, page_num, settings) for page_num in range(4)]
+            # 第一页之后不再分配新的缓冲区，页面处理完成后全部归还
+            self.assertEqual(pool.allocations, allocations)
+            self.assertEqual(len(pool._in_use), 0)
+            self.assertEqual([result.image.read() for result in results],
+                             [result.image.read() for result in expected])
+
+
+def assemble_tiles(tiled):
+    """把 flate 编码的 TiledImage 各图块解码并拼回整页图像。"""
+    channels = 3 if tiled.tiles[0][2].colorspace == "DeviceRGB" else 1
+    image = np.zeros((tiled.height, tiled.width, channels), dtype=np.uint8)
+    for x, y, tile in tiled.tiles:
+        pixels = np.frombuffer(zlib.decompress(tile.read()), dtype=np.uint8)
+        image[y:y + tile.height, x:x + tile.width] = pixels.reshape(tile.height, tile.width, channels)
+    return image
+
+
+class TestTiledProcessing(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        self.output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        self.angles = [3.0, -2.0]
+        make_skewed_pdf(self.input_pdf, self.angles)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def process(self, memory_budget, color_mode="color", **features):
+        settings = deskew_module._PageSettings(
+            dpi=300, background_color=(255, 255, 255), output_encoding="flate",
+            color_mode=color_mode, memory_budget=memory_budget, selected_features=features,
+        )
+        with fitz.open(self.input_pdf) as document:
+            return deskew_module._process_page(document, 0, settings, angle_known=True, known_angle=3.0,
+                                               pool=BufferPool())
+
+    def test_tiles_match_whole_page(self):
+        # 单图扫描页按原始分辨率（100 DPI）渲染，整页处理彩色约需 14 MB、灰度约需 5 MB，均超出预算；
+        # 按原始分辨率渲染的图块与整页解码的像素完全相同
+        cases = (
+            ("color", 8, {"enhance_image": True, "sharpening": True}),
+            ("color", 8, {}),
+            ("gray", 3, {"enhance_image": True, "denoising_method": "Median"}),
+            ("gray", 3, {"convert_grayscale": True, "grayscale_scale_factor": 2}),
+        )
+        for color_mode, budget, features in cases:
+            with self.subTest(color_mode=color_mode, features=features):
+                whole = self.process(None, color_mode, **features)
+                tiled = self.process(budget, color_mode, **features)
+                self.assertEqual(type(tiled.image), TiledImage)
+                self.assertGreater(len(tiled.image.tiles), 1)
+                self.assertEqual((tiled.image.width, tiled.image.height), (whole.image.width, whole.image.height))
+                self.assertEqual(tiled.dpi, whole.dpi)
+                expected = np.frombuffer(zlib.decompress(whole.image.read()), dtype=np.uint8)
+                difference = np.abs(assemble_tiles(tiled.image).astype(np.int16).ravel() - expected)
+                self.assertLessEqual(int(difference.max()), 1)
+
+    def test_budget_not_exceeded_is_whole_page(self):
+        result = self.process(16)
+        self.assertNotEqual(type(result.image), TiledImage)
+
+    def test_tile_size_within_budget(self):
+        for budget in (2 ** 20, 32 * 2 ** 20, 256 * 2 ** 20):
+            tile = deskew_module._tile_size(budget, 3, 8)
+            source = tile * 1.415 + 2 * (8 + 2)
+            self.assertLessEqual(3 * (4 * source ** 2 + 2 * tile ** 2), budget)
+            self.assertEqual(tile % 16, 0)
+
+    def test_deskew_pdf_tiled(self):
+        # 单图扫描页按原始分辨率（100 DPI，整页约需 14 MB）分块渲染
+        report = deskew_pdf(self.input_pdf, self.output_pdf, dpi=300, memory_budget=8,
+                            selected_features={"enhance_image": True})
+        self.assertEqual([round(angle) for angle in report.angles], self.angles)
+        with fitz.open(self.output_pdf) as document:
+            for page_num in range(len(self.angles)):
+                self.assertGreater(len(document[page_num].get_images()), 1)
+                self.assertAlmostEqual(page_skew(self.output_pdf, page_num), 0.0, delta=0.5)
+
+    def test_resume_tiled_pages(self):
+        journal_dir = os.path.join(self.tmpdir.name, "journal")
+        done = []
+        deskew_pdf(self.input_pdf, self.output_pdf, memory_budget=8, journal_dir=journal_dir,
+                   current_page_callback=done.append, is_running_callback=lambda: len(done) < 1)
+        with mock.patch("deskew_tool.deskew_pdf._process_page", wraps=deskew_module._process_page) as process:
+            report = deskew_pdf(self.input_pdf, self.output_pdf, memory_budget=8, journal_dir=journal_dir,
+                                resume=True)
+        self.assertEqual([call.args[1] for call in process.call_args_list], [1])
+        self.assertEqual([round(angle) for angle in report.angles], self.angles)
+        with fitz.open(self.output_pdf) as document:
+            self.assertGreater(len(document[0].get_images()), 1)
+
+    def test_invalid_budget(self):
+        with self.assertRaises(ValueError):
+            deskew_pdf(self.input_pdf, self.output_pdf, memory_budget=0)
+
+
+# 测试印章：每页同一位置的一个深色圆环
+STAMP_CENTER, STAMP_RADIUS = (600, 300), 70
+
+
+def make_stamped_pdf(path, pages):
+    """生成每页正文不同、同一位置都盖有同一枚印章的测试 PDF（页面尺寸按 100 DPI 计算）。"""
+    rng = np.random.default_rng(0)
+    words = ("alpha", "beta", "gamma", "delta", "epsilon", "zeta", "theta")
+    document = fitz.open()
+    for _ in range(pages):
+        img = np.full((1100, 850, 3), 255, dtype=np.uint8)
+        for y in range(80, 1020, 36):
+            text = " ".join(rng.choice(words, size=4))
+            cv2.putText(img, text, (int(rng.integers(40, 200)), y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        cv2.circle(img, STAMP_CENTER, STAMP_RADIUS, (60, 60, 200), 10)
+        page = document.new_page(width=850 * 72 / 100, height=1100 * 72 / 100)
+        page.insert_image(page.rect, stream=cv2.imencode(".png", img)[1].tobytes())
+    document.save(path)
+    document.close()
+
+
+def region_mask(region, width, height):
+    """把 WatermarkModel.region 的结果展开为整页掩码。"""
+    x, y, area = region
+    mask = np.zeros((height, width), dtype=bool)
+    mask[y:y + area.shape[0], x:x + area.shape[1]] = area > 0
+    return mask
+
+
+class TestWatermarkModel(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        self.output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        make_stamped_pdf(self.input_pdf, 8)
+        self.stamp = np.zeros((1100, 850), dtype=np.uint8)
+        cv2.circle(self.stamp, STAMP_CENTER, STAMP_RADIUS, 255, 10)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def estimate(self, pages=range(8)):
+        with fitz.open(self.input_pdf) as document:
+            return WatermarkModel.estimate(document, pages)
+
+    def test_estimate_finds_shared_stamp(self):
+        model = self.estimate()
+        for width, height in ((850, 1100), (1700, 2200)):
+            with self.subTest(size=(width, height)):
+                mask = region_mask(model.region(width, height), width, height)
+                stamp = cv2.resize(self.stamp, (width, height), interpolation=cv2.INTER_NEAREST) > 0
+                # 印章完全落在水印区域内，正文几乎不在其中
+                self.assertEqual(np.count_nonzero(stamp & ~mask), 0)
+                self.assertLess(np.count_nonzero(mask & ~stamp), 0.5 * np.count_nonzero(stamp))
+
+    def test_region_box(self):
+        model = self.estimate()
+        full = region_mask(model.region(850, 1100), 850, 1100)
+        box = (500, 250, 640, 700)
+        part = region_mask(model.region(850, 1100, box), box[2] - box[0], box[3] - box[1])
+        np.testing.assert_array_equal(part, full[box[1]:box[3], box[0]:box[2]])
+        x, y, area = model.region(850, 1100, (0, 800, 850, 1100))
+        self.assertEqual(area.size, 0)
+
+    def test_single_page_has_no_model(self):
+        self.assertIsNone(self.estimate([3]))
+
+    def test_remove_watermark_in_region(self):
+        model = self.estimate()
+        with fitz.open(self.input_pdf) as document:
+            image = deskew_module._render_page(document[2], 100).copy()
+        region = model.region(850, 1100)
+        result = remove_watermark(image, region=region)
+        changed = np.any(result != image, axis=2)
+        # 只修改了水印区域内的像素，印章被移除，正文保持不变
+        self.assertFalse(np.any(changed & ~region_mask(region, 850, 1100)))
+        self.assertTrue(np.all(cv2.cvtColor(result, cv2.COLOR_RGB2GRAY)[self.stamp > 0] >= 127))
+        np.testing.assert_array_equal(remove_watermark(image, region=region, pool=BufferPool()), result)
+        empty = model.region(850, 1100, (0, 800, 850, 1100))
+        self.assertIs(remove_watermark(image, region=empty), image)
+
+    def test_tiled_pages_use_region(self):
+        model = self.estimate()
+        results = []
+        for memory_budget in (None, 4):
+            settings = deskew_module._PageSettings(
+                dpi=100, background_color=(255, 255, 255), output_encoding="flate", memory_budget=memory_budget,
+                selected_features={"remove_watermark": True}, watermark_model=model,
+            )
+            with fitz.open(self.input_pdf) as document:
+                results.append(deskew_module._process_page(document, 2, settings, angle_known=True, known_angle=2.0))
+        whole, tiled = results
+        expected = np.frombuffer(zlib.decompress(whole.image.read()), dtype=np.uint8)
+        difference = np.abs(assemble_tiles(tiled.image).astype(np.int16).ravel() - expected)
+        self.assertLessEqual(int(difference.max()), 1)
+
+    def test_deskew_pdf_document_mask(self):
+        features = {"remove_watermark": True, "watermark_mask": "document"}
+        journal_dir = os.path.join(self.tmpdir.name, "journal")
+        with mock.patch("deskew_tool.deskew_pdf.WatermarkModel.estimate", wraps=WatermarkModel.estimate) as estimate:
+            deskew_pdf(self.input_pdf, self.output_pdf, dpi=100, selected_features=features, workers=2,
+                       journal_dir=journal_dir)
+        self.assertEqual(estimate.call_count, 1)
+        with fitz.open(self.output_pdf) as document:
+            pix = document[5].get_pixmap(dpi=100, colorspace=fitz.csGRAY)
+            gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        self.assertLess(np.count_nonzero(gray[self.stamp > 0] < 127), 0.01 * np.count_nonzero(self.stamp))
+        # 正文不受影响
+        self.assertGreater(np.count_nonzero(gray[:, :450] < 127), 1000)
+
+    def test_invalid_watermark_mask(self):
+        with self.assertRaises(ValueError):
+            deskew_pdf(self.input_pdf, self.output_pdf, selected_features={"watermark_mask": "global"})
+
+
+class TestIterDeskewedPages(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_pdf = os.path.join(self.tmpdir.name, "input.pdf")
+        self.angles = [3.0, -2.0, 1.0, -4.0]
+        make_skewed_pdf(self.input_pdf, self.angles)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_pages_in_order(self):
+        results = iter_deskewed_pages(self.input_pdf, dpi=100, pages="1-3", with_arrays=True)
+        pages = [(result.page_num, result.selected) for result in results]
+        self.assertEqual(pages, [(0, True), (1, True), (2, True), (3, False)])
+
+        for result in iter_deskewed_pages(self.input_pdf, dpi=100, pages="1-3", with_arrays=True):
+            if not result.selected:
+                self.assertIsNone(result.array)
+                continue
+            self.assertEqual(round(result.angle), self.angles[result.page_num])
+            self.assertGreater(result.seconds, 0.0)
+            # 附带的图像为旋转后（画布扩大）的校正图像
+            self.assertEqual(result.array.ndim, 3)
+            self.assertGreaterEqual(result.array.shape[0], 1100)
+            self.assertAlmostEqual(determine_skew(cv2.cvtColor(result.array, cv2.COLOR_RGB2GRAY)), 0.0, delta=0.5)
+
+    def test_yields_before_later_pages(self):
+        with mock.patch("deskew_tool.deskew_pdf._process_page", wraps=deskew_module._process_page) as process:
+            results = iter_deskewed_pages(self.input_pdf, dpi=100)
+            self.assertEqual(process.call_count, 0)
+            self.assertEqual(next(results).page_num, 0)
+            # 第一页产出时后续页面尚未处理，关闭生成器后也不再处理
+            self.assertEqual(process.call_count, 1)
+            results.close()
+        self.assertEqual(process.call_count, 1)
+
+    def test_workers(self):
+        serial = [round(result.angle) for result in iter_deskewed_pages(self.input_pdf, dpi=100)]
+        results = iter_deskewed_pages(self.input_pdf, dpi=100, workers=2, with_arrays=True)
+        parallel = [(result.page_num, round(result.angle), result.array is not None) for result in results]
+        self.assertEqual(serial, [3, -2, 1, -4])
+        self.assertEqual(parallel, [(0, 3, True), (1, -2, True), (2, 1, True), (3, -4, True)])
+
+    def test_page_callback_with_selected_arrays(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        results = []
+        deskew_pdf(self.input_pdf, output_pdf, dpi=100, pages="2-", with_arrays=[2], page_callback=results.append)
+        self.assertEqual([result.page_num for result in results], [0, 1, 2, 3])
+        # 只为指定的页面附带校正后的图像
+        self.assertEqual([result.array is not None for result in results], [False, False, True, False])
+        self.assertFalse(results[0].selected)
+
+    def test_deskew_pdf_opens_input_once(self):
+        # deskew_pdf 的写入端与页面生成器共用同一个输入文档
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        with mock.patch("deskew_tool.deskew_pdf._open_pdf", wraps=deskew_module._open_pdf) as open_pdf:
+            report = deskew_pdf(self.input_pdf, output_pdf, dpi=100, pages="2-")
+        self.assertEqual(open_pdf.call_count, 1)
+        self.assertEqual(report.angles[0], None)
+        self.assertEqual([round(angle) for angle in report.angles[1:]], [-2, 1, -4])
+
+    def test_invalid_arguments_raise_immediately(self):
+        with self.assertRaises(ValueError):
+            iter_deskewed_pages(self.input_pdf, color_mode="sepia")
+        with self.assertRaises(ValueError):
+            iter_deskewed_pages(self.input_pdf, jpeg_quality=0)
+
+
+class TestConcurrentJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.inputs = []
+        for index, angles in enumerate([[3.0, -2.0, 1.0], [-4.0, 2.0, 0.0]]):
+            path = os.path.join(self.tmpdir.name, f"input{index}.pdf")
+            make_skewed_pdf(path, angles)
+            self.inputs.append(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_processes(self, jobs):
+        """
+        在各自的进程中同时运行 deskew_pdf。PyMuPDF 不支持在同一进程的多个线程中同时使用，并发作业须使用进程。
+        :return: 各任务的 DeskewReport
+        """
+        with ProcessPoolExecutor(max_workers=len(jobs), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(deskew_pdf, *args, **kwargs) for args, kwargs in jobs]
+            return [future.result() for future in futures]
+
+    def test_processes_match_serial(self):
+        serial = [deskew_pdf(path, os.path.join(self.tmpdir.name, f"serial{index}.pdf"), dpi=100).angles
+                  for index, path in enumerate(self.inputs)]
+        # 两个作业同时写入同一目录，并各自启用断点续传日志
+        reports = self.run_processes([
+            ((path, os.path.join(self.tmpdir.name, f"concurrent{index}.pdf")),
+             {"dpi": 100, "journal_dir": os.path.join(self.tmpdir.name, f"journal{index}"),
+              "selected_features": {"enhance_image": True}})
+            for index, path in enumerate(self.inputs)
+        ])
+
+        self.assertEqual([report.angles for report in reports], serial)
+        for index in range(len(self.inputs)):
+            output_pdf = os.path.join(self.tmpdir.name, f"concurrent{index}.pdf")
+            for page_num in range(3):
+                self.assertAlmostEqual(page_skew(output_pdf, page_num), 0.0, delta=0.5)
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name) if name.endswith((".part", ".spool"))])
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name) if name.startswith("journal")])
+
+    def test_processes_share_angle_cache(self):
+        # 每个进程各自打开同一个缓存文件，第二轮的所有页面都命中第一轮写入的结果
+        cache_path = os.path.join(self.tmpdir.name, "angles.sqlite")
+        jobs = [BatchJob(path, os.path.join(self.tmpdir.name, f"output{index}.pdf"))
+                for index, path in enumerate(self.inputs)]
+        for expected in ((0, 3), (3, 0)):
+            results = run_batch(jobs, {"dpi": 100}, file_workers=2, angle_cache_path=cache_path)
+            self.assertEqual([result.status for result in results], ["ok", "ok"])
+            self.assertEqual([(result.cache_hits, result.cache_misses) for result in results], [expected] * 2)
+
+    def test_crashed_worker_does_not_abort_batch(self):
+        # 第一个任务的进度回调直接结束工作进程，模拟内存不足或 MuPDF 崩溃
+        jobs = [BatchJob(self.inputs[0], os.path.join(self.tmpdir.name, "crash.pdf"),
+                         {"progress_callback": os._exit})]
+        jobs += [BatchJob(path, os.path.join(self.tmpdir.name, f"output{index}.pdf"))
+                 for index, path in enumerate(self.inputs * 2)]
+        results = run_batch(jobs, {"dpi": 100}, file_workers=2, order="input")
+
+        self.assertEqual([result.input_path for result in results], [job.input_path for job in jobs])
+        self.assertEqual(results[0].status, "failed")
+        self.assertIn("terminated abruptly", results[0].error)
+        for result in results:
+            self.assertIn(result.status, ("ok", "failed"))
+        summary = os.path.join(self.tmpdir.name, "summary.json")
+        write_summary(results, summary)
+        with open(summary, encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)), len(jobs))
+
+    def test_same_output_path(self):
+        output_pdf = os.path.join(self.tmpdir.name, "output.pdf")
+        self.run_processes([((path, output_pdf), {"dpi": 100}) for path in self.inputs])
+        # 两个作业的临时文件互不干扰，输出为其中一个作业的完整结果
+        with fitz.open(output_pdf) as document:
+            self.assertEqual(len(document), 3)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ["input0.pdf", "input1.pdf", "output.pdf"])
+
+
+# 在子进程中运行 deskew_pdf 并输出峰值常驻内存（字节）
+PEAK_RSS_SCRIPT = """
+import resource, sys
+from deskew_tool.deskew_pdf import deskew_pdf
+deskew_pdf(sys.argv[1], sys.argv[2], dpi=150, detect_dpi=75)
+if sys.platform.startswith("linux"):
+    # Linux 上 ru_maxrss 包含 fork 时父进程（测试进程）的常驻内存，VmHWM 只统计本进程
+    with open("/proc/self/status") as status:
+        print(next(int(line.split()[1]) * 1024 for line in status if line.startswith("VmHWM:")))
+else:
+    scale = 1 if sys.platform == "darwin" else 1024
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale)
+"""
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "resource 模块不可用")
+class TestStreamingWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def peak_rss(self, page_count):
+        input_pdf = os.path.join(self.tmpdir.name, f"pages_{page_count}.pdf")
+        output_pdf = os.path.join(self.tmpdir.name, f"pages_{page_count}_out.pdf")
+        make_skewed_pdf(input_pdf, [2.0] * page_count)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        completed = subprocess.run(
+            [sys.executable, "-c", PEAK_RSS_SCRIPT, input_pdf, output_pdf],
+            capture_output=True, text=True, env=env, check=True
+        )
+        with fitz.open(output_pdf) as document:
+            self.assertEqual(len(document), page_count)
+        self.assert_compact(output_pdf)
+        return int(completed.stdout.strip().splitlines()[-1])
+
+    def assert_compact(self, path):
+        """输出文件只有一个修订，大小与一次性完整保存同一文档的结果相当。"""
+        with fitz.open(path) as document:
+            self.assertEqual(document.version_count, 1)
+            one_shot = len(document.tobytes(garbage=3, deflate=True))
+        self.assertLess(os.path.getsize(path), one_shot * 1.05)
+
+    def test_peak_memory_independent_of_page_count(self):
+        # 150 DPI 渲染下每页 RGB 图像约 6.3 MB，页数增加 5 倍时峰值内存增长不应超过 4 页
+        page_bytes = 1275 * 1650 * 3
+        small = self.peak_rss(4)
+        large = self.peak_rss(20)
+        self.assertLess(large - small, 4 * page_bytes)
+
+    def test_flushed_output_is_compacted(self):
+        # 每页都增量保存一次暂存文件，最终输出仍应是一次完整保存的结果，且不留下临时文件
+        output_pdf = os.path.join(self.tmpdir.name, "flushed.pdf")
+        encoded = encode_page(make_skewed_image(0.0), "jpeg")
+        with PdfPageWriter(output_pdf, flush_bytes=1) as writer:
+            for _ in range(40):
+                writer.add_image_page(encoded, 100)
+        with fitz.open(output_pdf) as document:
+            self.assertEqual(len(document), 40)
+        self.assert_compact(output_pdf)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["flushed.pdf"])
+
+
 if __name__ == '__main__':
     unittest.main()